@@ -0,0 +1,144 @@
+"""Array-backed store for the airports reference table.
+
+Instead of one dict per airport, each column is kept as one array: ids and
+coordinates as numpy arrays, codes and names as tuples, and the repetitive
+text columns (country, city, airport_size) interned into a table of
+distinct values plus an index per airport. Rows are rebuilt as dicts only
+when someone asks for one airport.
+
+The same arrays are sent to the browser in two compact forms:
+
+columnar()  parallel JSON arrays; coordinates are little-endian float32
+            pairs (lat, lng), base64 encoded; interned columns are
+            {"values": [...], "index": [...]}
+binary()    the same columns packed into one buffer (layout below), for
+            clients that can read typed arrays straight out of it
+"""
+import base64
+import struct
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from json_provider import dumps_bytes
+
+# Interned columns and the dtype of their per-airport index in binary()
+INTERNED = (('city', np.uint32), ('country', np.uint16), ('airport_size', np.uint8))
+
+# binary(): magic, version, count, length of the JSON string tables
+BINARY_MAGIC = b'ATAP'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHxxII')
+
+
+def intern_column(values):
+    """(distinct values in first-seen order, index of each value)"""
+    table = {}
+    index = np.fromiter((table.setdefault(value, len(table)) for value in values), dtype=np.int64)
+    return tuple(table), index
+
+
+class AirportRecords(Sequence):
+    """The store seen as the list of row dicts it replaced"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._store.row_at(i) for i in range(*position.indices(len(self)))]
+        return self._store.row_at(position)
+
+
+class AirportStore(Mapping):
+    """Airports by id; columns are numpy arrays and interned tables"""
+
+    def __init__(self, rows):
+        self.ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        self.latitude = np.array([float(row['latitude']) for row in rows], dtype=np.float64)
+        self.longitude = np.array([float(row['longitude']) for row in rows], dtype=np.float64)
+        self.code = tuple(row['code'] for row in rows)
+        self.name = tuple(row['name'] for row in rows)
+        self.tables = {}
+        self.index = {}
+        for column, _ in INTERNED:
+            self.tables[column], self.index[column] = intern_column(row.get(column) for row in rows)
+        self._position = {airport_id: i for i, airport_id in enumerate(self.ids.tolist())}
+        self.records = AirportRecords(self)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self._position)
+
+    def __contains__(self, airport_id):
+        return airport_id in self._position
+
+    def __getitem__(self, airport_id):
+        return self.row_at(self._position[airport_id])
+
+    def position(self, airport_id):
+        return self._position[airport_id]
+
+    def row_at(self, i):
+        """The airport at position i as a row dict"""
+        row = {
+            'id': int(self.ids[i]), 'code': self.code[i], 'name': self.name[i],
+            'latitude': float(self.latitude[i]), 'longitude': float(self.longitude[i]),
+        }
+        for column, _ in INTERNED:
+            row[column] = self.tables[column][self.index[column][i]]
+        return row
+
+    def latlng32(self):
+        """Coordinates as interleaved little-endian float32 (lat, lng) pairs"""
+        return np.column_stack((self.latitude, self.longitude)).astype('<f4')
+
+    def columnar(self):
+        """JSON-ready parallel arrays"""
+        payload = {
+            'count': len(self),
+            'id': self.ids,
+            'code': self.code,
+            'name': self.name,
+            'latlng': base64.b64encode(self.latlng32().tobytes()).decode('ascii'),
+        }
+        for column, _ in INTERNED:
+            payload[column] = {'values': self.tables[column], 'index': self.index[column]}
+        return payload
+
+    def binary(self):
+        """All columns in one little-endian buffer:
+
+        header   magic 'ATAP', uint16 version, 2 pad bytes, uint32 count,
+                 uint32 length of the string tables
+        int32    id[count]
+        float32  latitude[count], longitude[count]
+        uint32   city index[count]
+        uint16   country index[count]
+        uint8    airport_size index[count], zero-padded to 4 bytes
+        utf-8    JSON {"code", "name", "city", "country", "airport_size"}
+        """
+        count = len(self)
+        if count and (self.ids.min() < -2**31 or self.ids.max() >= 2**31):
+            raise ValueError('airport ids do not fit in int32')
+        strings = {'code': self.code, 'name': self.name}
+        parts = [
+            self.ids.astype('<i4').tobytes(),
+            self.latitude.astype('<f4').tobytes(),
+            self.longitude.astype('<f4').tobytes(),
+        ]
+        for column, dtype in INTERNED:
+            values = self.tables[column]
+            if len(values) > np.iinfo(dtype).max + 1:
+                raise ValueError(f'too many distinct {column} values for the binary format')
+            parts.append(self.index[column].astype(np.dtype(dtype).newbyteorder('<')).tobytes())
+            strings[column] = values
+        parts.append(b'\0' * (-sum(len(part) for part in parts) % 4))
+        tables = dumps_bytes(strings)
+        header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, count, len(tables))
+        return b''.join([header] + parts + [tables])
@@ -0,0 +1,161 @@
+"""Map tiles of airports, clustered per zoom level.
+
+/api/airports/tiles/<z>/<x>/<y> returns the airports and clusters of one
+slippy-map tile, in the same z/x/y scheme as the OpenStreetMap base layer.
+The browser only downloads and draws what is in view.
+
+The hierarchy is built once per airports version from the AirportStore
+arrays. Airports are projected to Web Mercator. Above max_zoom every
+airport is its own point. Each lower zoom groups the points of the level
+above into grid cells radius pixels wide, and places the cell's cluster
+at the count-weighted centre of its members. Every level is sorted by the
+Morton (Z-order) code of its points. In that order a tile is one
+contiguous range, so finding a tile's points takes two binary searches.
+Encoded tiles are kept in a small LRU.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+# Bits of x and y interleaved into a Morton code; tiles up to this zoom are one range
+INDEX_BITS = 16
+MAX_TILE_ZOOM = 22
+
+
+def project(lat, lng):
+    """Degrees to Web Mercator coordinates in [0, 1) (x east, y south)"""
+    x = (np.asarray(lng, dtype=np.float64) + 180.0) / 360.0
+    sin = np.sin(np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)))
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    top = np.nextafter(1.0, 0.0)
+    return np.clip(x, 0.0, top), np.clip(y, 0.0, top)
+
+
+def unproject(x, y):
+    """Web Mercator coordinates back to (lat, lng) degrees"""
+    lng = np.asarray(x) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * np.asarray(y)))))
+    return lat, lng
+
+
+def _spread_bits(v):
+    """Put the low 16 bits of v on the even bit positions"""
+    v = np.asarray(v, dtype=np.uint64)
+    for shift, mask in ((8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333), (1, 0x55555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton(cx, cy):
+    """Z-order code of integer cell coordinates"""
+    return _spread_bits(cx) | (_spread_bits(cy) << np.uint64(1))
+
+
+class Level:
+    """Points of one zoom level in Morton order; position is the airport's
+    index in the store, or -1 for a cluster of several"""
+
+    def __init__(self, x, y, count, position):
+        cells = 1 << INDEX_BITS
+        codes = morton((x * cells).astype(np.int64), (y * cells).astype(np.int64))
+        order = np.argsort(codes, kind='stable')
+        self.codes = codes[order]
+        self.x = x[order]
+        self.y = y[order]
+        self.count = count[order]
+        self.position = position[order]
+        self.latitude, self.longitude = unproject(self.x, self.y)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def in_tile(self, z, tx, ty):
+        """Indexes of the points inside tile (z, tx, ty)"""
+        depth = min(z, INDEX_BITS)
+        shift = np.uint64(2 * (INDEX_BITS - depth))
+        prefix = morton(tx >> (z - depth), ty >> (z - depth))
+        lo = np.searchsorted(self.codes, prefix << shift, side='left')
+        hi = np.searchsorted(self.codes, (prefix + np.uint64(1)) << shift, side='left')
+        indexes = np.arange(lo, hi)
+        if z > INDEX_BITS:
+            # Deeper than the index: filter the enclosing tile's range exactly
+            scale = 1 << z
+            inside = ((self.x[indexes] * scale).astype(np.int64) == tx) & \
+                     ((self.y[indexes] * scale).astype(np.int64) == ty)
+            indexes = indexes[inside]
+        return indexes
+
+
+def cluster_level(level, z, radius):
+    """The points of level grouped into radius-pixel cells at zoom z"""
+    cells = TILE_SIZE * (1 << z) / radius
+    cx = np.floor(level.x * cells).astype(np.int64)
+    cy = np.floor(level.y * cells).astype(np.int64)
+    keys, group = np.unique(cy * (int(cells) + 1) + cx, return_inverse=True)
+    count = np.bincount(group, weights=level.count).astype(np.int64)
+    x = np.bincount(group, weights=level.x * level.count) / count
+    y = np.bincount(group, weights=level.y * level.count) / count
+    # A cell holding one point keeps that point's airport (or cluster)
+    members = np.bincount(group)
+    member = np.empty(len(keys), dtype=np.int64)
+    member[group] = np.arange(len(group))
+    position = np.where(members == 1, level.position[member], -1)
+    return Level(x, y, count, position)
+
+
+class AirportTiles:
+    """Clustered airports of one AirportStore, by zoom level"""
+
+    def __init__(self, store, max_zoom=9, radius=60, max_tiles=4096):
+        self.store = store
+        self.max_zoom = max_zoom
+        self.max_tiles = max_tiles
+        x, y = project(store.latitude, store.longitude)
+        level = Level(x, y, np.ones(len(x), dtype=np.int64), np.arange(len(x)))
+        self.levels = {max_zoom + 1: level}
+        for z in range(max_zoom, -1, -1):
+            level = cluster_level(level, z, radius)
+            self.levels[z] = level
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def level(self, z):
+        return self.levels[min(z, self.max_zoom + 1)]
+
+    def tile(self, z, x, y):
+        """{'airports': [row, ...], 'clusters': [{latitude, longitude, count}, ...]}"""
+        level = self.level(z)
+        airports = []
+        clusters = []
+        for i in level.in_tile(z, x, y).tolist():
+            position = int(level.position[i])
+            if position >= 0:
+                airports.append(self.store.row_at(position))
+            else:
+                clusters.append({
+                    'latitude': round(float(level.latitude[i]), 5),
+                    'longitude': round(float(level.longitude[i]), 5),
+                    'count': int(level.count[i]),
+                })
+        return {'airports': airports, 'clusters': clusters}
+
+    def cached(self, key, compute):
+        """compute() memoized per key in a bounded LRU (for encoded tiles)"""
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+        value = compute()
+        with self._lock:
+            self._tiles[key] = value
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return value
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
@@ -1,658 +1,1008 @@
-from flask import Flask, jsonify, request, render_template, session, redirect, url_for
-from flask_cors import CORS
-import mysql.connector
-from mysql.connector import Error
-import json
-import random
-from datetime import datetime
-import math
-import os
-
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'adventurous_traveler_secret_key_2024')
-CORS(app, supports_credentials=True)
-
-# Database configuration
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'suprim123',
-    'database': 'webadventurous_traveler',
-    'autocommit': False
-}
-
-def get_db_connection():
-    try:
-        return mysql.connector.connect(**DB_CONFIG)
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
-
-# ==================== ROUTES ====================
-
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-@app.route('/about')
-def about():
-    return render_template('about.html')
-
-@app.route('/resources')
-def resources():
-    return render_template('resources.html')
-
-@app.route('/welcome')
-def welcome():
-    return render_template('welcome.html')
-
-@app.route('/story')
-def story():
-    game_id = request.args.get('game_id') or session.get('game_id')
-    if not game_id:
-        return redirect(url_for('welcome'))
-    return render_template('story.html')
-
-@app.route('/game')
-def game():
-    game_id = request.args.get('game_id') or session.get('game_id')
-    if not game_id:
-        return redirect(url_for('welcome'))
-    return render_template('game.html')
-
-# ==================== API ====================
-
-@app.route('/api/game/create', methods=['POST'])
-def create_game():
-    try:
-        data = request.json
-        player_name = data.get('player_name', 'Adventurer').strip()
-        
-        if not player_name:
-            return jsonify({'success': False, 'error': 'Name required'})
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'})
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get all airports
-        cursor.execute("SELECT id FROM airports ORDER BY RAND() LIMIT 1")
-        start_airport = cursor.fetchone()
-        
-        if not start_airport:
-            return jsonify({'success': False, 'error': 'No airports found in database'})
-        
-        # Insert new game
-        cursor.execute("""
-            INSERT INTO games (player_name, current_airport_id, money, fuel_km, max_fuel_capacity)
-            VALUES (%s, %s, 10000, 2500, 5000)
-        """, (player_name, start_airport['id']))
-        
-        game_id = cursor.lastrowid
-        
-        # Get all 10 artifacts
-        cursor.execute("SELECT id, artifact_order FROM artifacts ORDER BY artifact_order")
-        all_artifacts = cursor.fetchall()
-        
-        # Get random unique airports for artifact delivery (excluding start airport)
-        cursor.execute("""
-            SELECT id FROM airports 
-            WHERE id != %s 
-            ORDER BY RAND() 
-            LIMIT 10
-        """, (start_airport['id'],))
-        delivery_airports = cursor.fetchall()
-        
-        if len(delivery_airports) < 10:
-            return jsonify({'success': False, 'error': 'Not enough airports for artifact delivery'})
-        
-        # Assign random airports to each artifact
-        for i, artifact in enumerate(all_artifacts):
-            delivery_airport = delivery_airports[i]
-            cursor.execute("""
-                INSERT INTO game_artifact_locations (game_id, artifact_id, artifact_order, delivery_airport_id)
-                VALUES (%s, %s, %s, %s)
-            """, (game_id, artifact['id'], artifact['artifact_order'], delivery_airport['id']))
-        
-        # Log the start
-        cursor.execute("""
-            INSERT INTO logs (game_id, log_type, description)
-            VALUES (%s, 'event', %s)
-        """, (game_id, f"Game started for {player_name}"))
-        
-        conn.commit()
-        
-        # Store in session
-        session['game_id'] = game_id
-        session['player_name'] = player_name
-        
-        return jsonify({
-            'success': True, 
-            'game_id': game_id,
-            'player_name': player_name
-        })
-        
-    except Exception as e:
-        if 'conn' in locals():
-            conn.rollback()
-        print(f"Create Error: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
-
-@app.route('/api/game/current')
-def get_current_game():
-    game_id = request.args.get('game_id') or session.get('game_id')
-    
-    if not game_id:
-        return jsonify({'success': False, 'error': 'No game ID provided'})
-    
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'})
-    
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        # Get game state
-        cursor.execute("""
-            SELECT g.*, a.code as airport_code, a.name as airport_name, 
-                   a.city, a.country, a.latitude, a.longitude
-            FROM games g 
-            LEFT JOIN airports a ON g.current_airport_id = a.id 
-            WHERE g.id = %s
-        """, (game_id,))
-        game = cursor.fetchone()
-        
-        if not game:
-            return jsonify({'success': False, 'error': 'Game not found'})
-        
-        # Get current artifact info from game_artifact_locations
-        cursor.execute("""
-            SELECT gal.*, art.name as artifact_name, art.description as artifact_description,
-                   art.delivery_reward_money, art.delivery_reward_fuel,
-                   ap.code as delivery_airport_code, ap.name as delivery_airport_name,
-                   ap.city as delivery_city, ap.country as delivery_country,
-                   ap.latitude as delivery_lat, ap.longitude as delivery_lng
-            FROM game_artifact_locations gal
-            JOIN artifacts art ON gal.artifact_id = art.id
-            JOIN airports ap ON gal.delivery_airport_id = ap.id
-            WHERE gal.game_id = %s AND gal.artifact_order = %s
-        """, (game_id, game['current_artifact_number']))
-        artifact_info = cursor.fetchone()
-        
-        # Get all artifacts status for this game
-        cursor.execute("""
-            SELECT gal.*, art.name as artifact_name, art.description as artifact_description,
-                   ap.code as delivery_airport_code, ap.name as delivery_airport_name
-            FROM game_artifact_locations gal
-            JOIN artifacts art ON gal.artifact_id = art.id
-            JOIN airports ap ON gal.delivery_airport_id = ap.id
-            WHERE gal.game_id = %s
-            ORDER BY gal.artifact_order
-        """, (game_id,))
-        all_artifacts = cursor.fetchall()
-        
-        # Get recent logs
-        cursor.execute("""
-            SELECT * FROM logs 
-            WHERE game_id = %s 
-            ORDER BY created_at DESC 
-            LIMIT 10
-        """, (game_id,))
-        logs = cursor.fetchall()
-        
-        # Check win/lose conditions
-        status_changed = False
-        if game['flights_taken'] >= 20 and game['artifacts_delivered'] < 10 and game['game_status'] == 'ACTIVE':
-            cursor.execute("UPDATE games SET game_status = 'LOST' WHERE id = %s", (game_id,))
-            game['game_status'] = 'LOST'
-            status_changed = True
-        elif game['artifacts_delivered'] >= 10 and game['game_status'] == 'ACTIVE':
-            cursor.execute("UPDATE games SET game_status = 'WON' WHERE id = %s", (game_id,))
-            game['game_status'] = 'WON'
-            status_changed = True
-        
-        if status_changed:
-            conn.commit()
-        
-        return jsonify({
-            'success': True, 
-            'game': game, 
-            'current_artifact': artifact_info,
-            'all_artifacts': all_artifacts,
-            'logs': logs
-        })
-        
-    except Exception as e:
-        print(f"Get current game error: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-    finally:
-        cursor.close()
-        conn.close()
-
-@app.route('/api/game/travel', methods=['POST'])
-def travel():
-    try:
-        data = request.json
-        game_id = data.get('game_id') or session.get('game_id')
-        dest_id = data.get('destination_airport_id')
-        
-        if not game_id:
-            return jsonify({'success': False, 'error': 'No game ID'})
-        if not dest_id:
-            return jsonify({'success': False, 'error': 'No destination specified'})
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'})
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get current game state
-        cursor.execute("""
-            SELECT g.*, a.latitude as lat1, a.longitude as lng1, 
-                   a.name as airport_name, a.code as airport_code
-            FROM games g 
-            LEFT JOIN airports a ON g.current_airport_id = a.id
-            WHERE g.id = %s
-        """, (game_id,))
-        game = cursor.fetchone()
-        
-        if not game:
-            return jsonify({'success': False, 'error': 'Game not found'})
-        
-        if game['game_status'] != 'ACTIVE':
-            return jsonify({'success': False, 'error': 'Game is not active'})
-        
-        if game['flights_taken'] >= 20:
-            return jsonify({'success': False, 'error': 'Max flights reached (20)'})
-        
-        if game['current_airport_id'] == dest_id:
-            return jsonify({'success': False, 'error': 'Already at this airport'})
-        
-        # Get destination airport
-        cursor.execute("SELECT * FROM airports WHERE id = %s", (dest_id,))
-        dest = cursor.fetchone()
-        
-        if not dest:
-            return jsonify({'success': False, 'error': 'Destination airport not found'})
-        
-        # Calculate distance
-        dist = calculate_distance(
-            game['lat1'], game['lng1'], 
-            dest['latitude'], dest['longitude']
-        )
-        
-        if dist < 200:
-            return jsonify({'success': False, 'error': 'Flight too short (<200km)'})
-        
-        # Calculate fuel needed with efficiency
-        fuel_needed = dist * (1 - game.get('fuel_efficiency_bonus', 0) / 100.0)
-        
-        if game.get('fuel_km', 0) < fuel_needed:
-            return jsonify({'success': False, 'error': 'Not enough fuel'})
-        
-        # Update game - travel to destination
-        cursor.execute("""
-            UPDATE games 
-            SET fuel_km = fuel_km - %s, 
-                current_airport_id = %s,
-                flights_taken = flights_taken + 1
-            WHERE id = %s
-        """, (fuel_needed, dest_id, game_id))
-        
-        # Log the flight
-        cursor.execute("""
-            INSERT INTO logs (game_id, log_type, description, distance_km, fuel_change)
-            VALUES (%s, 'flight', %s, %s, %s)
-        """, (game_id, f"Flew from {game['airport_code']} to {dest['code']}", dist, -fuel_needed))
-        
-        # Check for random event (30% chance)
-        event_result = None
-        if random.random() < 0.3:
-            event_result = trigger_random_event(game_id, cursor)
-        
-        # Check for artifact delivery
-        delivery_result = check_artifact_delivery(game_id, dest_id, cursor)
-        
-        # Get updated game state
-        cursor.execute("""
-            SELECT g.*, a.code as airport_code, a.name as airport_name
-            FROM games g 
-            JOIN airports a ON g.current_airport_id = a.id
-            WHERE g.id = %s
-        """, (game_id,))
-        updated_game = cursor.fetchone()
-        
-        conn.commit()
-        
-        return jsonify({
-            'success': True, 
-            'game': updated_game, 
-            'distance': dist, 
-            'fuel_cost': fuel_needed,
-            'event': event_result,
-            'delivery': delivery_result
-        })
-        
-    except Exception as e:
-        if 'conn' in locals():
-            conn.rollback()
-        print(f"Travel error: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
-
-def check_artifact_delivery(game_id, airport_id, cursor):
-    """Check if current artifact can be delivered at this airport"""
-    # Get current artifact info
-    cursor.execute("""
-        SELECT gal.*, art.name as artifact_name, art.delivery_reward_money, art.delivery_reward_fuel
-        FROM game_artifact_locations gal
-        JOIN artifacts art ON gal.artifact_id = art.id
-        WHERE gal.game_id = %s AND gal.artifact_order = (
-            SELECT current_artifact_number FROM games WHERE id = %s
-        )
-    """, (game_id, game_id))
-    artifact_info = cursor.fetchone()
-    
-    if not artifact_info:
-        return {'delivered': False}
-    
-    if artifact_info['delivery_airport_id'] == airport_id and not artifact_info['is_delivered']:
-        # Deliver artifact
-        reward_money = artifact_info['delivery_reward_money']
-        reward_fuel = artifact_info['delivery_reward_fuel']
-        
-        # Update game_artifact_locations
-        cursor.execute("""
-            UPDATE game_artifact_locations 
-            SET is_delivered = 1, delivered_at = NOW()
-            WHERE id = %s
-        """, (artifact_info['id'],))
-        
-        # Update games table
-        cursor.execute("""
-            UPDATE games 
-            SET artifacts_delivered = artifacts_delivered + 1,
-                current_artifact_number = current_artifact_number + 1,
-                money = money + %s,
-                fuel_km = LEAST(max_fuel_capacity, fuel_km + %s)
-            WHERE id = %s
-        """, (reward_money, reward_fuel, game_id))
-        
-        # Log delivery
-        cursor.execute("""
-            INSERT INTO logs (game_id, log_type, description, money_change, fuel_change)
-            VALUES (%s, 'delivery', %s, %s, %s)
-        """, (game_id, f"Delivered {artifact_info['artifact_name']}!", reward_money, reward_fuel))
-        
-        return {
-            'delivered': True,
-            'artifact_name': artifact_info['artifact_name'],
-            'reward_money': reward_money,
-            'reward_fuel': reward_fuel
-        }
-    
-    return {'delivered': False}
-
-def trigger_random_event(game_id, cursor):
-    """Trigger a random in-game event"""
-    # Get random event type
-    cursor.execute("SELECT * FROM event_types ORDER BY RAND() LIMIT 1")
-    event_type = cursor.fetchone()
-    
-    if not event_type:
-        return None
-    
-    # Calculate random values
-    money_change = random.randint(
-        event_type['effect_money_min'], 
-        event_type['effect_money_max']
-    )
-    fuel_change = random.randint(
-        event_type['effect_fuel_min'], 
-        event_type['effect_fuel_max']
-    )
-    
-    # Apply changes to game
-    if money_change != 0 or fuel_change != 0:
-        cursor.execute("""
-            UPDATE games 
-            SET money = money + %s, 
-                fuel_km = GREATEST(0, fuel_km + %s)
-            WHERE id = %s
-        """, (money_change, fuel_change, game_id))
-    
-    # Log event
-    cursor.execute("""
-        INSERT INTO logs (game_id, log_type, description, money_change, fuel_change)
-        VALUES (%s, 'event', %s, %s, %s)
-    """, (game_id, event_type['description'], money_change, fuel_change))
-    
-    return {
-        'name': event_type['name'],
-        'description': event_type['description'],
-        'money_change': money_change,
-        'fuel_change': fuel_change,
-        'category': event_type['event_category']
-    }
-
-@app.route('/api/game/buy', methods=['POST'])
-def buy_item():
-    try:
-        data = request.json
-        game_id = data.get('game_id') or session.get('game_id')
-        item_id = data.get('shop_item_id')
-        
-        if not game_id:
-            return jsonify({'success': False, 'error': 'No game ID'})
-        if not item_id:
-            return jsonify({'success': False, 'error': 'No item specified'})
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'})
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get game state
-        cursor.execute("SELECT * FROM games WHERE id = %s", (game_id,))
-        game = cursor.fetchone()
-        
-        if not game:
-            return jsonify({'success': False, 'error': 'Game not found'})
-        
-        # Get item
-        cursor.execute("SELECT * FROM shop_items WHERE id = %s", (item_id,))
-        item = cursor.fetchone()
-        
-        if not item:
-            return jsonify({'success': False, 'error': 'Item not found'})
-        
-        # Check if can afford
-        if game['money'] < item['price']:
-            return jsonify({'success': False, 'error': 'Not enough money'})
-        
-        # Apply item effects
-        reward_money = 0
-        reward_fuel = 0
-        
-        if item['category'] == 'fuel':
-            fuel_to_add = item['effect_value']
-            cursor.execute("""
-                UPDATE games 
-                SET fuel_km = LEAST(max_fuel_capacity, fuel_km + %s), 
-                    money = money - %s 
-                WHERE id = %s
-            """, (fuel_to_add, item['price'], game_id))
-            
-        elif item['category'] == 'lootbox':
-            # Random rewards
-            if 'Gold' in item['name']:
-                reward_money = random.randint(2000, 5000)
-                reward_fuel = random.randint(1500, 3000)
-            elif 'Silver' in item['name']:
-                reward_money = random.randint(800, 2000)
-                reward_fuel = random.randint(700, 1200)
-            else:  # Bronze
-                reward_money = random.randint(200, 800)
-                reward_fuel = random.randint(300, 600)
-            
-            cursor.execute("""
-                UPDATE games 
-                SET money = money - %s + %s, 
-                    fuel_km = LEAST(max_fuel_capacity, fuel_km + %s) 
-                WHERE id = %s
-            """, (item['price'], reward_money, reward_fuel, game_id))
-            
-        elif item['category'] == 'upgrade':
-            if item['item_type'] == 'fuel_capacity':
-                cursor.execute("""
-                    UPDATE games 
-                    SET max_fuel_capacity = max_fuel_capacity + %s, 
-                        money = money - %s 
-                    WHERE id = %s
-                """, (item['effect_value'], item['price'], game_id))
-            elif item['item_type'] == 'fuel_efficiency':
-                cursor.execute("""
-                    UPDATE games 
-                    SET fuel_efficiency_bonus = fuel_efficiency_bonus + %s, 
-                        money = money - %s 
-                    WHERE id = %s
-                """, (item['effect_value'], item['price'], game_id))
-            elif item['item_type'] == 'flight_discount':
-                cursor.execute("""
-                    UPDATE games 
-                    SET flight_discount_percent = flight_discount_percent + %s, 
-                        money = money - %s 
-                    WHERE id = %s
-                """, (item['effect_value'], item['price'], game_id))
-        
-        # Log purchase
-        cursor.execute("""
-            INSERT INTO logs (game_id, log_type, description, money_change)
-            VALUES (%s, 'purchase', %s, %s)
-        """, (game_id, f"Bought {item['name']}", -item['price']))
-        
-        # Get updated game state
-        cursor.execute("SELECT * FROM games WHERE id = %s", (game_id,))
-        updated_game = cursor.fetchone()
-        
-        conn.commit()
-        
-        return jsonify({
-            'success': True, 
-            'game': updated_game, 
-            'item': item,
-            'reward_money': reward_money,
-            'reward_fuel': reward_fuel
-        })
-        
-    except Exception as e:
-        if 'conn' in locals():
-            conn.rollback()
-        print(f"Buy error: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
-
-# Static data endpoints
-@app.route('/api/airports')
-def get_airports():
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'})
-        
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM airports ORDER BY name")
-        airports = cursor.fetchall()
-        
-        return jsonify({'success': True, 'airports': airports})
-        
-    except Exception as e:
-        print(f"Get airports error: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
-
-@app.route('/api/shop-items')
-def get_shop_items():
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'})
-        
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM shop_items ORDER BY category, price")
-        items = cursor.fetchall()
-        
-        return jsonify({'success': True, 'items': items})
-        
-    except Exception as e:
-        print(f"Get shop items error: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
-
-@app.route('/api/artifacts')
-def get_artifacts():
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'})
-        
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM artifacts ORDER BY artifact_order")
-        artifacts = cursor.fetchall()
-        
-        return jsonify({'success': True, 'artifacts': artifacts})
-        
-    except Exception as e:
-        print(f"Get artifacts error: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
-
-# Helper functions
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two coordinates in km"""
-    R = 6371  # Earth's radius in km
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = (math.sin(dlat/2)**2 + 
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-         math.sin(dlon/2)**2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return int(R * c)
-
-@app.route('/api/game/reset', methods=['POST'])
-def reset_game():
-    """Reset game state"""
-    session.clear()
-    return jsonify({'success': True, 'message': 'Game reset'})
-
-if __name__ == '__main__':
+from flask import Flask, Response, jsonify, request, session, redirect, url_for, stream_with_context, g
+from flask_cors import CORS
+from mysql.connector import Error
+from mysql.connector.constants import ClientFlag
+from contextlib import contextmanager
+import json
+from datetime import datetime, timedelta
+import os
+import time
+
+from db_pool import ConnectionPool
+from storage import check_schema, create_backend, initialize as initialize_storage
+from repositories import (
+    AirportRepository, ArtifactRepository, EventTypeRepository, GameRepository,
+    GameStateSnapshotRepository, ShopItemRepository
+)
+from metrics import Instruments, MetricsStore, TimedCursor
+from json_provider import FastJSONProvider, dumps_bytes
+from distance_matrix import DistanceMatrix
+from shared_data import SharedArrays
+from route_planner import RoutePlanner
+from spatial_index import AirportIndex
+from sampling import IdSampler, WeightedSampler
+from game_snapshots import SnapshotCache
+from log_writer import LogWriter, log_entry
+from log_archive import archive_finished_games, read_history, settle_finished_games
+from leaderboard import Leaderboard, game_result
+from game_events import GameEventBroker, state_diff
+import game_rules
+from game_rules import ActionRejected, MIN_FLIGHT_KM, MAX_FLIGHTS, game_outcome
+from transitions import PRIVATE_COLUMNS, GameTransaction, GameWorld, new_game_state, snapshot_state
+from reference_data import Payload, ReferenceCache
+from airport_store import AirportStore
+from airport_tiles import AirportTiles, valid_tile
+import static_assets
+from page_cache import PageCache
+from worker_channel import WorkerChannel
+
+# Metrics (/metrics); METRICS_SLOW_QUERY_MS logs statements slower than that
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_SLOW_QUERY_MS = float(os.environ.get('METRICS_SLOW_QUERY_MS', 200))
+instruments = Instruments(slow_query_seconds=METRICS_SLOW_QUERY_MS / 1000.0) if METRICS_ENABLED else None
+# Under server.py, /metrics sums every worker's values through files in METRICS_DIR
+METRICS_DIR = os.environ.get('METRICS_DIR')
+metrics_store = MetricsStore(
+    instruments.registry, METRICS_DIR, interval=float(os.environ.get('METRICS_WRITE_INTERVAL', 1))
+) if instruments and METRICS_DIR else None
+
+# Under server.py, workers pass game events and reference data refreshes to
+# each other through sockets in WORKER_CHANNEL_DIR (see worker_channel.py)
+WORKER_CHANNEL_DIR = os.environ.get('WORKER_CHANNEL_DIR')
+worker_channel = WorkerChannel(WORKER_CHANNEL_DIR) if WORKER_CHANNEL_DIR else None
+
+app = Flask(__name__)
+# orjson-backed JSON with Decimal/datetime support for raw DB rows
+app.json_provider_class = FastJSONProvider
+app.json = FastJSONProvider(app)
+if instruments:
+    app.json.on_encode = instruments.json_seconds.observe
+app.secret_key = os.environ.get('SECRET_KEY', 'adventurous_traveler_secret_key_2024')
+CORS(app, supports_credentials=True)
+
+# Static files: fingerprinted, precompressed and served from memory
+# (STATIC_FINGERPRINT=0 while editing them, to serve straight from disk)
+STATIC_FINGERPRINT = os.environ.get('STATIC_FINGERPRINT', '1') == '1'
+if STATIC_FINGERPRINT:
+    static_assets.init_app(app, static_assets.AssetManifest(app.static_folder, app.static_url_path).build())
+
+# HTML pages that never vary per request, rendered once and served as bytes
+page_cache = PageCache(app)
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'suprim123',
+    'database': 'webadventurous_traveler',
+    'autocommit': False,
+    # rowcount reports matched rows, so guarded UPDATEs can tell a lost race apart
+    'client_flags': [ClientFlag.FOUND_ROWS]
+}
+
+# Connection pool settings
+DB_POOL_CONFIG = {
+    'size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    'recycle': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+    'ping_after': float(os.environ.get('DB_POOL_PING_AFTER', 10))
+}
+
+# Storage: 'mysql' (DB_CONFIG) or an embedded 'sqlite' file for single-node deployments
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mysql')
+storage_backend = create_backend(
+    STORAGE_BACKEND,
+    mysql_config=DB_CONFIG,
+    sqlite_path=os.environ.get('SQLITE_PATH', 'adventurous_traveler.sqlite'),
+    busy_timeout=float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))
+)
+# Create missing tables, columns and indexes at startup (every backend; bootstrap
+# is idempotent) and load STORAGE_SEED into empty reference tables
+STORAGE_BOOTSTRAP = os.environ.get('STORAGE_BOOTSTRAP', '1') == '1'
+# Refuse to start when the database still lacks tables or columns after bootstrap
+STORAGE_SCHEMA_CHECK = os.environ.get('STORAGE_SCHEMA_CHECK', '1') == '1'
+STORAGE_SEED = os.environ.get('STORAGE_SEED')
+DB_ERRORS = (Error,) + storage_backend.errors
+
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    connect=storage_backend.connect,
+    errors=DB_ERRORS,
+    on_wait=instruments.pool_wait_seconds.observe if instruments else None,
+    on_connect=instruments.connect_seconds.observe if instruments else None,
+    **DB_POOL_CONFIG
+)
+
+class DatabaseUnavailable(Exception):
+    pass
+
+def get_db_connection():
+    """Check a connection out of the pool; close() returns it"""
+    try:
+        return db_pool.acquire()
+    except DB_ERRORS as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+
+@contextmanager
+def db_cursor():
+    """Yield (conn, cursor) from the pool, rolling back if the block fails"""
+    conn = get_db_connection()
+    if not conn:
+        raise DatabaseUnavailable('Database connection failed')
+    cursor = conn.cursor(dictionary=True)
+    if instruments:
+        cursor = TimedCursor(cursor, instruments)
+    try:
+        yield conn, cursor
+    except Exception as e:
+        conn.rollback()
+        # Rule rejections are expected outcomes, not errors
+        if instruments and not isinstance(e, ActionRejected):
+            instruments.handler_errors.inc(type(e).__name__)
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+# Reference data (airports, shop items, artifacts) changes only on deploy
+REFERENCE_DATA_TTL = int(os.environ.get('REFERENCE_DATA_TTL', 3600))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def load_reference_rows(query):
+    with db_cursor() as (conn, cursor):
+        cursor.execute(query)
+        return cursor.fetchall()
+
+reference_data = ReferenceCache(load_reference_rows, dumps_bytes, ttl=REFERENCE_DATA_TTL)
+# Airports are held column-wise and also served as parallel arrays (?format=)
+reference_data.register('airports', AirportRepository.LIST_SQL, 'airports', store=AirportStore, formats={
+    'columnar': ('application/json', lambda store: dumps_bytes(dict(store.columnar(), success=True))),
+    'binary': ('application/octet-stream', AirportStore.binary),
+})
+reference_data.register('shop_items', ShopItemRepository.LIST_SQL, 'items')
+reference_data.register('artifacts', ArtifactRepository.LIST_SQL, 'artifacts')
+reference_data.register('event_types', EventTypeRepository.LIST_SQL, 'event_types')
+
+# Large derived arrays are memory-mapped from files all worker processes share
+# when SHARED_DATA_DIR is set (server.py sets it; see shared_data.py)
+SHARED_DATA_DIR = os.environ.get('SHARED_DATA_DIR')
+shared_arrays = SharedArrays(SHARED_DATA_DIR) if SHARED_DATA_DIR else None
+
+def build_distance_matrix(entry):
+    """Map the matrix another process published for these airports, or build and publish it"""
+    if shared_arrays is None or not entry.rows:
+        return DistanceMatrix(entry.rows)
+    arrays = shared_arrays.open('distance', entry.digest)
+    if arrays is not None:
+        return DistanceMatrix.from_arrays(arrays)
+    matrix = DistanceMatrix(entry.rows)
+    try:
+        return DistanceMatrix.from_arrays(shared_arrays.publish('distance', entry.digest, matrix.arrays()))
+    except OSError as e:
+        print(f"Shared distance matrix error, keeping a private copy: {e}")
+        return matrix
+
+# All-pairs airport distances, rebuilt whenever the airports table changes
+distance_matrix = None
+# Route planner memoizes on the matrix it was built with, so it is rebuilt alongside
+route_planner = None
+
+@reference_data.on_change
+def rebuild_distance_matrix(entry):
+    global distance_matrix, route_planner
+    if entry.name == 'airports':
+        distance_matrix = build_distance_matrix(entry)
+        route_planner = RoutePlanner(distance_matrix)
+
+def get_distance_matrix():
+    reference_data.get('airports')
+    return distance_matrix
+
+def get_route_planner():
+    reference_data.get('airports')
+    return route_planner
+
+# Spatial index for "airports near here" queries, rebuilt with the airports table
+airport_index = None
+
+@reference_data.on_change
+def rebuild_airport_index(entry):
+    global airport_index
+    if entry.name == 'airports':
+        airport_index = AirportIndex(entry.rows)
+
+def get_airport_index():
+    reference_data.get('airports')
+    return airport_index
+
+# Clustered map tiles of the airports, rebuilt with the airports table
+AIRPORT_CLUSTER_MAX_ZOOM = int(os.environ.get('AIRPORT_CLUSTER_MAX_ZOOM', 9))
+AIRPORT_CLUSTER_RADIUS = float(os.environ.get('AIRPORT_CLUSTER_RADIUS', 60))
+AIRPORT_TILE_MAX_AGE = int(os.environ.get('AIRPORT_TILE_MAX_AGE', 3600))
+airport_tiles = None
+
+@reference_data.on_change
+def rebuild_airport_tiles(entry):
+    global airport_tiles
+    if entry.name == 'airports':
+        airport_tiles = AirportTiles(entry.store, AIRPORT_CLUSTER_MAX_ZOOM, AIRPORT_CLUSTER_RADIUS)
+
+def get_airport_tiles():
+    reference_data.get('airports')
+    return airport_tiles
+
+# Random picks over cached ids instead of ORDER BY RAND() scans
+samplers = {}
+
+@reference_data.on_change
+def rebuild_samplers(entry):
+    if entry.name == 'airports':
+        samplers['airports'] = IdSampler(entry.by_id)
+    elif entry.name == 'event_types':
+        # Event types without a weight are equally likely
+        samplers['event_types'] = WeightedSampler(
+            entry.rows, lambda row: 1.0 if row.get('weight') is None else float(row['weight'])
+        )
+
+def get_sampler(name):
+    reference_data.get(name)
+    return samplers[name]
+
+def warm_reference_data():
+    try:
+        reference_data.load_all()
+    except Exception as e:
+        print(f"Reference data warm-up failed, loading lazily: {e}")
+
+# Actions between full state snapshots of a game (0 disables snapshots)
+GAME_SNAPSHOT_EVERY = int(os.environ.get('GAME_SNAPSHOT_EVERY', 10))
+
+def game_world():
+    """Reference data and helpers the game transition layer works against"""
+    return GameWorld(
+        airports_by_id=reference_data.get('airports').by_id,
+        artifacts_by_id=reference_data.get('artifacts').by_id,
+        shop_items_by_id=reference_data.get('shop_items').by_id,
+        distance=get_distance_matrix().distance,
+        event_sampler=get_sampler('event_types'),
+        snapshot_every=GAME_SNAPSHOT_EVERY
+    )
+
+# Assembled /api/game/current payloads, invalidated when a game changes
+GAME_SNAPSHOT_TTL = float(os.environ.get('GAME_SNAPSHOT_TTL', 5))
+RECENT_LOG_LIMIT = 10
+
+game_snapshots = SnapshotCache(ttl=GAME_SNAPSHOT_TTL)
+
+# Audit log writer: 'sync' writes inside the request transaction,
+# 'async' hands rows to a background thread after commit
+def invalidate_logged_games(game_ids):
+    for game_id in game_ids:
+        game_snapshots.invalidate(game_id)
+
+log_writer = LogWriter(
+    db_cursor,
+    mode=os.environ.get('LOG_WRITE_MODE', 'sync'),
+    flush_interval=float(os.environ.get('LOG_FLUSH_INTERVAL', 0.5)),
+    batch_size=int(os.environ.get('LOG_BATCH_SIZE', 200)),
+    max_queue=int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+    overflow=os.environ.get('LOG_QUEUE_OVERFLOW', 'block'),
+    on_flush=invalidate_logged_games
+)
+
+# Top-K boards of finished games, written to game_results in batches
+leaderboard = Leaderboard(
+    db_cursor,
+    k=int(os.environ.get('LEADERBOARD_SIZE', 10)),
+    persist_interval=float(os.environ.get('LEADERBOARD_PERSIST_INTERVAL', 30)),
+    refresh_interval=float(os.environ.get('LEADERBOARD_REFRESH_INTERVAL', 60))
+)
+
+def finished_game_result(before, game):
+    """Result row if this request moved the game from ACTIVE to WON/LOST, else None.
+    The distance is the game's own tally, so it does not wait on the log writer."""
+    if before['game_status'] != 'ACTIVE' or game['game_status'] == 'ACTIVE':
+        return None
+    return game_result(game, game['distance_km'])
+
+def relay_game_event(game_id, event, encoded):
+    worker_channel.broadcast('game-event', f'{game_id}\n{event}\n{encoded}')
+
+def deliver_game_event(payload):
+    game_id, event, encoded = payload.split('\n', 2)
+    game_events.deliver(int(game_id), event, encoded)
+
+# Live game updates pushed to /api/game/<id>/stream subscribers. Each open
+# stream holds a thread; server.py caps both settings to fit its workers
+game_events = GameEventBroker(
+    app.json.dumps,
+    heartbeat=float(os.environ.get('SSE_HEARTBEAT', 15)),
+    max_stream=float(os.environ.get('SSE_MAX_STREAM', 300)),
+    relay=relay_game_event if worker_channel else None,
+    max_streams=int(os.environ['SSE_MAX_STREAMS']) if os.environ.get('SSE_MAX_STREAMS') else None
+)
+if worker_channel:
+    worker_channel.on('game-event', deliver_game_event)
+
+def publish_game_change(game_id, before, after, **extra):
+    """Push the fields that changed (plus any extra details) to the game's stream"""
+    changes = state_diff(before, after)
+    if 'current_airport_id' in changes:
+        airport = reference_data.get('airports').by_id.get(after['current_airport_id'], {})
+        for key in ('city', 'country', 'latitude', 'longitude'):
+            changes[key] = airport.get(key)
+    game_events.publish(game_id, 'game', dict(extra, game=changes))
+
+# Request timing and scrape-time gauges
+if instruments:
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            instruments.request_seconds.observe(
+                time.perf_counter() - started, request.method, route, str(response.status_code)
+            )
+            if response.status_code >= 500:
+                instruments.request_errors.inc(route)
+        return response
+
+    pool_gauges = ('open', 'idle', 'in_use', 'checkouts', 'waits', 'timeouts', 'created', 'recycled')
+    instruments.registry.gauge(
+        'db_pool_connections', 'Connection pool counters', lambda: {
+            (key,): value for key, value in db_pool.stats().items() if key in pool_gauges
+        }, ('state',)
+    )
+    instruments.registry.gauge(
+        'log_writer_rows', 'Audit log writer counters', lambda: {
+            (key,): value for key, value in log_writer.stats().items() if key != 'mode'
+        }, ('state',)
+    )
+    instruments.registry.gauge(
+        'game_snapshot_cache', 'Game snapshot cache lookups', lambda: {
+            ('hits',): game_snapshots.hits, ('misses',): game_snapshots.misses
+        }, ('result',)
+    )
+    instruments.registry.gauge(
+        'sse_streams', 'Open /api/game/<id>/stream responses', lambda: {
+            ('open',): game_events.open_streams
+        }, ('state',)
+    )
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of the app's metrics"""
+    if not instruments:
+        return Response('metrics disabled\n', status=404, mimetype='text/plain')
+    body = metrics_store.render() if metrics_store else instruments.render()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+# ==================== ROUTES ====================
+
+@app.route('/')
+def index():
+    return page_cache.response('index.html')
+
+@app.route('/about')
+def about():
+    return page_cache.response('about.html')
+
+@app.route('/resources')
+def resources():
+    return page_cache.response('resources.html')
+
+@app.route('/welcome')
+def welcome():
+    return page_cache.response('welcome.html')
+
+@app.route('/story')
+def story():
+    game_id = request.args.get('game_id') or session.get('game_id')
+    if not game_id:
+        return redirect(url_for('welcome'))
+    return page_cache.response('story.html')
+
+@app.route('/game')
+def game():
+    game_id = request.args.get('game_id') or session.get('game_id')
+    if not game_id:
+        return redirect(url_for('welcome'))
+    return page_cache.response('game.html')
+
+# ==================== API ====================
+
+def parse_id(value):
+    """A row id given as a query or JSON value, or None if it is not one"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/api/game/create', methods=['POST'])
+def create_game():
+    try:
+        data = request.json
+        player_name = data.get('player_name', 'Adventurer').strip()
+        
+        if not player_name:
+            return jsonify({'success': False, 'error': 'Name required'})
+        
+        # Pick a random start airport
+        airport_sampler = get_sampler('airports')
+        start_airport_id = airport_sampler.choice()
+        
+        if start_airport_id is None:
+            return jsonify({'success': False, 'error': 'No airports found in database'})
+        
+        # Pick random unique airports for artifact delivery (excluding start airport)
+        all_artifacts = reference_data.rows('artifacts')
+        delivery_airport_ids = airport_sampler.sample(len(all_artifacts), exclude=[start_airport_id])
+        
+        if len(delivery_airport_ids) < len(all_artifacts):
+            return jsonify({'success': False, 'error': 'Not enough airports for artifact delivery'})
+        
+        # Events are drawn from this seed, so the game can be replayed exactly
+        rng_seed = int.from_bytes(os.urandom(7), 'big')
+        
+        with db_cursor() as (conn, cursor):
+            # Insert new game
+            game_id = GameRepository.create(
+                cursor, player_name, start_airport_id,
+                game_rules.STARTING_MONEY, game_rules.STARTING_FUEL_KM, game_rules.STARTING_FUEL_CAPACITY,
+                rng_seed=rng_seed
+            )
+        
+            # Assign random airports to each artifact (one multi-row insert)
+            ArtifactRepository.create_locations(cursor, game_id, zip(all_artifacts, delivery_airport_ids))
+        
+            # Replays start from this seq-0 snapshot
+            locations = {
+                artifact['artifact_order']: {
+                    'id': None, 'artifact_id': artifact['id'],
+                    'delivery_airport_id': airport_id, 'is_delivered': 0,
+                }
+                for artifact, airport_id in zip(all_artifacts, delivery_airport_ids)
+            }
+            GameStateSnapshotRepository.insert(
+                cursor, game_id, 0,
+                json.dumps(snapshot_state(new_game_state(start_airport_id, rng_seed), locations))
+            )
+        
+            # Log the start
+            log_writer.write(conn, cursor, [log_entry(game_id, 'event', f"Game started for {player_name}")])
+        
+            conn.commit()
+        
+            # Store in session
+            session['game_id'] = game_id
+            session['player_name'] = player_name
+        
+            return jsonify({
+                'success': True, 
+                'game_id': game_id,
+                'player_name': player_name
+            })
+        
+    except Exception as e:
+        print(f"Create Error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/game/current')
+def get_current_game():
+    game_id = request.args.get('game_id') or session.get('game_id')
+    since_log_id = request.args.get('since_log_id', type=int)
+    
+    if not game_id:
+        return jsonify({'success': False, 'error': 'No game ID provided'})
+    game_id = parse_id(game_id)
+    if game_id is None:
+        return jsonify({'success': False, 'error': 'Invalid game ID'}), 400
+    
+    try:
+        snapshot = game_snapshots.get(game_id, load_game_snapshot)
+        
+        if not snapshot:
+            return jsonify({'success': False, 'error': 'Game not found'})
+        
+        logs = snapshot['logs']
+        if since_log_id is not None:
+            logs = [log for log in logs if log['id'] > since_log_id]
+        
+        return jsonify({
+            'success': True, 
+            'game': snapshot['game'], 
+            'current_artifact': snapshot['current_artifact'],
+            'all_artifacts': snapshot['all_artifacts'],
+            'logs': logs,
+            'last_log_id': snapshot['logs'][0]['id'] if snapshot['logs'] else since_log_id
+        })
+        
+    except Exception as e:
+        print(f"Get current game error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def load_game_snapshot(game_id):
+    """Assemble the current-game payload: game row, artifact progress and recent logs"""
+    with db_cursor() as (conn, cursor):
+        # Game row and its artifact locations in one round trip
+        rows = GameRepository.load_with_locations(cursor, game_id)
+        
+        if not rows:
+            return None
+        
+        # Falls back to the archive once a finished game's logs were compacted
+        logs, _ = read_history(cursor, game_id, limit=RECENT_LOG_LIMIT)
+    
+    # Airport and artifact details come from the reference cache, not joins
+    airports_by_id = reference_data.get('airports').by_id
+    artifacts_by_id = reference_data.get('artifacts').by_id
+    
+    game = {
+        key: value for key, value in rows[0].items()
+        if not key.startswith('gal_') and key not in PRIVATE_COLUMNS
+    }
+    airport = airports_by_id.get(game['current_airport_id'], {})
+    game.update({
+        'airport_code': airport.get('code'),
+        'airport_name': airport.get('name'),
+        'city': airport.get('city'),
+        'country': airport.get('country'),
+        'latitude': airport.get('latitude'),
+        'longitude': airport.get('longitude')
+    })
+    # Rows that hit a limit before status was settled on write show their
+    # outcome; the archive job (settle_finished_games) persists it
+    if game['game_status'] == 'ACTIVE':
+        game['game_status'] = game_outcome(game)
+    
+    all_artifacts = []
+    current_artifact = None
+    for row in rows:
+        if row['gal_id'] is None:
+            continue
+        artifact = artifacts_by_id.get(row['gal_artifact_id'], {})
+        delivery_airport = airports_by_id.get(row['gal_delivery_airport_id'], {})
+        entry = {
+            'id': row['gal_id'],
+            'game_id': game['id'],
+            'artifact_id': row['gal_artifact_id'],
+            'artifact_order': row['gal_artifact_order'],
+            'delivery_airport_id': row['gal_delivery_airport_id'],
+            'is_delivered': row['gal_is_delivered'],
+            'delivered_at': row['gal_delivered_at'],
+            'artifact_name': artifact.get('name'),
+            'artifact_description': artifact.get('description'),
+            'delivery_reward_money': artifact.get('delivery_reward_money'),
+            'delivery_reward_fuel': artifact.get('delivery_reward_fuel'),
+            'delivery_airport_code': delivery_airport.get('code'),
+            'delivery_airport_name': delivery_airport.get('name')
+        }
+        all_artifacts.append(entry)
+        
+        if entry['artifact_order'] == game['current_artifact_number']:
+            current_artifact = dict(entry, **{
+                'delivery_city': delivery_airport.get('city'),
+                'delivery_country': delivery_airport.get('country'),
+                'delivery_lat': delivery_airport.get('latitude'),
+                'delivery_lng': delivery_airport.get('longitude')
+            })
+    
+    return {
+        'game': game,
+        'current_artifact': current_artifact,
+        'all_artifacts': all_artifacts,
+        'logs': logs
+    }
+
+@app.route('/api/game/travel', methods=['POST'])
+def travel():
+    try:
+        data = request.json
+        game_id = data.get('game_id') or session.get('game_id')
+        dest_id = data.get('destination_airport_id')
+        
+        if not game_id:
+            return jsonify({'success': False, 'error': 'No game ID'})
+        if not dest_id:
+            return jsonify({'success': False, 'error': 'No destination specified'})
+        game_id, dest_id = parse_id(game_id), parse_id(dest_id)
+        if game_id is None or dest_id is None:
+            return jsonify({'success': False, 'error': 'Invalid game or destination ID'}), 400
+        
+        with db_cursor() as (conn, cursor):
+            # One read, in-memory rules, one guarded write
+            txn = GameTransaction(cursor, game_id, game_world())
+            before = dict(txn.load())
+            result = txn.travel(dest_id)
+            txn.save()
+            finished = finished_game_result(before, txn.game)
+            log_writer.write(conn, cursor, txn.logs)
+            conn.commit()
+        
+        if finished:
+            leaderboard.record(finished)
+        game_snapshots.invalidate(game_id)
+        publish_game_change(game_id, before, result['game'], event=result['event'], delivery=result['delivery'])
+        
+        return jsonify(dict(result, success=True))
+        
+    except ActionRejected as e:
+        return jsonify({'success': False, 'error': e.message, 'reason': e.reason})
+    except Exception as e:
+        print(f"Travel error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Upper bound on commands per /actions request
+MAX_BATCH_ACTIONS = int(os.environ.get('MAX_BATCH_ACTIONS', 50))
+
+@app.route('/api/game/<int:game_id>/actions', methods=['POST'])
+def run_actions(game_id):
+    """Apply an ordered list of buy/travel commands with one read and one write"""
+    try:
+        data = request.json or {}
+        actions = data.get('actions')
+        stop_on_error = data.get('stop_on_error', True)
+        
+        if not isinstance(actions, list) or not actions:
+            return jsonify({'success': False, 'error': 'No actions specified'})
+        if len(actions) > MAX_BATCH_ACTIONS:
+            return jsonify({'success': False, 'error': f'Too many actions (max {MAX_BATCH_ACTIONS})'})
+        
+        with db_cursor() as (conn, cursor):
+            txn = GameTransaction(cursor, game_id, game_world())
+            before = dict(txn.load())
+            results = txn.run(actions, stop_on_error=stop_on_error)
+            changed = txn.save()
+            finished = finished_game_result(before, txn.game)
+            log_writer.write(conn, cursor, txn.logs)
+            conn.commit()
+        
+        if finished:
+            leaderboard.record(finished)
+        game = txn.game_view()
+        if changed:
+            game_snapshots.invalidate(game_id)
+            delivered = any(r.get('delivery', {}).get('delivered') for r in results if r['success'])
+            publish_game_change(game_id, before, game, delivery={'delivered': delivered})
+        
+        return jsonify({
+            'success': True,
+            'applied': sum(1 for r in results if r['success']),
+            'results': results,
+            'game': game
+        })
+        
+    except ActionRejected as e:
+        return jsonify({'success': False, 'error': e.message, 'reason': e.reason})
+    except Exception as e:
+        print(f"Run actions error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/game/<int:game_id>/stream')
+def stream_game(game_id):
+    """Server-Sent Events feed of changes to one game"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(
+        stream_with_context(game_events.stream(game_id, last_event_id)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Largest page /api/game/<id>/logs serves
+MAX_LOG_PAGE = 200
+
+@app.route('/api/game/<int:game_id>/logs')
+def get_game_logs(game_id):
+    """A page of the game's log, newest first; pass next_before_id back as before_id"""
+    before_id = request.args.get('before_id', type=int)
+    limit = request.args.get('limit', 50, type=int)
+    if not 1 <= limit <= MAX_LOG_PAGE:
+        return jsonify({'success': False, 'error': f'limit must be between 1 and {MAX_LOG_PAGE}'})
+    try:
+        with db_cursor() as (conn, cursor):
+            logs, next_before_id = read_history(cursor, game_id, before_id, limit)
+        return jsonify({'success': True, 'logs': logs, 'next_before_id': next_before_id})
+    except Exception as e:
+        print(f"Get game logs error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/game/<int:game_id>/destinations')
+def get_destinations(game_id):
+    """Airports the game can legally fly to next, with distance and fuel cost"""
+    try:
+        with db_cursor() as (conn, cursor):
+            game = GameRepository.load(
+                cursor, game_id, 'current_airport_id, fuel_km, fuel_efficiency_bonus, flights_taken, game_status'
+            )
+        
+        if not game:
+            return jsonify({'success': False, 'error': 'Game not found'})
+        
+        destinations = []
+        if game['game_status'] == 'ACTIVE' and game['flights_taken'] < MAX_FLIGHTS:
+            fuel_factor = 1 - (game['fuel_efficiency_bonus'] or 0) / 100.0
+            fuel_km = float(game['fuel_km'])
+            max_km = fuel_km / fuel_factor if fuel_factor > 0 else float('inf')
+            ids, distances = get_distance_matrix().reachable_from(
+                game['current_airport_id'], max_km, MIN_FLIGHT_KM
+            )
+            fuel_costs = distances * fuel_factor
+            affordable = fuel_costs <= fuel_km
+            destinations = [
+                {'airport_id': airport_id, 'distance': dist, 'fuel_cost': round(fuel, 1)}
+                for airport_id, dist, fuel in zip(
+                    ids[affordable].tolist(), distances[affordable].tolist(), fuel_costs[affordable].tolist()
+                )
+            ]
+        
+        return jsonify({
+            'success': True,
+            'current_airport_id': game['current_airport_id'],
+            'destinations': destinations
+        })
+        
+    except Exception as e:
+        print(f"Get destinations error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/game/<int:game_id>/plan')
+def get_plan(game_id):
+    """Fewest-flight route that still wins the game, if there is one"""
+    try:
+        with db_cursor() as (conn, cursor):
+            txn = GameTransaction(cursor, game_id, game_world())
+            game = txn.load()
+        
+        artifacts = reference_data.get('artifacts').by_id
+        deliveries = [
+            (location['delivery_airport_id'], artifacts[location['artifact_id']])
+            for order, location in sorted(txn.locations.items())
+            if order >= game['current_artifact_number'] and not location['is_delivered']
+        ]
+        fuel_items = [item for item in reference_data.rows('shop_items') if item['category'] == 'fuel']
+        plan = get_route_planner().plan(game, deliveries, fuel_items)
+        
+        airports = reference_data.get('airports').by_id
+        route = [dict(hop, code=airports[hop['airport_id']]['code']) for hop in plan['route']]
+        
+        return jsonify(dict(plan, success=True, route=route))
+        
+    except ActionRejected as e:
+        return jsonify({'success': False, 'error': e.message, 'reason': e.reason})
+    except Exception as e:
+        print(f"Get plan error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/game/buy', methods=['POST'])
+def buy_item():
+    try:
+        data = request.json
+        game_id = data.get('game_id') or session.get('game_id')
+        item_id = data.get('shop_item_id')
+        
+        if not game_id:
+            return jsonify({'success': False, 'error': 'No game ID'})
+        if not item_id:
+            return jsonify({'success': False, 'error': 'No item specified'})
+        game_id, item_id = parse_id(game_id), parse_id(item_id)
+        if game_id is None or item_id is None:
+            return jsonify({'success': False, 'error': 'Invalid game or item ID'}), 400
+        
+        with db_cursor() as (conn, cursor):
+            txn = GameTransaction(cursor, game_id, game_world())
+            before = dict(txn.load())
+            result = txn.buy(item_id)
+            txn.save()
+            log_writer.write(conn, cursor, txn.logs)
+            conn.commit()
+        
+        game_snapshots.invalidate(game_id)
+        publish_game_change(game_id, before, result['game'])
+        
+        return jsonify(dict(result, success=True))
+        
+    except ActionRejected as e:
+        return jsonify({'success': False, 'error': e.message, 'reason': e.reason})
+    except Exception as e:
+        print(f"Buy error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Static data endpoints
+def reference_response(name, fmt='json'):
+    """Serve a cached reference table as pre-built bytes, honouring If-None-Match"""
+    payload = reference_data.get(name).payloads.get(fmt)
+    if payload is None:
+        return jsonify({'success': False, 'error': f'Unknown format: {fmt}'}), 400
+    return payload_response(payload)
+
+def payload_response(payload, cache_control='public, no-cache'):
+    encoding, body, etag = payload.negotiate(request.accept_encodings)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=payload.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/api/airports')
+def get_airports():
+    """All airports; ?format=columnar or ?format=binary for the compact encodings"""
+    try:
+        return reference_response('airports', request.args.get('format', 'json'))
+    except Exception as e:
+        print(f"Get airports error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/airports/tiles/<int:z>/<int:x>/<int:y>')
+def get_airport_tile(z, x, y):
+    """Airports and clusters inside one slippy-map tile (see airport_tiles.py)"""
+    try:
+        if not valid_tile(z, x, y):
+            return jsonify({'success': False, 'error': 'Invalid tile'}), 400
+        tiles = get_airport_tiles()
+        payload = tiles.cached((z, x, y), lambda: Payload(
+            'airport-tile', dumps_bytes(dict(tiles.tile(z, x, y), success=True))
+        ))
+        return payload_response(payload, f'public, max-age={AIRPORT_TILE_MAX_AGE}')
+    except Exception as e:
+        print(f"Get airport tile error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/shop-items')
+def get_shop_items():
+    try:
+        return reference_response('shop_items')
+    except Exception as e:
+        print(f"Get shop items error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/artifacts')
+def get_artifacts():
+    try:
+        return reference_response('artifacts')
+    except Exception as e:
+        print(f"Get artifacts error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Most airports /api/airports/nearby returns
+MAX_NEARBY = 100
+
+@app.route('/api/airports/nearby')
+def get_nearby_airports():
+    """Airports near a point: ?lat=&lng= plus radius_km and/or k"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        radius_km = request.args.get('radius_km', type=float)
+        k = request.args.get('k', type=int)
+        
+        if lat is None or lng is None:
+            return jsonify({'success': False, 'error': 'lat and lng are required'}), 400
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({'success': False, 'error': 'lat or lng out of range'}), 400
+        if radius_km is not None and not radius_km > 0:
+            return jsonify({'success': False, 'error': 'radius_km must be positive'}), 400
+        if k is not None and not 1 <= k <= MAX_NEARBY:
+            return jsonify({'success': False, 'error': f'k must be between 1 and {MAX_NEARBY}'}), 400
+        if radius_km is None and k is None:
+            k = 10
+        
+        index = get_airport_index()
+        if k is not None:
+            ids, distances = index.query_nearest(lat, lng, k, radius_km)
+        else:
+            ids, distances = index.query_radius(lat, lng, radius_km)
+            ids, distances = ids[:MAX_NEARBY], distances[:MAX_NEARBY]
+        
+        airports_by_id = reference_data.get('airports').by_id
+        airports = [
+            dict(airports_by_id[airport_id], distance_km=round(dist, 1))
+            for airport_id, dist in zip(ids.tolist(), distances.tolist())
+        ]
+        return jsonify({'success': True, 'airports': airports})
+        
+    except Exception as e:
+        print(f"Get nearby airports error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/leaderboard')
+def get_leaderboard():
+    """Best finished games per board and overall player statistics"""
+    try:
+        return jsonify(dict(leaderboard.snapshot(), success=True))
+    except Exception as e:
+        print(f"Get leaderboard error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def reload_reference_data(payload=None):
+    reference_data.invalidate()
+    reference_data.load_all()
+
+if worker_channel:
+    worker_channel.on('reference-data', reload_reference_data)
+
+@app.route('/api/admin/reference-data/refresh', methods=['POST'])
+def refresh_reference_data():
+    """Reload reference tables after the database was reseeded, in every worker"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    try:
+        reload_reference_data()
+        workers = worker_channel.broadcast('reference-data', '') if worker_channel else 0
+        return jsonify({'success': True, 'versions': reference_data.versions(), 'other_workers': workers})
+    except Exception as e:
+        print(f"Refresh reference data error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Live logs of finished games are kept this long before being archived
+LOG_RETENTION_HOURS = float(os.environ.get('LOG_RETENTION_HOURS', 24))
+
+@app.route('/api/admin/logs/archive', methods=['POST'])
+def archive_logs():
+    """Settle games that reached a limit, then fold logs of finished games
+    past the retention period into archive records"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    try:
+        settled = settle_finished_games(db_cursor)
+        games, rows = archive_finished_games(db_cursor, timedelta(hours=LOG_RETENTION_HOURS))
+        return jsonify({'success': True, 'settled': settled, 'games': games, 'rows': rows})
+    except Exception as e:
+        print(f"Archive logs error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/game/reset', methods=['POST'])
+def reset_game():
+    """Reset game state"""
+    session.clear()
+    return jsonify({'success': True, 'message': 'Game reset'})
+
+if STORAGE_BOOTSTRAP:
+    try:
+        loaded = initialize_storage(storage_backend, STORAGE_SEED)
+        if loaded:
+            print(f"Seeded {storage_backend.name} storage: {loaded}")
+    except Exception as e:
+        print(f"Storage bootstrap error: {e}")
+
+if STORAGE_SCHEMA_CHECK:
+    try:
+        check_schema(storage_backend)
+    except DB_ERRORS as e:
+        # Database unreachable: start anyway, routes report errors until it is back
+        print(f"Storage schema check skipped: {e}")
+
+warm_reference_data()
+
+def start_worker():
+    """Per-process setup of a server.py worker, after it imported this module"""
+    if worker_channel:
+        worker_channel.start()
+    if metrics_store:
+        metrics_store.start()
+
+def stop_worker():
+    """Write out what an exiting server.py worker still holds in memory"""
+    log_writer.close()
+    leaderboard.persist()
+    if metrics_store:
+        metrics_store.retire()
+    if worker_channel:
+        worker_channel.close()
+    db_pool.close_all()
+
+# Development server; production runs pre-forked workers via server.py
+if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""Compare /api/airports payload sizes and decode times across formats.
+
+Usage: python benchmarks/bench_airport_payload.py [--airports 5000]
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from airport_store import BINARY_HEADER, AirportStore
+from json_provider import dumps_bytes
+from standin_db import synthetic_seed
+
+
+def timed(fn, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) * 1000 / repeat
+
+
+def decode_columnar(body):
+    data = json.loads(body)
+    return data, np.frombuffer(base64.b64decode(data['latlng']), dtype='<f4')
+
+
+def decode_binary(body):
+    _, _, count, tables_length = BINARY_HEADER.unpack_from(body)
+    offset = BINARY_HEADER.size
+    ids = np.frombuffer(body, dtype='<i4', count=count, offset=offset)
+    lat = np.frombuffer(body, dtype='<f4', count=count, offset=offset + 4 * count)
+    lng = np.frombuffer(body, dtype='<f4', count=count, offset=offset + 8 * count)
+    return ids, lat, lng, json.loads(body[len(body) - tables_length:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--airports', type=int, default=5000)
+    args = parser.parse_args()
+
+    rows = synthetic_seed(args.airports, random.Random(3))['airports']
+    for i, row in enumerate(rows):
+        row['id'] = i + 1
+
+    started = time.perf_counter()
+    store = AirportStore(rows)
+    print(f"airports: {len(store)}  store build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    bodies = {
+        'json': dumps_bytes({'success': True, 'airports': rows}),
+        'columnar': dumps_bytes(dict(store.columnar(), success=True)),
+        'binary': store.binary(),
+    }
+    decoders = {'json': json.loads, 'columnar': decode_columnar, 'binary': decode_binary}
+
+    print(f"{'format':<10} {'bytes':>10} {'gzip':>10} {'decode ms':>10}")
+    for fmt, body in bodies.items():
+        _, decode_ms = timed(lambda: decoders[fmt](body))
+        print(f"{fmt:<10} {len(body):>10} {len(gzip.compress(body, 9)):>10} {decode_ms:>10.2f}")
+
+    # Round trip: every format describes the same airports
+    ids, lat, lng, tables = decode_binary(bodies['binary'])
+    assert ids.tolist() == [row['id'] for row in rows]
+    assert np.allclose(lat, [row['latitude'] for row in rows], atol=1e-4)
+    assert tables['code'] == [row['code'] for row in rows]
+    data, latlng = decode_columnar(bodies['columnar'])
+    assert np.allclose(latlng[1::2], [row['longitude'] for row in rows], atol=1e-4)
+    assert [data['city']['values'][i] for i in data['city']['index']] == [row['city'] for row in rows]
+    assert store[rows[7]['id']]['country'] == rows[7]['country']
+    print("round trip: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compare a viewport's airport tiles with the full airports payload.
+
+Builds the cluster hierarchy, then for a typical viewport at each zoom
+(4 x 3 tiles around Europe) reports the points drawn, the bytes sent and
+the time to cut the tiles. Also checks that every airport is counted once
+per zoom level.
+
+Usage: python benchmarks/bench_airport_tiles.py [--airports 50000]
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from airport_store import AirportStore
+from airport_tiles import AirportTiles, project
+from json_provider import dumps_bytes
+from standin_db import synthetic_seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--airports', type=int, default=50000)
+    parser.add_argument('--radius', type=float, default=60)
+    args = parser.parse_args()
+
+    rows = synthetic_seed(args.airports, random.Random(3))['airports']
+    for i, row in enumerate(rows):
+        row['id'] = i + 1
+    store = AirportStore(rows)
+
+    started = time.perf_counter()
+    tiles = AirportTiles(store, radius=args.radius)
+    print(f"airports: {len(store)}  hierarchy build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    full = dumps_bytes(dict(store.columnar(), success=True))
+    print(f"full columnar payload: {len(full)} bytes, {len(gzip.compress(full, 9))} gzip, {len(store)} markers")
+
+    cx, cy = project(50.0, 10.0)
+    print(f"{'zoom':>4} {'tiles':>6} {'markers':>8} {'bytes':>9} {'gzip':>8} {'ms':>7}")
+    for z in range(2, 13, 2):
+        scale = 1 << z
+        xs = range(max(0, int(cx * scale) - 2), min(scale, int(cx * scale) + 2))
+        ys = range(max(0, int(cy * scale) - 1), min(scale, int(cy * scale) + 2))
+        started = time.perf_counter()
+        bodies = [dumps_bytes(tiles.tile(z, x, y)) for x in xs for y in ys]
+        elapsed = (time.perf_counter() - started) * 1000
+        markers = sum(len(t['airports']) + len(t['clusters']) for t in (tiles.tile(z, x, y) for x in xs for y in ys))
+        size = sum(len(body) for body in bodies)
+        gz = sum(len(gzip.compress(body, 9)) for body in bodies)
+        print(f"{z:>4} {len(bodies):>6} {markers:>8} {size:>9} {gz:>8} {elapsed:>7.2f}")
+
+    for z in range(tiles.max_zoom + 2):
+        assert int(tiles.level(z).count.sum()) == len(store), z
+    print("counts per zoom: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare the precomputed distance matrix with per-call calculate_distance.
+
+Usage: python benchmarks/bench_distance_matrix.py [--airports 5000] [--origins 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distance_matrix import DistanceMatrix, calculate_distance
+
+
+def make_airports(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        {'id': i + 1, 'latitude': rng.uniform(-60, 75), 'longitude': rng.uniform(-180, 180)}
+        for i in range(count)
+    ]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--airports', type=int, default=5000)
+    parser.add_argument('--origins', type=int, default=50)
+    args = parser.parse_args()
+
+    airports = make_airports(args.airports)
+    origins = airports[:args.origins]
+
+    matrix, build_s = timed(lambda: DistanceMatrix(airports))
+    print(f"airports: {len(airports)}  origins: {len(origins)}")
+    print(f"matrix build:           {build_s * 1000:9.1f} ms  ({matrix.matrix.nbytes / 1e6:.1f} MB)")
+
+    def scalar_rows():
+        return [
+            [calculate_distance(o['latitude'], o['longitude'], a['latitude'], a['longitude']) for a in airports]
+            for o in origins
+        ]
+
+    # distances_from() is only a view of a matrix row, so materialize the
+    # whole-km values the way the scalar version produces them
+    def matrix_rows():
+        return [matrix.distances_from(o['id']).astype(np.int64) for o in origins]
+
+    def matrix_reachable():
+        return [matrix.reachable_from(o['id'], 3000, 200) for o in origins]
+
+    scalar, scalar_s = timed(scalar_rows)
+    rows, matrix_s = timed(matrix_rows)
+    _, reachable_s = timed(matrix_reachable)
+    print(f"one-to-all (scalar):    {scalar_s * 1000:9.1f} ms")
+    print(f"one-to-all (matrix):    {matrix_s * 1000:9.3f} ms  ({scalar_s / matrix_s:,.0f}x)")
+    print(f"reachable_from:         {reachable_s * 1000:9.3f} ms  ({scalar_s / reachable_s:,.0f}x)")
+
+    pairs = [(random.choice(airports), random.choice(airports)) for _ in range(100000)]
+    _, scalar_pair_s = timed(lambda: [
+        calculate_distance(a['latitude'], a['longitude'], b['latitude'], b['longitude']) for a, b in pairs
+    ])
+    _, matrix_pair_s = timed(lambda: [matrix.distance(a['id'], b['id']) for a, b in pairs])
+    print(f"100k pairs (scalar):    {scalar_pair_s * 1000:9.1f} ms")
+    print(f"100k pairs (matrix):    {matrix_pair_s * 1000:9.1f} ms  ({scalar_pair_s / matrix_pair_s:,.1f}x)")
+
+    # calculate_distance truncates to whole km, so compare the truncated values
+    mismatches = sum(int(row[j]) != scalar_row[j] for row, scalar_row in zip(rows, scalar) for j in range(len(airports)))
+    print(f"truncated km mismatches: {mismatches} of {len(rows) * len(airports)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Time delivery-route plans on a synthetic airport set.
+
+Usage: python benchmarks/bench_route_planner.py [--airports 5000] [--games 50] [--capacity 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distance_matrix import DistanceMatrix
+from route_planner import RoutePlanner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--airports', type=int, default=5000)
+    parser.add_argument('--games', type=int, default=50)
+    parser.add_argument('--capacity', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    airports = [
+        {'id': i + 1, 'latitude': rng.uniform(-60, 75), 'longitude': rng.uniform(-180, 180)}
+        for i in range(args.airports)
+    ]
+    started = time.perf_counter()
+    planner = RoutePlanner(DistanceMatrix(airports))
+    print(f"airports: {len(airports)}  matrix build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    artifacts = [{'id': n, 'delivery_reward_money': 1000, 'delivery_reward_fuel': 1500} for n in range(1, 11)]
+    fuel_items = [{'id': 1, 'price': 500, 'effect_value': 1000, 'category': 'fuel', 'name': 'Fuel'}]
+    games = []
+    for _ in range(args.games):
+        ids = rng.sample(range(1, args.airports + 1), 11)
+        game = {
+            'current_airport_id': ids[0], 'flights_taken': 0, 'game_status': 'ACTIVE',
+            'fuel_km': args.capacity / 2, 'money': 10 ** 6, 'max_fuel_capacity': args.capacity,
+            'fuel_efficiency_bonus': 0, 'artifacts_delivered': 0, 'current_artifact_number': 1,
+        }
+        games.append((game, list(zip(ids[1:], artifacts))))
+
+    for label in ('cold', 'memoized'):
+        timings = []
+        winnable = 0
+        for game, deliveries in games:
+            started = time.perf_counter()
+            plan = planner.plan(game, deliveries, fuel_items)
+            timings.append((time.perf_counter() - started) * 1000)
+            winnable += plan['winnable']
+        timings.sort()
+        print(f"{label:9s} median {timings[len(timings) // 2]:.2f} ms  "
+              f"max {timings[-1]:.2f} ms  winnable {winnable}/{len(games)}")
+
+
+if __name__ == '__main__':
+    main()
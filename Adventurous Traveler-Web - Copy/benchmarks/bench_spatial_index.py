@@ -0,0 +1,68 @@
+"""Time nearest-airport and radius queries on the spatial index.
+
+Usage: python benchmarks/bench_spatial_index.py [--airports 50000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distance_matrix import haversine_km
+from spatial_index import AirportIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--airports', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--radius', type=float, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    airports = [
+        {'id': i + 1, 'latitude': rng.uniform(-60, 75), 'longitude': rng.uniform(-180, 180)}
+        for i in range(args.airports)
+    ]
+    lat = np.array([a['latitude'] for a in airports])
+    lng = np.array([a['longitude'] for a in airports])
+    ids = np.array([a['id'] for a in airports])
+
+    started = time.perf_counter()
+    index = AirportIndex(airports)
+    print(f"airports: {len(index)}  build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    queries = [(rng.uniform(-60, 75), rng.uniform(-180, 180)) for _ in range(args.queries)]
+
+    started = time.perf_counter()
+    radius_results = [index.query_radius(qlat, qlng, args.radius) for qlat, qlng in queries]
+    radius_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    started = time.perf_counter()
+    nearest_results = [index.query_nearest(qlat, qlng, args.k) for qlat, qlng in queries]
+    nearest_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    started = time.perf_counter()
+    for qlat, qlng in queries[:200]:
+        haversine_km(qlat, qlng, lat, lng)
+    scan_ms = (time.perf_counter() - started) * 1000 / 200
+
+    print(f"radius {args.radius:g} km:   {radius_ms:.3f} ms/query")
+    print(f"nearest k={args.k}:     {nearest_ms:.3f} ms/query")
+    print(f"full numpy scan:  {scan_ms:.3f} ms/query")
+
+    # Spot-check against a brute-force scan
+    for (qlat, qlng), (r_ids, _), (n_ids, _) in list(zip(queries, radius_results, nearest_results))[:50]:
+        dist = haversine_km(qlat, qlng, lat, lng)
+        assert set(r_ids.tolist()) == set(ids[dist <= args.radius].tolist())
+        assert n_ids.tolist() == ids[np.argsort(dist)[:args.k]].tolist()
+    print("results match brute force")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""Drive concurrent simulated players through the game API and report latency.
+
+By default the app runs in-process against a seeded SQLite database (see
+standin_db.py), so no MySQL is needed; pass --url to load a running server
+instead. Each player plays sessions of create -> current -> a number of
+flights (destinations, travel, sometimes a purchase, current). Per endpoint
+the report has request, rejection and error counts, throughput and
+p50/p95/p99 latency, and it is written as JSON to --output. With --baseline,
+p95 latencies are compared against an earlier report and the exit status is
+1 on a regression.
+
+Usage: python benchmarks/load_test.py [--players 20] [--sessions 3] [--flights 8]
+                                      [--url http://localhost:5000] [--output load_test.json]
+                                      [--baseline previous.json] [--tolerance 0.2]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class Recorder:
+    """Latencies and errors per endpoint, shared by all player threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.outcomes = {}
+
+    def record(self, endpoint, seconds, outcome):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            counts = self.outcomes.setdefault(endpoint, {'rejected': 0, 'errors': 0})
+            if outcome != 'ok':
+                counts[outcome] += 1
+
+    def report(self, wall_seconds):
+        endpoints = {}
+        with self._lock:
+            for endpoint, samples in sorted(self.latencies.items()):
+                samples = sorted(samples)
+                endpoints[endpoint] = {
+                    'requests': len(samples),
+                    'rejected': self.outcomes[endpoint]['rejected'],
+                    'errors': self.outcomes[endpoint]['errors'],
+                    'throughput_rps': round(len(samples) / wall_seconds, 2),
+                    'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+                    'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                    'p95_ms': round(percentile(samples, 95) * 1000, 3),
+                    'p99_ms': round(percentile(samples, 99) * 1000, 3),
+                    'max_ms': round(samples[-1] * 1000, 3),
+                }
+        return endpoints
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, int(round(pct / 100.0 * len(sorted_samples))))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+class InProcessClient:
+    """Calls the Flask app directly through its test client"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def get(self, path):
+        response = self._client.get(path)
+        return response.status_code, response.get_json()
+
+    def post(self, path, body):
+        response = self._client.post(path, json=body)
+        return response.status_code, response.get_json()
+
+
+class HttpClient:
+    """One keep-alive HTTP connection to a running server"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self._conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+    def _request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        self._conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = self._conn.getresponse()
+        payload = response.read()
+        return response.status, json.loads(payload) if payload else None
+
+    def get(self, path):
+        return self._request('GET', path)
+
+    def post(self, path, body):
+        return self._request('POST', path, body)
+
+
+def timed(recorder, endpoint, call, *args):
+    """Make one request; game-rule rejections (with a reason) are not errors"""
+    started = time.perf_counter()
+    try:
+        status, data = call(*args)
+    except Exception:
+        status, data = None, None
+    if status == 200 and data and data.get('success', True):
+        outcome = 'ok'
+    elif status == 200 and data and data.get('reason'):
+        outcome = 'rejected'
+    else:
+        outcome = 'errors'
+    recorder.record(endpoint, time.perf_counter() - started, outcome)
+    return data if outcome == 'ok' else None
+
+
+def play_session(client, recorder, rng, flights, item_ids, buy_chance):
+    """One player's game from creation through a number of flights"""
+    created = timed(recorder, 'create_game', client.post, '/api/game/create',
+                    {'player_name': f'Player {rng.randint(1, 10 ** 6)}'})
+    if not created:
+        return
+    game_id = created['game_id']
+    current = timed(recorder, 'get_current_game', client.get, f'/api/game/current?game_id={game_id}')
+    last_log_id = current.get('last_log_id') if current else None
+
+    for _ in range(flights):
+        destinations = timed(recorder, 'destinations', client.get, f'/api/game/{game_id}/destinations')
+        if destinations is None:
+            break
+        if not destinations['destinations'] or rng.random() < buy_chance:
+            timed(recorder, 'buy_item', client.post, '/api/game/buy',
+                  {'game_id': game_id, 'shop_item_id': rng.choice(item_ids)})
+        if destinations['destinations']:
+            target = rng.choice(destinations['destinations'])['airport_id']
+            timed(recorder, 'travel', client.post, '/api/game/travel',
+                  {'game_id': game_id, 'destination_airport_id': target})
+
+        path = f'/api/game/current?game_id={game_id}'
+        if last_log_id:
+            path += f'&since_log_id={last_log_id}'
+        current = timed(recorder, 'get_current_game', client.get, path)
+        if current:
+            last_log_id = current.get('last_log_id') or last_log_id
+            if current['game']['game_status'] != 'ACTIVE':
+                break
+
+
+def compare(report, baseline, tolerance):
+    """Endpoints whose p95 grew by more than tolerance over the baseline"""
+    regressions = []
+    for endpoint, stats in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(endpoint)
+        if before and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((endpoint, before['p95_ms'], stats['p95_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=3, help='games per player')
+    parser.add_argument('--flights', type=int, default=8, help='flights per game')
+    parser.add_argument('--buy-chance', type=float, default=0.3)
+    parser.add_argument('--airports', type=int, default=1000, help='airports to seed into sqlite')
+    parser.add_argument('--url', help='load a running server instead of the in-process app')
+    parser.add_argument('--output', default='load_test.json')
+    parser.add_argument('--baseline', help='earlier report to compare p95 latencies against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+        item_ids = [item['id'] for item in HttpClient(args.url).get('/api/shop-items')[1]['items']]
+        target = args.url
+    else:
+        import standin_db
+        import app as game_app
+        workdir = tempfile.mkdtemp(prefix='load-test-')
+        db_path = os.path.join(workdir, 'game.sqlite')
+        standin_db.install(game_app, standin_db.create(db_path, args.airports, args.seed))
+        make_client = lambda: InProcessClient(game_app.app)
+        item_ids = [item['id'] for item in game_app.reference_data.rows('shop_items')]
+        target = f'in-process sqlite ({args.airports} airports)'
+
+    recorder = Recorder()
+
+    def player(n):
+        client = make_client()
+        rng = random.Random(args.seed * 100003 + n)
+        for _ in range(args.sessions):
+            play_session(client, recorder, rng, args.flights, item_ids, args.buy_chance)
+
+    threads = [threading.Thread(target=player, args=(n,)) for n in range(args.players)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    report = {
+        'target': target,
+        'config': {
+            'players': args.players, 'sessions': args.sessions, 'flights': args.flights,
+            'buy_chance': args.buy_chance, 'seed': args.seed,
+        },
+        'python': platform.python_version(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'wall_seconds': round(wall, 3),
+        'endpoints': recorder.report(wall),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{target}: {args.players} players x {args.sessions} games in {wall:.1f} s -> {args.output}")
+    print(f"{'endpoint':18s} {'requests':>8s} {'rejected':>8s} {'errors':>6s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{endpoint:18s} {stats['requests']:8d} {stats['rejected']:8d} {stats['errors']:6d} {stats['throughput_rps']:8.1f} "
+              f"{stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for endpoint, before, after in regressions:
+            print(f"REGRESSION {endpoint}: p95 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Synthetic seed data and an embedded SQLite database for benchmarks.
+
+Builds a seed (airports, artifacts, event types, shop items) and loads it
+into a SQLite file through storage.py's SQLite backend, then points the
+app's connection pool at that file, so benchmarks need no MySQL server.
+"""
+import random
+
+from storage import SQLiteBackend, initialize, load_seed
+
+EVENT_TYPES = [
+    ('Storm', 'A storm forced a detour', 'negative', -500, 0, -400, 0),
+    ('Tailwind', 'A tailwind saved fuel', 'positive', 0, 0, 100, 500),
+    ('Tip', 'A passenger left a tip', 'positive', 100, 600, 0, 0),
+    ('Customs', 'Customs charged a fee', 'negative', -800, -100, 0, 0),
+]
+
+SHOP_ITEMS = [
+    ('Fuel Pack', 'fuel', 'fuel', 500, 1000),
+    ('Big Fuel Pack', 'fuel', 'fuel', 1200, 3000),
+    ('Gold Lootbox', 'lootbox', 'lootbox', 3000, 0),
+    ('Silver Lootbox', 'lootbox', 'lootbox', 1200, 0),
+    ('Bronze Lootbox', 'lootbox', 'lootbox', 300, 0),
+    ('Bigger Tank', 'upgrade', 'fuel_capacity', 2000, 1000),
+    ('Efficient Engine', 'upgrade', 'fuel_efficiency', 2500, 10),
+    ('Discount Card', 'upgrade', 'flight_discount', 1000, 5),
+]
+
+
+def synthetic_seed(airports=1000, rng=None):
+    """Reference rows for storage.load_seed, synthetic but plausible"""
+    rng = rng or random.Random(1)
+    return {
+        'airports': [
+            {
+                'code': f'A{i:04d}', 'name': f'Airport {i}', 'city': f'City {i % 400}',
+                'country': f'Country {i % 60}', 'latitude': rng.uniform(-55, 70),
+                'longitude': rng.uniform(-180, 180), 'airport_size': rng.choice(['small', 'medium', 'large']),
+            }
+            for i in range(airports)
+        ],
+        'artifacts': [
+            {
+                'name': f'Artifact {n}', 'description': f'Ancient artifact number {n}', 'artifact_order': n,
+                'delivery_reward_money': 1000, 'delivery_reward_fuel': 1500,
+            }
+            for n in range(1, 11)
+        ],
+        'event_types': [
+            dict(zip(('name', 'description', 'event_category', 'effect_money_min', 'effect_money_max',
+                      'effect_fuel_min', 'effect_fuel_max'), row))
+            for row in EVENT_TYPES
+        ],
+        'shop_items': [
+            {'name': name, 'description': name, 'category': category, 'item_type': item_type,
+             'price': price, 'effect_value': effect}
+            for name, category, item_type, price, effect in SHOP_ITEMS
+        ],
+    }
+
+
+def create(path, airports=1000, seed_value=1):
+    """Create and seed a fresh SQLite database file"""
+    backend = SQLiteBackend(path)
+    initialize(backend)
+    conn = backend.connect()
+    try:
+        load_seed(conn, synthetic_seed(airports, random.Random(seed_value)))
+    finally:
+        conn.close()
+    return backend
+
+
+def install(app_module, backend):
+    """Point the app's connection pool at backend and reload reference data"""
+    app_module.db_pool.close_all()
+    app_module.db_pool._connect = backend.connect
+    app_module.db_pool.errors = app_module.db_pool.errors + backend.errors
+    app_module.reference_data.load_all()
@@ -0,0 +1,101 @@
+"""Hammer one game with concurrent buy and travel requests and check its books.
+
+Runs against the database configured in app.py (DB_* settings) through the
+Flask test client. Purchases of a fuel item from many threads must never
+spend more than the game had, and every successful request must be reflected
+exactly once in the final state; lost races come back as 'conflict'.
+
+Usage: python benchmarks/stress_transitions.py [--threads 16] [--requests 50] [--money 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as game_app
+
+
+def hammer(client, threads, requests, make_request):
+    """Run make_request(client) requests*threads times; returns reason counts"""
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(requests):
+            data = make_request(client)
+            with lock:
+                outcomes['ok' if data['success'] else data.get('reason', 'error')] += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return outcomes
+
+
+def load_game(game_id):
+    with game_app.db_cursor() as (conn, cursor):
+        cursor.execute("SELECT * FROM games WHERE id = %s", (game_id,))
+        return cursor.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--money', type=int, default=20000)
+    args = parser.parse_args()
+
+    client = game_app.app.test_client()
+    game_id = client.post('/api/game/create', json={'player_name': 'Stress'}).get_json()['game_id']
+
+    items = game_app.reference_data.rows('shop_items')
+    fuel_item = min((i for i in items if i['category'] == 'fuel'), key=lambda i: i['price'])
+    with game_app.db_cursor() as (conn, cursor):
+        # Plenty of tank so fuel purchases are never capped; only money limits them
+        cursor.execute(
+            "UPDATE games SET money = %s, fuel_km = 0, max_fuel_capacity = %s WHERE id = %s",
+            (args.money, 10 ** 9, game_id)
+        )
+        conn.commit()
+
+    buys = hammer(client, args.threads, args.requests, lambda c: c.post(
+        '/api/game/buy', json={'game_id': game_id, 'shop_item_id': fuel_item['id']}
+    ).get_json())
+    game = load_game(game_id)
+    spent = args.money - game['money']
+    print(f"buy:    {dict(buys)}  money {args.money} -> {game['money']}")
+    assert game['money'] >= 0, 'money went negative'
+    assert spent == buys['ok'] * fuel_item['price'], 'spending does not match successful purchases'
+    assert abs(float(game['fuel_km']) - buys['ok'] * fuel_item['effect_value']) < 1, 'fuel does not match purchases'
+
+    airport_ids = [a['id'] for a in game_app.reference_data.rows('airports')]
+    flights_before = game['flights_taken']
+    with game_app.db_cursor() as (conn, cursor):
+        cursor.execute("UPDATE games SET fuel_km = %s WHERE id = %s", (10 ** 8, game_id))
+        conn.commit()
+
+    def travel(c):
+        dest_id = random.choice(airport_ids)
+        return c.post('/api/game/travel', json={'game_id': game_id, 'destination_airport_id': dest_id}).get_json()
+
+    flights = hammer(client, args.threads, args.requests, travel)
+    game_app.log_writer.flush(timeout=10)
+    game = load_game(game_id)
+    with game_app.db_cursor() as (conn, cursor):
+        cursor.execute("SELECT COUNT(*) AS n FROM logs WHERE game_id = %s AND log_type = 'flight'", (game_id,))
+        flight_logs = cursor.fetchone()['n']
+    print(f"travel: {dict(flights)}  flights {flights_before} -> {game['flights_taken']}  flight logs {flight_logs}")
+    assert game['flights_taken'] - flights_before == flights['ok'], 'flights do not match successful travels'
+    assert game['flights_taken'] <= game_app.MAX_FLIGHTS, 'flight limit exceeded'
+    assert flight_logs == flights['ok'], 'flight logs do not match successful travels'
+    print('ok')
+
+
+if __name__ == '__main__':
+    main()
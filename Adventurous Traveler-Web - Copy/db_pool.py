@@ -0,0 +1,203 @@
+"""Connection pool for the game database.
+
+Opening a MySQL connection costs a TCP and auth handshake, so routes borrow
+connections from a shared pool instead. The pool keeps up to ``size`` idle
+connections around, allows ``max_overflow`` extra ones during bursts, makes
+callers wait at most ``timeout`` seconds for a free slot, and health-checks
+connections on checkout (recycling old ones and pinging ones that sat idle).
+"""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+class PooledConnection:
+    """Wraps a raw connection so that close() hands it back to the pool"""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = created_at
+        self.last_used = time.monotonic()
+        self._after_commit = []
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def after_commit(self, callback):
+        """Run callback once the current transaction commits (dropped on rollback)"""
+        self._after_commit.append(callback)
+
+    def commit(self):
+        self._raw.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self._after_commit = []
+        self._raw.rollback()
+
+    def close(self):
+        if self._raw is not None:
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections with overflow and health checks"""
+
+    def __init__(self, config, size=5, max_overflow=10, timeout=5.0,
+                 recycle=3600, ping_after=10.0, connect=None, on_wait=None, on_connect=None,
+                 errors=(Error,)):
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._connect = connect or (lambda: mysql.connector.connect(**self.config))
+        # Driver exceptions that mean "this connection is broken"
+        self.errors = errors
+        # Optional timing hooks, called with seconds spent waiting / connecting
+        self.on_wait = on_wait
+        self.on_connect = on_connect
+        self._idle = deque()
+        self._total = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'created': 0,
+            'recycled': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def acquire(self):
+        """Check a healthy connection out of the pool"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    self._total += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolError(f"No database connection available within {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            self._stats['checkouts'] += 1
+            wait_seconds = time.monotonic() - started
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_seconds'] += wait_seconds
+
+        if self.on_wait:
+            self.on_wait(wait_seconds)
+
+        try:
+            if conn is None:
+                return self._new_connection()
+            return self._checkout(conn)
+        except Exception:
+            self._forget()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work"""
+        raw = conn._raw
+        conn._raw = None
+        try:
+            raw.rollback()
+        except self.errors:
+            self._discard(raw)
+            return
+
+        with self._cond:
+            if len(self._idle) >= self.size:
+                keep = False
+            else:
+                keep = True
+                self._idle.append(PooledConnection(self, raw, conn.created_at))
+            self._cond.notify()
+
+        if not keep:
+            self._discard(raw)
+
+    def stats(self):
+        """Snapshot of pool counters for monitoring"""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': self._total - len(self._idle),
+            })
+        return snapshot
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn._raw)
+
+    def _checkout(self, conn):
+        now = time.monotonic()
+        if self.recycle and now - conn.created_at > self.recycle:
+            self._close_quietly(conn._raw)
+            with self._cond:
+                self._stats['recycled'] += 1
+            return self._new_connection()
+
+        if now - conn.last_used > self.ping_after:
+            try:
+                conn._raw.ping(reconnect=False)
+            except self.errors:
+                self._close_quietly(conn._raw)
+                with self._cond:
+                    self._stats['recycled'] += 1
+                return self._new_connection()
+
+        conn.last_used = now
+        return conn
+
+    def _new_connection(self):
+        started = time.monotonic()
+        raw = self._connect()
+        if self.on_connect:
+            self.on_connect(time.monotonic() - started)
+        with self._cond:
+            self._stats['created'] += 1
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _discard(self, raw):
+        self._close_quietly(raw)
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _close_quietly(self, raw):
+        try:
+            raw.close()
+        except self.errors:
+            pass
@@ -0,0 +1,96 @@
+"""Precomputed great-circle distances between every pair of airports.
+
+The matrix is built once from the airports reference table (float32, so
+5,000 airports take ~100 MB) and rebuilt whenever that table changes. After
+that, a single distance is an array lookup and "distances from here to
+everywhere" is one row of the matrix. Under server.py the matrix is built
+once and memory-mapped by every worker (see shared_data.py).
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two coordinates in km"""
+    R = EARTH_RADIUS_KM
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat/2)**2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon/2)**2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return int(R * c)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Vectorized haversine distance in km; arguments are degrees and broadcast"""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlng = np.radians(lng2) - np.radians(lng1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class DistanceMatrix:
+    """All-pairs airport distances in km, addressed by airport id"""
+
+    def __init__(self, airports, block_rows=512):
+        self.ids = np.array([a['id'] for a in airports], dtype=np.int64)
+        self.lat = np.array([float(a['latitude']) for a in airports], dtype=np.float64)
+        self.lng = np.array([float(a['longitude']) for a in airports], dtype=np.float64)
+        self.index = {int(airport_id): i for i, airport_id in enumerate(self.ids)}
+
+        n = len(self.ids)
+        self.matrix = np.empty((n, n), dtype=np.float32)
+        # Build in row blocks so the float64 temporaries stay small
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            self.matrix[start:stop] = haversine_km(
+                self.lat[start:stop, None], self.lng[start:stop, None],
+                self.lat[None, :], self.lng[None, :]
+            )
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """A matrix over arrays() output, e.g. memory-mapped from shared_data"""
+        self = cls.__new__(cls)
+        self.ids = arrays['ids']
+        self.lat = arrays['lat']
+        self.lng = arrays['lng']
+        self.matrix = arrays['matrix']
+        self.index = {int(airport_id): i for i, airport_id in enumerate(self.ids)}
+        return self
+
+    def arrays(self):
+        return {'ids': self.ids, 'lat': self.lat, 'lng': self.lng, 'matrix': self.matrix}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, airport_id):
+        return int(airport_id) in self.index
+
+    def distance(self, from_id, to_id):
+        """Distance between two airports in km"""
+        return float(self.matrix[self.index[int(from_id)], self.index[int(to_id)]])
+
+    def distances_from(self, airport_id):
+        """Distances from one airport to every airport, aligned with self.ids"""
+        return self.matrix[self.index[int(airport_id)]]
+
+    def reachable_from(self, airport_id, max_km, min_km=0):
+        """Ids and whole-km distances of airports within [min_km, max_km] of airport_id"""
+        row = np.floor(self.distances_from(airport_id))
+        mask = (row >= min_km) & (row <= max_km)
+        mask[self.index[int(airport_id)]] = False
+        return self.ids[mask], row[mask].astype(np.int64)
+
+    def distances_between(self, from_ids, to_ids):
+        """Pairwise distances for two equal-length sequences of airport ids"""
+        rows = [self.index[int(i)] for i in from_ids]
+        cols = [self.index[int(i)] for i in to_ids]
+        return self.matrix[rows, cols]
@@ -0,0 +1,153 @@
+"""Server-Sent Events for game state changes.
+
+Mutating routes publish a compact diff per game after they commit. Each
+game keeps a short ring buffer of recent events so a reconnecting client
+that sends Last-Event-ID picks up exactly what it missed; if that is no
+longer possible (the buffer moved on, or the server restarted) the client
+is told to reload the full state instead.
+
+Under server.py each worker process has its own broker. A broker given a
+relay also passes every event it publishes to the other workers, which
+deliver() it to their own subscribers (see worker_channel.py). Event ids
+are numbered per process, so a client that reconnects to a different
+worker is told to resync.
+
+Every open stream holds a server thread until it ends, so a stream closes
+after max_stream seconds (the client reconnects with Last-Event-ID), and
+at most max_streams are open at once. A subscriber over the limit is told
+to retry later and the stream ends straight away.
+"""
+import threading
+import time
+import uuid
+from collections import deque
+
+
+def state_diff(before, after):
+    """Fields of after that differ from before"""
+    return {key: value for key, value in after.items() if before.get(key) != value}
+
+
+class _Channel:
+    def __init__(self, buffer_size):
+        self.cond = threading.Condition()
+        self.buffer = deque(maxlen=buffer_size)
+        self.last_id = 0
+        self.touched = time.monotonic()
+
+
+class GameEventBroker:
+    """In-process pub/sub of per-game events with replay from a ring buffer"""
+
+    def __init__(self, dumps, buffer_size=50, heartbeat=15.0, max_stream=300.0, idle_expiry=3600.0,
+                 relay=None, max_streams=None):
+        self._dumps = dumps
+        # relay(game_id, event, encoded_data) forwards published events to other processes
+        self.relay = relay
+        self.buffer_size = buffer_size
+        self.heartbeat = heartbeat
+        self.max_stream = max_stream
+        self.idle_expiry = idle_expiry
+        self.max_streams = max_streams
+        self.open_streams = 0
+        # Event ids are "<epoch>-<n>"; a new epoch per process means ids from
+        # before a restart are recognised as unknown rather than misread
+        self.epoch = uuid.uuid4().hex[:8]
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, game_id):
+        key = int(game_id)
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = self._channels[key] = _Channel(self.buffer_size)
+                self._expire_idle()
+            channel.touched = time.monotonic()
+            return channel
+
+    def _expire_idle(self):
+        cutoff = time.monotonic() - self.idle_expiry
+        for key in [k for k, c in self._channels.items() if c.touched < cutoff]:
+            del self._channels[key]
+
+    def publish(self, game_id, event, data):
+        """Record an event for a game, wake up its subscribers and relay it"""
+        encoded = self._dumps(data)
+        self.deliver(game_id, event, encoded)
+        if self.relay is not None:
+            try:
+                self.relay(game_id, event, encoded)
+            except Exception as e:
+                print(f"Game event relay error: {e}")
+
+    def deliver(self, game_id, event, encoded):
+        """Hand an already encoded event to this process's subscribers"""
+        channel = self._channel(game_id)
+        with channel.cond:
+            channel.last_id += 1
+            message = self._format(f'{self.epoch}-{channel.last_id}', event, encoded)
+            channel.buffer.append((channel.last_id, message))
+            channel.cond.notify_all()
+
+    def stream(self, game_id, last_event_id=None):
+        """Generator of SSE frames for one subscriber"""
+        with self._lock:
+            full = self.max_streams is not None and self.open_streams >= self.max_streams
+            if not full:
+                self.open_streams += 1
+        if full:
+            yield 'retry: 10000\n\n'
+            return
+        try:
+            yield from self._stream(game_id, last_event_id)
+        finally:
+            with self._lock:
+                self.open_streams -= 1
+
+    def _stream(self, game_id, last_event_id):
+        channel = self._channel(game_id)
+        position = self._resume_position(channel, last_event_id)
+        yield 'retry: 3000\n\n'
+        if position is None:
+            yield self._format(None, 'reset', self._dumps({'reason': 'resync'}))
+            with channel.cond:
+                position = channel.last_id
+
+        ends_at = time.monotonic() + self.max_stream
+        while time.monotonic() < ends_at:
+            with channel.cond:
+                pending = [m for event_id, m in channel.buffer if event_id > position]
+                if not pending:
+                    channel.cond.wait(min(self.heartbeat, max(0.0, ends_at - time.monotonic())))
+                    pending = [m for event_id, m in channel.buffer if event_id > position]
+                if pending:
+                    position = channel.last_id
+                channel.touched = time.monotonic()
+
+            if pending:
+                for message in pending:
+                    yield message
+            else:
+                yield ': heartbeat\n\n'
+
+    def _resume_position(self, channel, last_event_id):
+        with channel.cond:
+            if not last_event_id:
+                return channel.last_id
+            epoch, _, number = last_event_id.partition('-')
+            if epoch != self.epoch or not number.isdigit():
+                return None
+            position = int(number)
+            oldest = channel.buffer[0][0] if channel.buffer else channel.last_id + 1
+            if position > channel.last_id or position < oldest - 1:
+                return None
+            return position
+
+    def _format(self, event_id, event, encoded):
+        lines = []
+        if event_id:
+            lines.append(f'id: {event_id}')
+        lines.append(f'event: {event}')
+        lines.append(f'data: {encoded}')
+        return '\n'.join(lines) + '\n\n'
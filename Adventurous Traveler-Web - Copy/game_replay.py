@@ -0,0 +1,198 @@
+"""Rebuild a game's state from its snapshots and action log.
+
+Seeded games (see transitions.py) record every applied action in
+game_actions, with a digest of the state it left behind, and a full state
+snapshot every GAME_SNAPSHOT_EVERY actions. replay() starts from the
+newest snapshot at or before the wanted point and re-applies only the
+actions after it through GameTransaction, so rebuilding any state costs
+at most snapshot_every actions. Each replayed action is checked against
+its recorded digest, and verify_game() also compares the result with the
+live games row.
+
+Replays run against the current reference data (airports, artifacts,
+events, game_rules). After those change, older games may no longer match.
+
+Usage: python game_replay.py show GAME_ID [--until SEQ]
+       python game_replay.py verify [--limit N] [--workers N] [--batch 500]
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from game_rules import ActionRejected, game_outcome
+from repositories import GameActionRepository, GameRepository, GameStateSnapshotRepository
+from transitions import FUEL_TOLERANCE, STATE_COLUMNS, GameTransaction, restore_state, state_digest
+
+
+class Replay:
+    """Outcome of replaying one game: the rebuilt state and the first divergence, if any"""
+
+    def __init__(self, game_id, game, snapshot_seq, replayed, mismatch=None):
+        self.game_id = game_id
+        self.game = game
+        self.snapshot_seq = snapshot_seq
+        self.replayed = replayed
+        self.mismatch = mismatch
+
+    @property
+    def ok(self):
+        return self.mismatch is None
+
+    def as_dict(self):
+        return {
+            'game_id': self.game_id,
+            'ok': self.ok,
+            'seq': self.game['action_seq'] if self.game else None,
+            'snapshot_seq': self.snapshot_seq,
+            'replayed': self.replayed,
+            'mismatch': self.mismatch,
+        }
+
+
+def replay(cursor, game_id, world, until_seq=None):
+    """The state of a game after action until_seq (default: its last action)"""
+    snapshot = GameStateSnapshotRepository.latest(cursor, game_id, until_seq)
+    if snapshot is None:
+        return Replay(game_id, None, None, 0, {'seq': 0, 'error': 'no snapshot (game is not seeded)'})
+
+    game, locations = restore_state(json.loads(snapshot['state']))
+    txn = GameTransaction.from_state(game, locations, world, game_id)
+    replayed = 0
+    for action in GameActionRepository.after(cursor, game_id, snapshot['seq']):
+        seq = action['seq']
+        if until_seq is not None and seq > until_seq:
+            break
+        if seq != game['action_seq'] + 1:
+            return Replay(game_id, game, snapshot['seq'], replayed,
+                          {'seq': game['action_seq'] + 1, 'error': f'action missing (next recorded is {seq})'})
+        try:
+            txn.apply(dict(json.loads(action['args']), type=action['action_type']))
+        except ActionRejected as e:
+            return Replay(game_id, game, snapshot['seq'], replayed,
+                          {'seq': seq, 'error': f'rejected on replay: {e.reason}'})
+        replayed += 1
+        digest = state_digest(game)
+        if digest != action['state_digest']:
+            return Replay(game_id, game, snapshot['seq'], replayed,
+                          {'seq': seq, 'error': 'state digest differs', 'recorded': action['state_digest'],
+                           'replayed': digest})
+    return Replay(game_id, game, snapshot['seq'], replayed)
+
+
+def state_differences(stored, replayed):
+    """STATE_COLUMNS whose values differ between the stored and the replayed state"""
+    differences = {}
+    for column in STATE_COLUMNS:
+        a, b = stored[column], replayed[column]
+        if column == 'fuel_km':
+            if abs(float(a) - float(b)) <= FUEL_TOLERANCE:
+                continue
+        elif a == b:
+            continue
+        differences[column] = {'stored': a, 'replayed': b}
+    return differences
+
+
+def verify_game(cursor, game_id, world):
+    """Replay a whole game and check it ends in the state the games row holds"""
+    result = replay(cursor, game_id, world)
+    if not result.ok:
+        return result
+    rows = GameRepository.load_with_locations(cursor, game_id)
+    if not rows:
+        result.mismatch = {'seq': result.game['action_seq'], 'error': 'game not found'}
+        return result
+
+    replayed = dict(result.game)
+    # Rows written before statuses were settled on write stay ACTIVE at a
+    # limit until settle_finished_games runs; compare the outcome instead
+    if replayed['game_status'] == 'ACTIVE':
+        replayed['game_status'] = game_outcome(replayed)
+    differences = state_differences(rows[0], replayed)
+    if differences:
+        result.mismatch = {'seq': replayed['action_seq'], 'error': 'live state differs', 'columns': differences}
+    return result
+
+
+_worker = {}
+
+
+def init_worker():
+    # The app module owns the configuration (STORAGE_BACKEND, DB_CONFIG, ...)
+    import app as game_app
+    _worker['app'] = game_app
+    _worker['world'] = game_app.game_world()
+
+
+def verify_batch(game_ids):
+    """Verify games in one process; returns Replay.as_dict() of each"""
+    game_app = _worker['app']
+    with game_app.db_cursor() as (conn, cursor):
+        return [verify_game(cursor, game_id, _worker['world']).as_dict() for game_id in game_ids]
+
+
+def seeded_game_batches(db_cursor, batch_size, limit=None):
+    """Ids of seeded games in batches, oldest first"""
+    after_id = 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        with db_cursor() as (conn, cursor):
+            ids = GameRepository.seeded_ids(cursor, after_id, size)
+        if not ids:
+            return
+        yield ids
+        after_id = ids[-1]
+        if remaining is not None:
+            remaining -= len(ids)
+
+
+def verify_all(workers=None, batch_size=500, limit=None):
+    """Verify every seeded game; returns (games checked, list of failures)"""
+    workers = workers or os.cpu_count() or 1
+    init_worker()
+    batches = seeded_game_batches(_worker['app'].db_cursor, batch_size, limit)
+    if workers == 1:
+        results = map(verify_batch, batches)
+        return _collect(results)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        return _collect(pool.map(verify_batch, batches))
+
+
+def _collect(batches):
+    checked = 0
+    failures = []
+    for batch in batches:
+        checked += len(batch)
+        failures.extend(result for result in batch if not result['ok'])
+    return checked, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay games from their snapshots and action log')
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help='print the state of one game after an action')
+    show.add_argument('game_id', type=int)
+    show.add_argument('--until', type=int, help='action seq to stop after (default: the last one)')
+    verify = commands.add_parser('verify', help='replay seeded games and report any that diverge')
+    verify.add_argument('--limit', type=int, help='verify at most this many games')
+    verify.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    verify.add_argument('--batch', type=int, default=500, help='games per task')
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        init_worker()
+        with _worker['app'].db_cursor() as (conn, cursor):
+            result = replay(cursor, args.game_id, _worker['world'], args.until)
+        print(json.dumps(dict(result.as_dict(), game=result.game), indent=2, default=str))
+        return
+
+    checked, failures = verify_all(args.workers, args.batch, args.limit)
+    for failure in failures:
+        print(json.dumps(failure, default=str))
+    print(f"Verified {checked} games: {checked - len(failures)} match, {len(failures)} diverge")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Game rules as plain functions over a game-state dict.
+
+A game state is a dict with the columns of the games table. These functions
+check and apply one action at a time, without any database or Flask, so the
+routes, batch actions and offline tools all share the same rules. Functions
+named apply_* mutate the state they are given.
+"""
+import random
+
+STARTING_MONEY = 10000
+STARTING_FUEL_KM = 2500
+STARTING_FUEL_CAPACITY = 5000
+MIN_FLIGHT_KM = 200
+MAX_FLIGHTS = 20
+ARTIFACTS_TO_WIN = 10
+EVENT_CHANCE = 0.3
+
+# Lootbox reward ranges: (money_min, money_max, fuel_min, fuel_max)
+LOOTBOX_REWARDS = {
+    'Gold': (2000, 5000, 1500, 3000),
+    'Silver': (800, 2000, 700, 1200),
+    'Bronze': (200, 800, 300, 600),
+}
+
+
+class ActionRejected(Exception):
+    """An action the rules do not allow; reason is a stable code for clients"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+
+
+def game_outcome(game):
+    """WON, LOST or ACTIVE given how many artifacts and flights a game has used"""
+    if game['artifacts_delivered'] >= ARTIFACTS_TO_WIN:
+        return 'WON'
+    if game['flights_taken'] >= MAX_FLIGHTS:
+        return 'LOST'
+    return 'ACTIVE'
+
+
+def fuel_cost(distance_km, efficiency_bonus):
+    """Fuel burned flying distance_km with a fuel efficiency bonus in percent"""
+    return distance_km * (1 - (efficiency_bonus or 0) / 100.0)
+
+
+def check_can_fly(game, dest_id):
+    """Checks that do not depend on the destination's distance"""
+    if game['game_status'] != 'ACTIVE':
+        raise ActionRejected('game_not_active', 'Game is not active')
+    if game['flights_taken'] >= MAX_FLIGHTS:
+        raise ActionRejected('max_flights', f'Max flights reached ({MAX_FLIGHTS})')
+    if game['current_airport_id'] == dest_id:
+        raise ActionRejected('same_airport', 'Already at this airport')
+
+
+def check_distance(game, distance_km):
+    if distance_km < MIN_FLIGHT_KM:
+        raise ActionRejected('too_short', f'Flight too short (<{MIN_FLIGHT_KM}km)')
+    if float(game['fuel_km']) < fuel_cost(distance_km, game['fuel_efficiency_bonus']):
+        raise ActionRejected('not_enough_fuel', 'Not enough fuel')
+
+
+def apply_flight(game, dest_id, distance_km):
+    """Fly to dest_id; returns the fuel used"""
+    fuel_needed = fuel_cost(distance_km, game['fuel_efficiency_bonus'])
+    game['fuel_km'] = float(game['fuel_km']) - fuel_needed
+    game['current_airport_id'] = dest_id
+    game['flights_taken'] += 1
+    game['distance_km'] = float(game.get('distance_km') or 0) + distance_km
+    return fuel_needed
+
+
+def roll_event(event_type, rng=random):
+    """Random (money_change, fuel_change) for an event type"""
+    money_change = rng.randint(event_type['effect_money_min'], event_type['effect_money_max'])
+    fuel_change = rng.randint(event_type['effect_fuel_min'], event_type['effect_fuel_max'])
+    return money_change, fuel_change
+
+
+def apply_event(game, money_change, fuel_change):
+    game['money'] += money_change
+    game['fuel_km'] = max(0, float(game['fuel_km']) + fuel_change)
+
+
+def apply_delivery(game, artifact):
+    """Deliver the current artifact and collect its rewards"""
+    game['artifacts_delivered'] += 1
+    game['current_artifact_number'] += 1
+    game['money'] += artifact['delivery_reward_money']
+    game['fuel_km'] = min(game['max_fuel_capacity'], float(game['fuel_km']) + artifact['delivery_reward_fuel'])
+
+
+def settle_status(game):
+    """Mark the game WON/LOST once it reaches a limit"""
+    if game['game_status'] == 'ACTIVE':
+        game['game_status'] = game_outcome(game)
+
+
+def lootbox_rewards(item_name, rng=random):
+    """Random (money, fuel) inside a lootbox; unnamed tiers count as Bronze"""
+    tier = next((name for name in ('Gold', 'Silver') if name in item_name), 'Bronze')
+    money_min, money_max, fuel_min, fuel_max = LOOTBOX_REWARDS[tier]
+    return rng.randint(money_min, money_max), rng.randint(fuel_min, fuel_max)
+
+
+def check_purchase(game, item):
+    if game['money'] < item['price']:
+        raise ActionRejected('not_enough_money', 'Not enough money')
+
+
+def apply_purchase(game, item, rng=random):
+    """Pay for an item and apply its effect; returns (reward_money, reward_fuel)"""
+    reward_money = 0
+    reward_fuel = 0
+    capacity = game['max_fuel_capacity']
+
+    if item['category'] == 'fuel':
+        game['fuel_km'] = min(capacity, float(game['fuel_km']) + item['effect_value'])
+        game['money'] -= item['price']
+
+    elif item['category'] == 'lootbox':
+        reward_money, reward_fuel = lootbox_rewards(item['name'], rng)
+        game['money'] = game['money'] - item['price'] + reward_money
+        game['fuel_km'] = min(capacity, float(game['fuel_km']) + reward_fuel)
+
+    elif item['category'] == 'upgrade':
+        upgrades = {
+            'fuel_capacity': 'max_fuel_capacity',
+            'fuel_efficiency': 'fuel_efficiency_bonus',
+            'flight_discount': 'flight_discount_percent',
+        }
+        column = upgrades.get(item['item_type'])
+        if column:
+            game[column] += item['effect_value']
+            game['money'] -= item['price']
+
+    return reward_money, reward_fuel
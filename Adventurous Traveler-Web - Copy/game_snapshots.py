@@ -0,0 +1,58 @@
+"""Per-game cache of the assembled /api/game/current payload.
+
+Clients poll the current game far more often than they change it, so the
+assembled snapshot is kept until the game is mutated (travel/buy call
+invalidate) or the TTL runs out. The TTL bounds staleness when several
+processes serve the same games and cannot see each other's invalidations.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class SnapshotCache:
+    """Small LRU of game snapshots with a time-to-live"""
+
+    def __init__(self, ttl=5.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load that raced with a write is not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, game_id, load):
+        """Cached snapshot for game_id, calling load(game_id) on a miss"""
+        key = int(game_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        snapshot = load(key)
+        if snapshot is not None:
+            with self._lock:
+                if generation != self._generation:
+                    return snapshot
+                self._entries[key] = (now, snapshot)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, game_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(int(game_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
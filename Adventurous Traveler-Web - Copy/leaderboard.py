@@ -0,0 +1,221 @@
+"""Leaderboards and player statistics over finished games.
+
+A result is recorded once, by the request that moves a game from ACTIVE to
+WON or LOST (the guarded write in that request makes it the only one). Each
+board keeps only its best K results in a heap and the statistics are plain
+running totals, so reading the leaderboard costs O(K) however many games
+exist.
+
+New results are written to the game_results table in batches, at most
+every persist_interval seconds, together with the per-status running
+totals in game_result_totals. Every refresh_interval seconds one
+background thread rebuilds the boards from those tables (K rows per board
+and status, read along an index, plus the totals rows), which also merges
+in results recorded by other worker processes. Readers never wait for it:
+they get the in-memory boards.
+"""
+import atexit
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+
+from repositories import GameResultRepository
+
+
+def game_result(game, distance_km, finished_at=None):
+    """The game_results row of a game that just finished"""
+    return {
+        'game_id': game['id'],
+        'player_name': game['player_name'],
+        'game_status': game['game_status'],
+        'flights_taken': game['flights_taken'],
+        'money': game['money'],
+        'distance_km': round(float(distance_km), 1),
+        'finished_at': finished_at or datetime.now(),
+    }
+
+
+def _earlier_first(result):
+    return -result['finished_at'].timestamp()
+
+
+# name, statuses it ranks, SQL order (best first) and the same order as a
+# key where larger is better; ties go to whoever finished first
+BOARDS = (
+    ('fewest_flights', ('WON',), 'flights_taken ASC, money DESC, finished_at ASC',
+     lambda r: (-r['flights_taken'], r['money'], _earlier_first(r))),
+    ('most_money', ('WON', 'LOST'), 'money DESC, finished_at ASC',
+     lambda r: (r['money'], _earlier_first(r))),
+    ('longest_distance', ('WON', 'LOST'), 'distance_km DESC, finished_at ASC',
+     lambda r: (r['distance_km'], _earlier_first(r))),
+)
+
+
+class TopK:
+    """The k largest items by key, in a min-heap whose root is the one to evict next"""
+
+    def __init__(self, k, key):
+        self.k = k
+        self.key = key
+        self._heap = []
+        self._order = itertools.count()
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, item):
+        entry = (self.key(item), next(self._order), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+        else:
+            return
+        self._sorted = None
+
+    def items(self):
+        """Best first; sorted once per change"""
+        if self._sorted is None:
+            self._sorted = [item for _, _, item in sorted(self._heap, reverse=True)]
+        return self._sorted
+
+
+class Stats:
+    def __init__(self):
+        self.won = 0
+        self.lost = 0
+        self.flights_to_win = 0
+        self.distance_km = 0.0
+
+    def add(self, status, games=1, flights=0, distance_km=0.0):
+        if status == 'WON':
+            self.won += games
+            self.flights_to_win += flights
+        elif status == 'LOST':
+            self.lost += games
+        self.distance_km += distance_km
+
+    def to_dict(self):
+        finished = self.won + self.lost
+        return {
+            'games_finished': finished,
+            'games_won': self.won,
+            'games_lost': self.lost,
+            'win_rate': round(self.won / finished, 3) if finished else None,
+            'average_flights_to_win': round(self.flights_to_win / self.won, 2) if self.won else None,
+            'total_distance_km': round(self.distance_km, 1),
+        }
+
+
+class Leaderboard:
+    """In-memory top-K boards and totals, backed by the game_results table"""
+
+    def __init__(self, db_cursor, k=10, persist_interval=30.0, refresh_interval=60.0):
+        self._db_cursor = db_cursor
+        self.k = k
+        self.persist_interval = persist_interval
+        self.refresh_interval = refresh_interval
+        self._boards = self._empty_boards()
+        self._stats = Stats()
+        self._pending = []
+        self._loaded_at = None
+        self._persisted_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        # Held while a refresh runs, so only one runs at a time
+        self._refresh_lock = threading.Lock()
+        atexit.register(self.persist)
+
+    def record(self, result):
+        """Add a finished game; written to the database with the next batch"""
+        with self._lock:
+            self._add(self._boards, self._stats, result)
+            self._pending.append(result)
+            due = time.monotonic() - self._persisted_at >= self.persist_interval
+        if due:
+            self.persist()
+
+    def snapshot(self):
+        """Every board (best first) and the totals"""
+        if self._loaded_at is None:
+            # First read in this process: wait for one load rather than show empty boards
+            with self._refresh_lock:
+                if self._loaded_at is None:
+                    self._refresh()
+        elif time.monotonic() - self._loaded_at >= self.refresh_interval:
+            if self._refresh_lock.acquire(blocking=False):
+                threading.Thread(target=self._refresh_in_background, name='leaderboard-refresh',
+                                 daemon=True).start()
+        with self._lock:
+            return {
+                'boards': {name: list(board.items()) for name, board in self._boards.items()},
+                'stats': self._stats.to_dict(),
+            }
+
+    def persist(self):
+        """Write pending results; on failure they stay pending for the next try"""
+        with self._persist_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._persisted_at = time.monotonic()
+            if not batch:
+                return 0
+            try:
+                with self._db_cursor() as (conn, cursor):
+                    GameResultRepository.record(cursor, batch)
+                    conn.commit()
+            except Exception as e:
+                print(f"Leaderboard persist error, will retry {len(batch)} results: {e}")
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+            return len(batch)
+
+    def refresh(self):
+        """Rebuild from the game_results tables plus anything not yet written"""
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        self.persist()
+        boards = self._empty_boards()
+        stats = Stats()
+        try:
+            with self._db_cursor() as (conn, cursor):
+                for name, statuses, order_by, _ in BOARDS:
+                    for status in statuses:
+                        for row in GameResultRepository.top(cursor, status, order_by, self.k):
+                            boards[name].push(row)
+                for row in GameResultRepository.totals(cursor):
+                    stats.add(row['game_status'], int(row['games']), int(row['flights'] or 0),
+                              float(row['distance_km'] or 0))
+        except Exception as e:
+            # Keep serving the in-memory boards; try the database again next interval
+            print(f"Leaderboard refresh error: {e}")
+            self._loaded_at = time.monotonic()
+            return
+        with self._lock:
+            for result in self._pending:
+                self._add(boards, stats, result)
+            self._boards = boards
+            self._stats = stats
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _add(boards, stats, result):
+        for name, statuses, _, _ in BOARDS:
+            if result['game_status'] in statuses:
+                boards[name].push(result)
+        stats.add(result['game_status'], 1, result['flights_taken'], result['distance_km'])
+
+    def _empty_boards(self):
+        return {name: TopK(self.k, key) for name, _, _, key in BOARDS}
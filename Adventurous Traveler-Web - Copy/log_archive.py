@@ -0,0 +1,176 @@
+"""Log retention: archive finished games' logs, and page through a game's history.
+
+Games still ACTIVE after reaching a limit (rows written before the status
+was settled on write) are first marked WON/LOST and get their game_results
+row, so reads never have to write.
+
+Logs of finished (WON/LOST) games that have had no new log for the
+retention period are folded into one log_archives row per game: counts
+and totals plus the rows themselves as zlib-compressed JSON. The live rows
+are then deleted, so the logs table only holds active and recently
+finished games.
+
+read_history() pages a game's log newest first with an id cursor
+(before_id) instead of OFFSET. It reads the live table and then the
+archive, so every page costs the same however long the history is.
+
+Usage: python log_archive.py [--retention-hours N] [--batch 200]
+"""
+import argparse
+import json
+import zlib
+from datetime import datetime, timedelta
+
+import game_rules
+from json_provider import dumps_bytes
+from leaderboard import game_result
+from repositories import GameRepository, GameResultRepository, LogArchiveRepository, LogRepository
+
+# Per-row fields kept in an archive; game_id is stored once on the record
+ARCHIVE_FIELDS = ('id', 'log_type', 'description', 'distance_km', 'money_change', 'fuel_change', 'created_at')
+
+
+def pack_logs(rows):
+    """Rows as compressed {"fields": [...], "rows": [[...], ...]} JSON"""
+    data = {'fields': ARCHIVE_FIELDS, 'rows': [[row[field] for field in ARCHIVE_FIELDS] for row in rows]}
+    return zlib.compress(dumps_bytes(data), 6)
+
+
+def unpack_logs(game_id, payload):
+    """Archived rows in the shape the logs table returns them, oldest first"""
+    data = json.loads(zlib.decompress(payload))
+    rows = []
+    for values in data['rows']:
+        row = dict(zip(data['fields'], values), game_id=game_id)
+        if row.get('created_at'):
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+        rows.append(row)
+    return rows
+
+
+def archive_record(game_id, game_status, rows):
+    """The log_archives row for a game's logs (oldest first)"""
+    return {
+        'game_id': game_id,
+        'game_status': game_status,
+        'first_log_id': rows[0]['id'],
+        'last_log_id': rows[-1]['id'],
+        'log_count': len(rows),
+        'distance_km': sum(float(row['distance_km'] or 0) for row in rows),
+        'money_change': sum(int(row['money_change'] or 0) for row in rows),
+        'fuel_change': sum(float(row['fuel_change'] or 0) for row in rows),
+        'first_logged_at': rows[0]['created_at'],
+        'last_logged_at': rows[-1]['created_at'],
+        'payload': pack_logs(rows),
+    }
+
+
+def archive_game(cursor, game_id, game_status):
+    """Move one game's live logs into an archive record; returns rows moved"""
+    rows = LogRepository.all_for_game(cursor, game_id)
+    if not rows:
+        return 0
+    LogArchiveRepository.insert(cursor, archive_record(game_id, game_status, rows))
+    LogRepository.delete_through(cursor, game_id, rows[-1]['id'])
+    return len(rows)
+
+
+def settle_finished_games(db_cursor, batch_size=200):
+    """Mark ACTIVE games that reached a limit WON/LOST and record their
+    results, one transaction per game; returns games settled"""
+    after_id = 0
+    settled = 0
+    while True:
+        with db_cursor() as (conn, cursor):
+            games = GameRepository.unsettled(
+                cursor, game_rules.MAX_FLIGHTS, game_rules.ARTIFACTS_TO_WIN, after_id, batch_size
+            )
+        if not games:
+            return settled
+        for game in games:
+            status = game_rules.game_outcome(game)
+            try:
+                with db_cursor() as (conn, cursor):
+                    # Whoever flips the status from ACTIVE records the result
+                    updated = GameRepository.update_if_unchanged(
+                        cursor, game['id'], {'game_status': status}, {'game_status': 'ACTIVE'}
+                    )
+                    if updated == 1:
+                        result = game_result(dict(game, game_status=status), game['distance_km'])
+                        GameResultRepository.record(cursor, [result])
+                    conn.commit()
+            except Exception as e:
+                print(f"Settle game error for game {game['id']}: {e}")
+                continue
+            settled += updated
+        after_id = games[-1]['id']
+
+
+def archive_finished_games(db_cursor, retention, batch_size=200):
+    """Archive logs of every finished game idle for longer than retention
+    (a timedelta), one transaction per game; returns (games, rows)"""
+    idle_since = datetime.now() - retention
+    after_id = 0
+    games = rows = 0
+    while True:
+        with db_cursor() as (conn, cursor):
+            candidates = LogArchiveRepository.candidates(cursor, idle_since, after_id, batch_size)
+        if not candidates:
+            return games, rows
+        for game in candidates:
+            try:
+                with db_cursor() as (conn, cursor):
+                    moved = archive_game(cursor, game['id'], game['game_status'])
+                    conn.commit()
+            except Exception as e:
+                print(f"Log archive error for game {game['id']}: {e}")
+                continue
+            if moved:
+                games += 1
+                rows += moved
+        after_id = candidates[-1]['id']
+
+
+def read_history(cursor, game_id, before_id=None, limit=50):
+    """Up to limit logs with id < before_id, newest first, and the before_id
+    of the next page (None when there is nothing older)"""
+    logs = LogRepository.page(cursor, game_id, before_id, limit + 1)
+    position = logs[-1]['id'] if logs else before_id
+    while len(logs) <= limit:
+        archive = LogArchiveRepository.latest_before(cursor, game_id, position)
+        if archive is None:
+            break
+        older = [
+            row for row in reversed(unpack_logs(game_id, archive['payload']))
+            if position is None or row['id'] < position
+        ]
+        if not older:
+            break
+        logs.extend(older)
+        position = older[-1]['id']
+    if len(logs) > limit:
+        logs = logs[:limit]
+        return logs, logs[-1]['id']
+    return logs, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Settle finished games and archive their logs')
+    parser.add_argument('--retention-hours', type=float,
+                        help='keep live logs this long after a finished game\'s last log '
+                             '(default: LOG_RETENTION_HOURS)')
+    parser.add_argument('--batch', type=int, default=200, help='games fetched per candidate query')
+    args = parser.parse_args()
+
+    # The app module owns the configuration (STORAGE_BACKEND, DB_CONFIG, ...)
+    import app as game_app
+    hours = game_app.LOG_RETENTION_HOURS if args.retention_hours is None else args.retention_hours
+    settled = settle_finished_games(game_app.db_cursor, args.batch)
+    if settled:
+        print(f"Settled {settled} games that had reached a limit")
+    games, rows = archive_finished_games(game_app.db_cursor, timedelta(hours=hours), args.batch)
+    print(f"Archived {rows} log rows from {games} games")
+
+
+if __name__ == '__main__':
+    main()
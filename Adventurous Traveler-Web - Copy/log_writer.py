@@ -0,0 +1,154 @@
+"""Audit log writer for the logs table.
+
+Routes collect the log rows a request produces and hand them over in one
+call just before committing. In ``sync`` mode (the default, and what tests
+should use) they are inserted with a single multi-row INSERT inside the
+request's transaction. In ``async`` mode they are queued once the request
+commits and a background thread writes them in batches, so the request
+never waits on the logs table.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from repositories import LogRepository
+
+
+def log_entry(game_id, log_type, description, distance_km=None, money_change=None, fuel_change=None):
+    """One logs row, in repositories.LOG_COLUMNS order"""
+    return (game_id, log_type, description, distance_km, money_change, fuel_change)
+
+
+class LogWriter:
+    """Writes log rows either inline or through a bounded write-behind queue"""
+
+    def __init__(self, db_cursor, mode='sync', flush_interval=0.5, batch_size=200,
+                 max_queue=10000, overflow='block', block_timeout=1.0, on_flush=None):
+        if mode not in ('sync', 'async'):
+            raise ValueError(f"Unknown log write mode: {mode}")
+        if overflow not in ('block', 'drop'):
+            raise ValueError(f"Unknown log overflow policy: {overflow}")
+        self._db_cursor = db_cursor
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.on_flush = on_flush
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'queued': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'failed_batches': 0}
+
+    def write(self, conn, cursor, entries):
+        """Record the log rows of a request that is about to commit on conn"""
+        if not entries:
+            return
+        if self.mode == 'sync':
+            LogRepository.insert_many(cursor, entries)
+        else:
+            conn.after_commit(lambda: self.enqueue(entries))
+
+    def enqueue(self, entries):
+        """Queue rows for the background writer, applying the overflow policy"""
+        self._ensure_started()
+        for entry in entries:
+            try:
+                if self.overflow == 'block':
+                    self._queue.put(entry, timeout=self.block_timeout)
+                else:
+                    self._queue.put_nowait(entry)
+                self._count('queued')
+            except queue.Full:
+                self._count('dropped')
+
+    def flush(self, timeout=None):
+        """Wait until every queued row has been written (or dropped on error)"""
+        if self._thread is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+
+    def close(self, timeout=5.0):
+        """Stop the background thread after writing out whatever is queued"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot.update({'mode': self.mode, 'pending': self._queue.qsize()})
+        return snapshot
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a forked worker starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Drain without waiting once we are shutting down
+        if self._stopping.is_set():
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+        return batch
+
+    def _write_batch(self, batch):
+        try:
+            with self._db_cursor() as (conn, cursor):
+                LogRepository.insert_many(cursor, batch)
+                conn.commit()
+            self._count('written', len(batch))
+            self._count('batches')
+            if self.on_flush:
+                self.on_flush({entry[0] for entry in batch})
+        except Exception as e:
+            print(f"Log writer error, dropped {len(batch)} rows: {e}")
+            self._count('failed_batches')
+            self._count('dropped', len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
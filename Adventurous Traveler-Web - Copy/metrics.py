@@ -0,0 +1,432 @@
+"""In-process metrics exported in the Prometheus text format.
+
+Counters and histograms keep one small array per label combination, so
+recording is a dict lookup, a bisect and a couple of additions under a
+lock. Gauges are callbacks evaluated only when /metrics is scraped.
+SQL statements are labelled by their shape (verb and table, e.g.
+"update games"), never by their text or parameters, to keep label
+cardinality bounded.
+
+Under server.py every worker process records its own metrics. A
+MetricsStore writes each worker's values to a file in METRICS_DIR every
+interval, and /metrics adds the other workers' files to the live values
+of the worker that answers. Counters and histograms of exited workers are
+folded into one retired file so totals never go backwards; gauges only
+count live workers. Other workers' values are up to one interval old.
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+# Seconds; spans a cached read (~1 ms) to a request that is stuck (~10 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    cumulative = True
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def merged(self, others=(), own=True):
+        """labels -> value, summed over this process (if own) and snapshots of others"""
+        with self._lock:
+            values = dict(self._values) if own else {}
+        for snapshot in others:
+            for labels, value in snapshot:
+                key = tuple(labels)
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def snapshot(self, values=None):
+        values = self.merged() if values is None else values
+        return [[list(labels), value] for labels, value in values.items()]
+
+    def render(self, others=()):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in self.merged(others).items():
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    cumulative = True
+
+    def observe(self, value, *labels):
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][position] += 1
+            entry[1] += value
+
+    def merged(self, others=(), own=True):
+        """labels -> [counts, sum], summed over this process (if own) and snapshots of others"""
+        with self._lock:
+            values = {labels: [list(counts), total] for labels, (counts, total) in self._values.items()} \
+                if own else {}
+        for snapshot in others:
+            for labels, counts, total in snapshot:
+                if len(counts) != len(self.buckets) + 1:
+                    continue
+                entry = values.setdefault(tuple(labels), [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        return values
+
+    def snapshot(self, values=None):
+        values = self.merged() if values is None else values
+        return [[list(labels), counts, total] for labels, (counts, total) in values.items()]
+
+    def render(self, others=()):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in self.merged(others).items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Value(s) read from a callback at scrape time; the callback returns a
+    number, or a dict of label-value tuples to numbers"""
+
+    cumulative = False
+
+    def __init__(self, name, help_text, collect, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def merged(self, others=(), own=True):
+        """labels -> value, summed over this process (if own) and snapshots of others"""
+        values = {}
+        if own:
+            try:
+                values = self.collect()
+            except Exception as e:
+                print(f"Metrics gauge {self.name} error: {e}")
+            if not isinstance(values, dict):
+                values = {(): values}
+            values = dict(values)
+        for snapshot in others:
+            for labels, value in snapshot:
+                key = tuple(labels)
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def snapshot(self, values=None):
+        values = self.merged() if values is None else values
+        return [[list(labels), value] for labels, value in values.items()]
+
+    def render(self, others=()):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        for labels, value in self.merged(others).items():
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, collect, labelnames=()):
+        return self._add(Gauge(name, help_text, collect, labelnames))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self, gauges=True):
+        """{name: values} of every metric, JSON-ready, for another process to merge"""
+        return {
+            metric.name: metric.snapshot() for metric in self._metrics
+            if gauges or metric.cumulative
+        }
+
+    def fold(self, snapshots):
+        """One snapshot of the counters and histograms summed over several"""
+        return {
+            metric.name: metric.snapshot(metric.merged(
+                [snapshot[metric.name] for snapshot in snapshots if metric.name in snapshot], own=False
+            ))
+            for metric in self._metrics if metric.cumulative
+        }
+
+    def render(self, others=()):
+        """Text exposition of this process's values plus snapshots of others"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render([snapshot[metric.name] for snapshot in others if metric.name in snapshot]))
+        return '\n'.join(lines) + '\n'
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsStore:
+    """Shares a registry with the other worker processes of a server through
+    <pid>.json files in a directory (see the module docstring)"""
+
+    RETIRED = 'retired.json'
+
+    def __init__(self, registry, directory, interval=1.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._stopping = threading.Event()
+        # Keeps a final write from racing retire()
+        self._write_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def start(self):
+        """Write this process's values every interval from a background thread"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopping.clear()
+        # A file under this pid belongs to an earlier process that was killed
+        with self._locked():
+            self._retire_files([self.path(self._pid)])
+        threading.Thread(target=self._run, name='metrics-store', daemon=True).start()
+
+    def write(self):
+        with self._write_lock:
+            if self._pid != os.getpid():
+                return
+            tmp = self.path(self._pid) + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(tmp, self.path(self._pid))
+
+    def retire(self):
+        """Fold this process's counters and histograms into the retired totals
+        and stop sharing; called when a worker exits"""
+        with self._write_lock:
+            if self._pid != os.getpid():
+                return
+            self._stopping.set()
+            own = self.path(self._pid)
+            self._pid = None
+        with self._locked():
+            if os.path.exists(own):
+                os.unlink(own)
+            self._write_retired([self._read_retired(), self.registry.snapshot(gauges=False)])
+
+    def render(self):
+        """Text exposition summed over every worker of the server"""
+        return self.registry.render(self.others())
+
+    def others(self):
+        """Snapshots of the other live workers and the retired totals"""
+        snapshots = []
+        dead = []
+        with self._locked():
+            for name in os.listdir(self.directory):
+                pid = name[:-5]
+                if not name.endswith('.json') or not pid.isdigit() or int(pid) == os.getpid():
+                    continue
+                if not _process_alive(int(pid)):
+                    dead.append(os.path.join(self.directory, name))
+                    continue
+                snapshot = self._read(os.path.join(self.directory, name))
+                if snapshot:
+                    snapshots.append(snapshot)
+            if dead:
+                self._retire_files(dead)
+            snapshots.append(self._read_retired())
+        return snapshots
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Metrics store write error: {e}")
+
+    def _locked(self):
+        return _FileLock(os.path.join(self.directory, '.lock'))
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read_retired(self):
+        return self._read(os.path.join(self.directory, self.RETIRED))
+
+    def _write_retired(self, snapshots):
+        path = os.path.join(self.directory, self.RETIRED)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.registry.fold(snapshots), f)
+        os.replace(path + '.tmp', path)
+
+    def _retire_files(self, paths):
+        """Fold files of processes that exited without retiring (call under the lock)"""
+        snapshots = [self._read(path) for path in paths if os.path.exists(path)]
+        if not snapshots:
+            return
+        self._write_retired([self._read_retired()] + snapshots)
+        for path in paths:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+class _FileLock:
+    """Exclusive flock on a file, as a context manager"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+_SHAPE_TABLE = {
+    'select': re.compile(r'\bfrom\s+`?(\w+)', re.I),
+    'insert': re.compile(r'\binto\s+`?(\w+)', re.I),
+    'update': re.compile(r'^\s*update\s+`?(\w+)', re.I),
+    'delete': re.compile(r'\bfrom\s+`?(\w+)', re.I),
+}
+
+
+@lru_cache(maxsize=1024)
+def query_shape(sql):
+    """Verb and main table of a statement, e.g. 'select games'"""
+    words = sql.split(None, 1)
+    verb = words[0].lower() if words else ''
+    pattern = _SHAPE_TABLE.get(verb)
+    match = pattern.search(sql) if pattern else None
+    return f'{verb} {match.group(1).lower()}' if match else verb or 'unknown'
+
+
+class TimedCursor:
+    """Wraps a DB-API cursor, timing every statement by its query shape"""
+
+    def __init__(self, cursor, instruments):
+        self._cursor = cursor
+        self._instruments = instruments
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=None):
+        return self._timed(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed(self._cursor.executemany, sql, seq_of_params)
+
+    def _timed(self, method, sql, params):
+        shape = query_shape(sql)
+        started = time.perf_counter()
+        try:
+            return method(sql, params) if params is not None else method(sql)
+        except Exception:
+            self._instruments.query_errors.inc(shape)
+            raise
+        finally:
+            self._instruments.observe_query(shape, time.perf_counter() - started, sql)
+
+
+class Instruments:
+    """The app's metrics: requests, SQL, the connection pool and JSON encoding"""
+
+    def __init__(self, slow_query_seconds=None):
+        self.registry = Registry()
+        self.slow_query_seconds = slow_query_seconds
+        r = self.registry
+        self.request_seconds = r.histogram(
+            'http_request_duration_seconds', 'Request latency by route', ('method', 'route', 'status'))
+        self.request_errors = r.counter(
+            'http_request_errors_total', 'Requests that raised or returned a 5xx', ('route',))
+        self.query_seconds = r.histogram(
+            'db_query_duration_seconds', 'SQL statement latency by query shape', ('shape',))
+        self.query_errors = r.counter(
+            'db_query_errors_total', 'SQL statements that raised, by query shape', ('shape',))
+        self.slow_queries = r.counter(
+            'db_slow_queries_total', 'SQL statements over the slow-query threshold', ('shape',))
+        self.pool_wait_seconds = r.histogram(
+            'db_pool_wait_seconds', 'Time spent waiting to check out a connection')
+        self.connect_seconds = r.histogram(
+            'db_connect_duration_seconds', 'Time to open a new database connection')
+        self.json_seconds = r.histogram(
+            'json_encode_duration_seconds', 'Time spent serializing JSON responses')
+        self.handler_errors = r.counter(
+            'app_errors_total', 'Exceptions that aborted a database block, by type', ('type',))
+
+    def observe_query(self, shape, seconds, sql=''):
+        self.query_seconds.observe(seconds, shape)
+        if self.slow_query_seconds is not None and seconds >= self.slow_query_seconds:
+            self.slow_queries.inc(shape)
+            # Statement text only; parameters may hold player data
+            print(f"Slow query ({seconds * 1000:.1f} ms): {' '.join(sql.split())[:500]}")
+
+    def render(self):
+        return self.registry.render()
@@ -0,0 +1,69 @@
+"""Prerendered HTML for templates whose output does not depend on the request.
+
+A page is rendered on its first request and kept as ready-to-send bytes
+(plain and gzip, each with its own strong ETag), so later requests never
+touch Jinja. Pages are rendered inside a real request so url_for() sees
+the app's script root. When Flask reloads templates (debug or
+TEMPLATES_AUTO_RELOAD) each hit checks the template file and re-renders
+it once it changed.
+
+Only for templates that use nothing from the request, session or g.
+"""
+import threading
+
+from flask import Response, render_template, request
+
+from reference_data import Payload
+
+
+class Page:
+    def __init__(self, name, html, uptodate):
+        self.payload = Payload(f"page-{name.rsplit('.', 1)[0]}", html, 'text/html')
+        self.uptodate = uptodate
+
+
+class PageCache:
+    """Rendered templates by name"""
+
+    def __init__(self, app):
+        self.app = app
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def response(self, name):
+        """The page as a response, rendering it if missing or (in development) stale"""
+        page = self._pages.get(name)
+        if page is None or (self.app.jinja_env.auto_reload and not self._fresh(page)):
+            page = self._render(name)
+        payload = page.payload
+        encoding, body, etag = payload.negotiate(request.accept_encodings)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=payload.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        # Pages name fingerprinted assets, so they must be revalidated after a deploy
+        response.headers['Cache-Control'] = 'public, no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._pages.clear()
+            else:
+                self._pages.pop(name, None)
+
+    def _render(self, name):
+        env = self.app.jinja_env
+        _, _, uptodate = env.loader.get_source(env, name)
+        page = Page(name, render_template(name), uptodate)
+        with self._lock:
+            self._pages[name] = page
+        return page
+
+    @staticmethod
+    def _fresh(page):
+        return page.uptodate is None or page.uptodate()
@@ -0,0 +1,139 @@
+"""In-process cache for reference tables (airports, shop items, artifacts).
+
+These tables only change on deploy, so they are read once, serialized once
+and kept as ready-to-send bytes (plain and gzip, tagged apart). Entries
+reload when their TTL runs out or when invalidate()/refresh() is called, and
+listeners registered with on_change() hear about every new version.
+
+A table may name a store class that replaces its list of row dicts (see
+airport_store.py) and extra formats, each encoded once per version next to
+the default JSON payload.
+"""
+import gzip
+import hashlib
+import threading
+import time
+
+
+class Payload:
+    """One encoding of a table: plain and gzip bytes, each with its own strong ETag"""
+
+    def __init__(self, tag, body, mimetype='application/json'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9)
+        self.digest = hashlib.sha1(body).hexdigest()
+        self.etag = f'{tag}-{self.digest[:20]}'
+        self.mimetype = mimetype
+
+    def negotiate(self, accept_encodings):
+        """(encoding, bytes, ETag) to send; the gzip body is tagged apart from the plain one"""
+        if 'gzip' in accept_encodings:
+            return 'gzip', self.gzip_body, f'{self.etag}-gz'
+        return 'identity', self.body, self.etag
+
+
+class ReferenceEntry:
+    """One loaded version of a reference table"""
+
+    def __init__(self, name, rows, body, version, store=None, formats=None):
+        self.name = name
+        self.version = version
+        self.loaded_at = time.monotonic()
+        payload = Payload(name, body)
+        self.payloads = {'json': payload}
+        self.body = payload.body
+        self.gzip_body = payload.gzip_body
+        self.digest = payload.digest
+        self.etag = payload.etag
+        if store is not None:
+            self.store = store(rows)
+            self.rows = self.store.records
+            self.by_id = self.store
+        else:
+            self.store = None
+            self.rows = rows
+            self.by_id = {row['id']: row for row in rows if 'id' in row}
+        for fmt, (mimetype, encode) in (formats or {}).items():
+            data = self.store if self.store is not None else rows
+            self.payloads[fmt] = Payload(f'{name}-{fmt}', encode(data), mimetype)
+
+
+class ReferenceCache:
+    """Versioned cache of reference tables keyed by name"""
+
+    def __init__(self, load_rows, dumps, ttl=3600):
+        self._load_rows = load_rows
+        self._dumps = dumps
+        self.ttl = ttl
+        self._tables = {}
+        self._entries = {}
+        self._stale = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def register(self, name, query, payload_key, store=None, formats=None):
+        """Declare a table: the query that loads it and the JSON key it is served under.
+
+        store(rows) builds what entry.rows and entry.by_id hold instead of the
+        rows themselves; formats maps a format name to (mimetype, encode),
+        where encode(store or rows) returns the payload bytes.
+        """
+        self._tables[name] = (query, payload_key, store, formats)
+
+    def on_change(self, callback):
+        """Call callback(entry) whenever a table is loaded with new content"""
+        self._listeners.append(callback)
+        return callback
+
+    def get(self, name):
+        """Current entry for a table, loading it if missing, stale or expired"""
+        entry = self._entries.get(name)
+        if not self._fresh(name, entry):
+            entry = self.refresh(name, only_if_stale=True)
+        return entry
+
+    def _fresh(self, name, entry):
+        return entry is not None and name not in self._stale and time.monotonic() - entry.loaded_at <= self.ttl
+
+    def rows(self, name):
+        return self.get(name).rows
+
+    def invalidate(self, name=None):
+        """Mark one table (or all of them) to be reloaded on next access"""
+        with self._lock:
+            self._stale.update([name] if name else self._tables)
+
+    def refresh(self, name, only_if_stale=False):
+        """Reload a table from the database right now; with only_if_stale, skip
+        the reload if another thread refreshed it while this one waited"""
+        query, payload_key, store, formats = self._tables[name]
+        with self._lock:
+            current = self._entries.get(name)
+            if only_if_stale and self._fresh(name, current):
+                return current
+            rows = self._load_rows(query)
+            body = self._dumps({'success': True, payload_key: rows})
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            if current is not None and current.body == body:
+                current.loaded_at = time.monotonic()
+                self._stale.discard(name)
+                return current
+            version = current.version + 1 if current else 1
+            entry = ReferenceEntry(name, rows, body, version, store, formats)
+            self._entries[name] = entry
+            self._stale.discard(name)
+
+        for callback in self._listeners:
+            callback(entry)
+        return entry
+
+    def load_all(self):
+        """Load every registered table (used to warm the cache at startup)"""
+        for name in self._tables:
+            self.refresh(name)
+
+    def versions(self):
+        return {name: entry.version for name, entry in self._entries.items()}
@@ -0,0 +1,314 @@
+"""SQL for each table, in the subset MySQL and SQLite both understand.
+
+Every method takes an open cursor, so callers keep control of transactions
+(db_cursor in app.py). Statements use %s placeholders; the SQLite backend
+rewrites them. Timestamps are passed in from Python rather than written as
+NOW(), which the two engines spell differently.
+"""
+from datetime import datetime
+
+# Column order of log rows (see log_writer.log_entry)
+LOG_COLUMNS = ('game_id', 'log_type', 'description', 'distance_km', 'money_change', 'fuel_change')
+
+# Column order of finished-game rows (see leaderboard.game_result)
+RESULT_COLUMNS = ('game_id', 'player_name', 'game_status', 'flights_taken', 'money', 'distance_km', 'finished_at')
+
+
+class AirportRepository:
+    LIST_SQL = "SELECT * FROM airports ORDER BY name"
+
+
+class ShopItemRepository:
+    LIST_SQL = "SELECT * FROM shop_items ORDER BY category, price"
+
+
+class EventTypeRepository:
+    LIST_SQL = "SELECT * FROM event_types ORDER BY id"
+
+
+class ArtifactRepository:
+    LIST_SQL = "SELECT * FROM artifacts ORDER BY artifact_order"
+
+    @staticmethod
+    def create_locations(cursor, game_id, placements):
+        """placements: (artifact, delivery_airport_id) pairs"""
+        cursor.executemany("""
+            INSERT INTO game_artifact_locations (game_id, artifact_id, artifact_order, delivery_airport_id)
+            VALUES (%s, %s, %s, %s)
+        """, [
+            (game_id, artifact['id'], artifact['artifact_order'], airport_id)
+            for artifact, airport_id in placements
+        ])
+
+    @staticmethod
+    def mark_delivered(cursor, location_ids, delivered_at):
+        cursor.executemany("""
+            UPDATE game_artifact_locations
+            SET is_delivered = 1, delivered_at = %s
+            WHERE id = %s
+        """, [(delivered_at, location_id) for location_id in location_ids])
+
+
+class GameRepository:
+    # The game row and its artifact locations in one round trip
+    LOAD_WITH_LOCATIONS_SQL = """
+        SELECT g.*, gal.id as gal_id, gal.artifact_id as gal_artifact_id,
+               gal.artifact_order as gal_artifact_order,
+               gal.delivery_airport_id as gal_delivery_airport_id,
+               gal.is_delivered as gal_is_delivered, gal.delivered_at as gal_delivered_at
+        FROM games g
+        LEFT JOIN game_artifact_locations gal ON gal.game_id = g.id
+        WHERE g.id = %s
+        ORDER BY gal.artifact_order
+    """
+
+    @staticmethod
+    def create(cursor, player_name, airport_id, money, fuel_km, max_fuel_capacity, rng_seed=None):
+        """Insert a new game; returns its id"""
+        cursor.execute("""
+            INSERT INTO games (player_name, current_airport_id, money, fuel_km, max_fuel_capacity, rng_seed)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (player_name, airport_id, money, fuel_km, max_fuel_capacity, rng_seed))
+        return cursor.lastrowid
+
+    @staticmethod
+    def load(cursor, game_id, columns='*'):
+        cursor.execute(f"SELECT {columns} FROM games WHERE id = %s", (game_id,))
+        return cursor.fetchone()
+
+    @staticmethod
+    def seeded_ids(cursor, after_id, limit):
+        """Ids of reproducible (seeded) games after after_id, in order"""
+        cursor.execute("""
+            SELECT id FROM games WHERE rng_seed IS NOT NULL AND id > %s
+            ORDER BY id LIMIT %s
+        """, (after_id, limit))
+        return [row['id'] for row in cursor.fetchall()]
+
+    @staticmethod
+    def unsettled(cursor, max_flights, artifacts_to_win, after_id, limit):
+        """ACTIVE games (id > after_id) that already reached a limit, in id order"""
+        cursor.execute("""
+            SELECT * FROM games
+            WHERE game_status = 'ACTIVE' AND id > %s
+              AND (flights_taken >= %s OR artifacts_delivered >= %s)
+            ORDER BY id LIMIT %s
+        """, (after_id, max_flights, artifacts_to_win, limit))
+        return cursor.fetchall()
+
+    @staticmethod
+    def load_with_locations(cursor, game_id):
+        """Rows of the game joined with its locations (gal_* columns); [] if missing"""
+        cursor.execute(GameRepository.LOAD_WITH_LOCATIONS_SQL, (game_id,))
+        return cursor.fetchall()
+
+    @staticmethod
+    def update_if_unchanged(cursor, game_id, changes, expected, tolerances=None):
+        """Apply changes only if every expected column still holds its value
+        (within tolerances[column] for inexact columns); returns rows updated"""
+        tolerances = tolerances or {}
+        guards = []
+        params = list(changes.values()) + [game_id]
+        for column, value in expected.items():
+            if value is None:
+                guards.append(f'{column} IS NULL')
+            elif column in tolerances:
+                guards.append(f'ABS({column} - %s) < {tolerances[column]}')
+                params.append(value)
+            else:
+                guards.append(f'{column} = %s')
+                params.append(value)
+        cursor.execute(
+            f"UPDATE games SET {', '.join(f'{column} = %s' for column in changes)} "
+            f"WHERE id = %s AND {' AND '.join(guards)}",
+            params
+        )
+        return cursor.rowcount
+
+
+class GameActionRepository:
+    """Append-only record of the actions applied to each game"""
+
+    @staticmethod
+    def insert_many(cursor, game_id, actions):
+        cursor.executemany("""
+            INSERT INTO game_actions (game_id, seq, action_type, args, state_digest, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [
+            (game_id, a['seq'], a['action_type'], a['args'], a['state_digest'], datetime.now())
+            for a in actions
+        ])
+
+    @staticmethod
+    def after(cursor, game_id, seq):
+        """Actions of a game with a higher seq, in order"""
+        cursor.execute("""
+            SELECT seq, action_type, args, state_digest FROM game_actions
+            WHERE game_id = %s AND seq > %s
+            ORDER BY seq
+        """, (game_id, seq))
+        return cursor.fetchall()
+
+
+class GameStateSnapshotRepository:
+    @staticmethod
+    def insert(cursor, game_id, seq, state):
+        cursor.execute("""
+            INSERT INTO game_state_snapshots (game_id, seq, state, created_at)
+            VALUES (%s, %s, %s, %s)
+        """, (game_id, seq, state, datetime.now()))
+
+    @staticmethod
+    def latest(cursor, game_id, max_seq=None):
+        """The newest snapshot of a game (at or before max_seq, if given)"""
+        if max_seq is None:
+            cursor.execute("""
+                SELECT seq, state FROM game_state_snapshots WHERE game_id = %s
+                ORDER BY seq DESC LIMIT 1
+            """, (game_id,))
+        else:
+            cursor.execute("""
+                SELECT seq, state FROM game_state_snapshots WHERE game_id = %s AND seq <= %s
+                ORDER BY seq DESC LIMIT 1
+            """, (game_id, max_seq))
+        return cursor.fetchone()
+
+
+class LogRepository:
+    INSERT_SQL = f"""
+        INSERT INTO logs ({', '.join(LOG_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(LOG_COLUMNS))})
+    """
+
+    @staticmethod
+    def insert_many(cursor, entries):
+        cursor.executemany(LogRepository.INSERT_SQL, entries)
+
+    @staticmethod
+    def recent(cursor, game_id, limit):
+        """Newest logs of a game first"""
+        cursor.execute("""
+            SELECT * FROM logs
+            WHERE game_id = %s
+            ORDER BY id DESC
+            LIMIT %s
+        """, (game_id, limit))
+        return cursor.fetchall()
+
+    @staticmethod
+    def page(cursor, game_id, before_id, limit):
+        """Newest logs of a game first, only those with id < before_id (if given)"""
+        if before_id is None:
+            return LogRepository.recent(cursor, game_id, limit)
+        cursor.execute("""
+            SELECT * FROM logs
+            WHERE game_id = %s AND id < %s
+            ORDER BY id DESC
+            LIMIT %s
+        """, (game_id, before_id, limit))
+        return cursor.fetchall()
+
+    @staticmethod
+    def all_for_game(cursor, game_id):
+        cursor.execute("SELECT * FROM logs WHERE game_id = %s ORDER BY id", (game_id,))
+        return cursor.fetchall()
+
+    @staticmethod
+    def delete_through(cursor, game_id, last_id):
+        """Delete a game's logs up to and including last_id; returns rows deleted"""
+        cursor.execute("DELETE FROM logs WHERE game_id = %s AND id <= %s", (game_id, last_id))
+        return cursor.rowcount
+
+
+class LogArchiveRepository:
+    COLUMNS = ('game_id', 'game_status', 'first_log_id', 'last_log_id', 'log_count', 'distance_km',
+               'money_change', 'fuel_change', 'first_logged_at', 'last_logged_at', 'payload')
+
+    @staticmethod
+    def insert(cursor, archive):
+        cursor.execute(f"""
+            INSERT INTO log_archives ({', '.join(LogArchiveRepository.COLUMNS)})
+            VALUES ({', '.join(['%s'] * len(LogArchiveRepository.COLUMNS))})
+        """, tuple(archive[column] for column in LogArchiveRepository.COLUMNS))
+
+    @staticmethod
+    def latest_before(cursor, game_id, before_id):
+        """The newest archive of a game holding logs with id < before_id (any, if None)"""
+        if before_id is None:
+            cursor.execute("""
+                SELECT * FROM log_archives WHERE game_id = %s
+                ORDER BY last_log_id DESC LIMIT 1
+            """, (game_id,))
+        else:
+            cursor.execute("""
+                SELECT * FROM log_archives WHERE game_id = %s AND first_log_id < %s
+                ORDER BY last_log_id DESC LIMIT 1
+            """, (game_id, before_id))
+        return cursor.fetchone()
+
+    @staticmethod
+    def candidates(cursor, idle_since, after_game_id, limit):
+        """Finished games (id > after_game_id) that have live logs, none newer than idle_since"""
+        cursor.execute("""
+            SELECT g.id, g.game_status FROM games g
+            WHERE g.game_status IN ('WON', 'LOST') AND g.id > %s
+              AND EXISTS (SELECT 1 FROM logs l WHERE l.game_id = g.id)
+              AND NOT EXISTS (SELECT 1 FROM logs l WHERE l.game_id = g.id AND l.created_at >= %s)
+            ORDER BY g.id
+            LIMIT %s
+        """, (after_game_id, idle_since, limit))
+        return cursor.fetchall()
+
+
+class GameResultRepository:
+    INSERT_SQL = f"""
+        INSERT INTO game_results ({', '.join(RESULT_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(RESULT_COLUMNS))})
+    """
+
+    @staticmethod
+    def insert_many(cursor, results):
+        cursor.executemany(GameResultRepository.INSERT_SQL, [
+            tuple(result[column] for column in RESULT_COLUMNS) for result in results
+        ])
+
+    @staticmethod
+    def record(cursor, results):
+        """Insert results and add them to game_result_totals, in the caller's transaction"""
+        GameResultRepository.insert_many(cursor, results)
+        totals = {}
+        for result in results:
+            entry = totals.setdefault(result['game_status'], [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += result['flights_taken']
+            entry[2] += float(result['distance_km'])
+        for status, (games, flights, distance_km) in totals.items():
+            cursor.execute("""
+                UPDATE game_result_totals
+                SET games = games + %s, flights = flights + %s, distance_km = distance_km + %s
+                WHERE game_status = %s
+            """, (games, flights, distance_km, status))
+            if cursor.rowcount == 0:
+                # First result with this status; a concurrent first insert fails
+                # the transaction on the primary key and the caller retries
+                cursor.execute("""
+                    INSERT INTO game_result_totals (game_status, games, flights, distance_km)
+                    VALUES (%s, %s, %s, %s)
+                """, (status, games, flights, distance_km))
+
+    @staticmethod
+    def top(cursor, status, order_by, limit):
+        """The first `limit` results with a status, in order_by order (an index range)"""
+        cursor.execute(f"""
+            SELECT {', '.join(RESULT_COLUMNS)} FROM game_results
+            WHERE game_status = %s
+            ORDER BY {order_by}
+            LIMIT %s
+        """, (status, limit))
+        return cursor.fetchall()
+
+    @staticmethod
+    def totals(cursor):
+        """Games, flights and distance per final status"""
+        cursor.execute("SELECT game_status, games, flights, distance_km FROM game_result_totals")
+        return cursor.fetchall()
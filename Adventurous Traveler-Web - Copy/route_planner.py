@@ -0,0 +1,203 @@
+"""Fewest-flight delivery routes over the airport distance matrix.
+
+Artifacts have to be delivered in order and only count on arrival, so the
+best route is the best leg from each delivery airport to the next. A leg is
+found with an A*-style search over the distance matrix: every hop must be a
+legal flight (at least MIN_FLIGHT_KM, at most one full tank), and
+ceil(distance to target / tank range) is an admissible bound on the hops
+still needed. The search deepens one hop at a time, only expanding airports
+that can still make it within the bound, and among the fewest-hop legs keeps
+the shortest. Legs are memoized on (from, to, range) and whole plans on the
+game state, so repeated questions about the same game are lookups.
+
+Fuel along the route is bought just in time with the cheapest fuel per km
+the player can afford. Random events are not predictable and are ignored.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import game_rules
+
+
+class _Memo:
+    """Thread-safe LRU used for both legs and whole plans"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+class RoutePlanner:
+    """Plans the remaining deliveries of a game on one DistanceMatrix"""
+
+    def __init__(self, matrix, max_legs=50000, max_plans=5000):
+        self.matrix = matrix
+        self._legs = _Memo(max_legs)
+        self._plans = _Memo(max_plans)
+
+    def leg(self, from_id, to_id, range_km):
+        """Fewest-hop, then shortest, path from from_id to to_id as
+        [(airport_id, km), ...] excluding the start; None if impossible"""
+        key = (int(from_id), int(to_id), int(range_km))
+        return self._legs.get(key, lambda: self._search_leg(*key))
+
+    def _search_leg(self, from_id, to_id, range_km, max_hops=game_rules.MAX_FLIGHTS):
+        index = self.matrix.index
+        if from_id not in index or to_id not in index:
+            return None
+        src = index[from_id]
+        dst = index[to_id]
+
+        # Whole-km distances, as travel charges them
+        to_target = np.floor(self.matrix.matrix[dst])
+        hops_left = np.ceil(to_target / range_km)
+        # Airports too close to the target need a detour through somewhere else
+        hops_left[to_target < game_rules.MIN_FLIGHT_KM] = 2
+        hops_left[dst] = 0
+
+        # An airport with no legal flight in or out can never be reached
+        for end in (src, dst):
+            row = np.floor(self.matrix.matrix[end])
+            if not np.any((row >= game_rules.MIN_FLIGHT_KM) & (row <= range_km)):
+                return None
+
+        bound = max(int(hops_left[src]), 1)
+        while bound <= max_hops:
+            path = self._search_bounded(src, dst, range_km, bound, hops_left)
+            if path is not None:
+                return [(int(self.matrix.ids[i]), km) for i, km in path]
+            bound += 1
+        return None
+
+    def _search_bounded(self, src, dst, range_km, hops, hops_left):
+        """Shortest path from src to dst with exactly `hops` legal flights"""
+        frontier = np.array([src])
+        cost = np.zeros(1)
+        layers = []
+        for step in range(1, hops + 1):
+            # Only airports from which dst is still reachable in time
+            candidates = np.flatnonzero(hops_left <= hops - step)
+            if not len(candidates) or not len(frontier):
+                return None
+            km = self.matrix.matrix[np.ix_(frontier, candidates)]
+            # Same as MIN_FLIGHT_KM <= floor(km) <= range_km, without flooring the block
+            legal = (km >= game_rules.MIN_FLIGHT_KM) & (km < range_km + 1)
+            total = np.where(legal, cost[:, None] + km, np.inf)
+            parent = np.argmin(total, axis=0)
+            best = total[parent, np.arange(len(candidates))]
+            reached = np.isfinite(best)
+
+            layers.append((frontier, candidates[reached], parent[reached]))
+            frontier = candidates[reached]
+            cost = best[reached]
+
+        if not len(frontier):
+            return None
+        # Walk the parents back from dst (the only candidate on the last step)
+        path = []
+        node = dst
+        for previous, reached, parent in reversed(layers):
+            position = int(np.flatnonzero(reached == node)[0])
+            before = int(previous[parent[position]])
+            path.append((node, int(math.floor(self.matrix.matrix[before, node]))))
+            node = before
+        path.reverse()
+        return path
+
+    def plan(self, game, deliveries, fuel_items):
+        """Fewest-flight route through deliveries, a list of
+        (delivery_airport_id, artifact) in order, for a games-row dict"""
+        key = (
+            game['current_airport_id'], game['flights_taken'], game['game_status'],
+            round(float(game['fuel_km']), 2), game['money'], game['max_fuel_capacity'],
+            game['fuel_efficiency_bonus'],
+            tuple((airport_id, artifact['id']) for airport_id, artifact in deliveries),
+        )
+        return self._plans.get(key, lambda: self._plan(game, deliveries, fuel_items))
+
+    def _plan(self, game, deliveries, fuel_items):
+        flights_left = game_rules.MAX_FLIGHTS - game['flights_taken']
+        result = {
+            'winnable': False,
+            'reason': None,
+            'flights_left': flights_left,
+            'flights_needed': 0,
+            'route': [],
+        }
+        if game['game_status'] != 'ACTIVE':
+            result['winnable'] = game['game_status'] == 'WON'
+            result['reason'] = 'game_not_active'
+            return result
+
+        fuel_factor = 1 - (game['fuel_efficiency_bonus'] or 0) / 100.0
+        capacity = game['max_fuel_capacity']
+        range_km = math.floor(capacity / fuel_factor) if fuel_factor > 0 else 10 ** 9
+
+        position = game['current_airport_id']
+        route = []
+        for airport_id, artifact in deliveries:
+            path = self.leg(position, airport_id, range_km)
+            if path is None:
+                result['reason'] = 'unreachable'
+                result['flights_needed'] = None
+                return result
+            for i, (hop_id, km) in enumerate(path):
+                route.append({
+                    'airport_id': hop_id,
+                    'distance': km,
+                    'delivers_artifact_id': artifact['id'] if i == len(path) - 1 else None,
+                })
+            position = airport_id
+
+        result['flights_needed'] = len(route)
+        result['route'] = route
+        if len(route) > flights_left:
+            result['reason'] = 'not_enough_flights'
+        else:
+            result['reason'] = self._settle_fuel(game, route, deliveries, fuel_items)
+        result['winnable'] = result['reason'] is None
+        return result
+
+    def _settle_fuel(self, game, route, deliveries, fuel_items):
+        """Add just-in-time fuel purchases to route; returns why it fails, if it does"""
+        state = dict(game)
+        rewards = {artifact['id']: artifact for _, artifact in deliveries}
+        # Cheapest fuel per km first
+        items = sorted(
+            (item for item in fuel_items if item['effect_value'] > 0),
+            key=lambda item: item['price'] / item['effect_value']
+        )
+
+        for hop in route:
+            fuel_needed = game_rules.fuel_cost(hop['distance'], state['fuel_efficiency_bonus'])
+            purchases = []
+            while float(state['fuel_km']) < fuel_needed:
+                item = next((i for i in items if i['price'] <= state['money']), None)
+                if item is None:
+                    hop['buy_item_ids'] = purchases
+                    return 'not_enough_money'
+                game_rules.apply_purchase(state, item)
+                purchases.append(item['id'])
+            hop['buy_item_ids'] = purchases
+            hop['fuel_cost'] = round(fuel_needed, 1)
+
+            game_rules.apply_flight(state, hop['airport_id'], hop['distance'])
+            if hop['delivers_artifact_id'] is not None:
+                game_rules.apply_delivery(state, rewards[hop['delivers_artifact_id']])
+        return None
@@ -0,0 +1,47 @@
+"""Random picks over cached reference rows.
+
+Replaces ``ORDER BY RAND()`` queries, which scan and sort the whole table,
+with O(k) sampling over ids held in memory and O(log n) weighted picks.
+"""
+import bisect
+import itertools
+import random
+
+
+class IdSampler:
+    """Uniform sampling over a fixed list of ids"""
+
+    def __init__(self, ids):
+        self.ids = list(ids)
+        self._id_set = set(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def choice(self, rng=random):
+        if not self.ids:
+            return None
+        return rng.choice(self.ids)
+
+    def sample(self, k, exclude=(), rng=random):
+        """k distinct ids, none of them in exclude; fewer if there are not enough"""
+        exclude = self._id_set.intersection(exclude)
+        picked = rng.sample(self.ids, min(len(self.ids), k + len(exclude)))
+        return [i for i in picked if i not in exclude][:k]
+
+
+class WeightedSampler:
+    """Weighted sampling over rows; weight(row) must be non-negative"""
+
+    def __init__(self, rows, weight=lambda row: 1):
+        self.rows = [row for row in rows if weight(row) > 0]
+        self._cumulative = list(itertools.accumulate(weight(row) for row in self.rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def choice(self, rng=random):
+        if not self.rows:
+            return None
+        point = rng.random() * self._cumulative[-1]
+        return self.rows[bisect.bisect_right(self._cumulative, point)]
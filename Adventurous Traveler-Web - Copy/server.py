@@ -0,0 +1,145 @@
+"""Production server: app.py in pre-forked gunicorn worker processes.
+
+`python app.py` starts Flask's single-process development server. This
+launcher runs the same app under a gunicorn master process:
+- --workers processes (default 2 x CPUs + 1), each with a pool of threads
+  (gthread). An open SSE stream (/api/game/<id>/stream) holds one of those
+  threads for as long as it lasts, so each worker gets --threads for
+  ordinary requests plus --streams for streams, and refuses streams beyond
+  --streams (the client retries later). Streams end after a little less
+  than --graceful-timeout and the browser reconnects, so a reload or
+  shutdown is never held up by them
+- graceful reload: `kill -HUP <master pid>` starts new workers, which
+  import the current code, and old workers finish their in-flight
+  requests (up to --graceful-timeout) before exiting
+- graceful shutdown on SIGTERM, with the same drain; a worker flushes
+  queued logs and leaderboard results before it exits
+- worker recycling after --max-requests requests (with jitter, so workers
+  do not all restart together), which bounds slow memory growth
+
+Workers import app.py after the fork, so each has its own connection pool
+and threads. They share state through --runtime-dir (in /dev/shm):
+- arrays/: before the first workers start, and again on every reload, the
+  master runs `shared_data.py publish` in a subprocess. That builds the
+  distance matrix once, and every worker maps it instead of building its
+  own (see shared_data.py)
+- workers/: each worker's socket for worker_channel.py. Game events are
+  relayed to every worker, so /api/game/<id>/stream carries changes made
+  through any of them, and /api/admin/reference-data/refresh reloads the
+  reference data in all of them
+- metrics/: each worker writes its metrics there, and /metrics sums all
+  workers (see metrics.py)
+The metrics and worker sockets start empty with every server start. Run
+one server per runtime directory.
+
+Caches that stay per worker:
+- a worker drops its cached /api/game/current payload when it changes the
+  game; other workers may serve the old one for up to GAME_SNAPSHOT_TTL
+- the leaderboard reloads other workers' results every
+  LEADERBOARD_REFRESH_INTERVAL
+
+Requires gunicorn (listed in requirements.txt: pip install -r requirements.txt).
+
+Usage: python server.py [--bind 0.0.0.0:8000] [--workers N] [--threads 8]
+                        [--streams 16] [--max-requests 5000] [--graceful-timeout 30]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+from shared_data import RUNTIME_DIR
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def publish_shared_data(server):
+    """Build the shared arrays for the current reference data before workers start"""
+    result = subprocess.run([sys.executable, os.path.join(HERE, 'shared_data.py'), 'publish'], cwd=HERE)
+    if result.returncode:
+        server.log.warning('Publishing shared data failed (exit %s); workers build their own',
+                           result.returncode)
+
+
+def start_server(server):
+    """Clear what the previous server left in the runtime directory, then publish"""
+    for name in ('METRICS_DIR', 'WORKER_CHANNEL_DIR'):
+        shutil.rmtree(os.environ[name], ignore_errors=True)
+    publish_shared_data(server)
+
+
+def start_worker(worker):
+    sys.modules['app'].start_worker()
+
+
+def drain_worker(server, worker):
+    """Write out what an exiting worker still holds in memory"""
+    game_app = sys.modules.get('app')
+    if game_app is None:
+        return
+    game_app.stop_worker()
+
+
+class Server(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Runs in each worker after the fork (preload_app is off)
+        import app as game_app
+        return game_app.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the game under pre-forked gunicorn workers')
+    parser.add_argument('--bind', default='0.0.0.0:8000')
+    parser.add_argument('--workers', type=int, default=2 * (os.cpu_count() or 1) + 1)
+    parser.add_argument('--threads', type=int, default=8, help='concurrent requests per worker')
+    parser.add_argument('--streams', type=int, default=16,
+                        help='open SSE streams per worker, on top of --threads')
+    parser.add_argument('--max-requests', type=int, default=5000,
+                        help='recycle a worker after this many requests (0: never)')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='seconds a stopping worker gets to finish its requests')
+    parser.add_argument('--timeout', type=int, default=60, help='restart a worker silent for this long')
+    parser.add_argument('--runtime-dir', default=RUNTIME_DIR,
+                        help='files the processes of this server share (one directory per server)')
+    args = parser.parse_args()
+
+    # Inherited by the publish subprocess and by every worker
+    os.environ['SHARED_DATA_DIR'] = os.path.join(args.runtime_dir, 'arrays')
+    os.environ['WORKER_CHANNEL_DIR'] = os.path.join(args.runtime_dir, 'workers')
+    os.environ['METRICS_DIR'] = os.path.join(args.runtime_dir, 'metrics')
+    # A stream must end before a stopping worker's graceful timeout runs out
+    max_stream = max(1.0, args.graceful_timeout - 5.0)
+    if os.environ.get('SSE_MAX_STREAM'):
+        max_stream = min(max_stream, float(os.environ['SSE_MAX_STREAM']))
+    os.environ['SSE_MAX_STREAM'] = str(max_stream)
+    os.environ['SSE_MAX_STREAMS'] = str(args.streams)
+    Server({
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads + args.streams,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'graceful_timeout': args.graceful_timeout,
+        'timeout': args.timeout,
+        'preload_app': False,
+        'on_starting': start_server,
+        'on_reload': publish_shared_data,
+        'post_worker_init': start_worker,
+        'worker_exit': drain_worker,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Read-only arrays shared by every worker process through memory-mapped files.
+
+server.py runs one copy of app.py per worker process. Large arrays derived
+from reference data would otherwise be built and held by every worker:
+the all-pairs distance matrix is n^2 float32, about 100 MB at 5,000
+airports. Instead, the first process that needs a version writes it once
+as .npy files under SHARED_DATA_DIR (/dev/shm, i.e. RAM, when available).
+Every process then maps those files read-only, so all workers share the
+same physical pages and a new worker is ready in milliseconds.
+
+A version is addressed by a name and a content key: the digest of the
+reference payload it was derived from. A worker can therefore never map
+data built for a different airports table. Each version is written to a
+temporary directory and renamed into place, so readers see all of it or
+nothing. Files may be removed while mapped; workers still using an old
+version keep its pages until they exit.
+
+Usage: python shared_data.py publish   (build the arrays for the current
+       reference data and remove versions it no longer uses)
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Files a running server shares between its processes (server.py --runtime-dir)
+RUNTIME_DIR = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'adventurous-traveler'
+)
+# publish prunes everything else in this directory, so it is not shared with anything
+DEFAULT_DIR = os.path.join(RUNTIME_DIR, 'arrays')
+
+
+class SharedArrays:
+    """Versions of named array sets in one directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        # (name, key) of every version this process opened or published
+        self.in_use = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name, key):
+        return os.path.join(self.directory, f'{name}-{key}')
+
+    def open(self, name, key):
+        """The arrays of a published version, mapped read-only; None if there is none"""
+        path = self.path(name, key)
+        try:
+            arrays = {
+                filename[:-4]: np.load(os.path.join(path, filename), mmap_mode='r')
+                for filename in os.listdir(path) if filename.endswith('.npy')
+            }
+        except FileNotFoundError:
+            return None
+        self.in_use.add((name, key))
+        return arrays
+
+    def publish(self, name, key, arrays):
+        """Write a version unless it already exists; returns it mapped read-only"""
+        path = self.path(name, key)
+        if not os.path.isdir(path):
+            tmp = tempfile.mkdtemp(prefix=f'.{name}-', dir=self.directory)
+            try:
+                for array_name, array in arrays.items():
+                    np.save(os.path.join(tmp, f'{array_name}.npy'), np.ascontiguousarray(array))
+                os.chmod(tmp, 0o755)
+                os.rename(tmp, path)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+                # Losing the rename race to another process is fine
+                if not os.path.isdir(path):
+                    raise
+        return self.open(name, key)
+
+    def prune(self, keep):
+        """Remove every version not in keep, a set of (name, key), and leftovers
+        of interrupted publishes; returns how many"""
+        keep_dirs = {os.path.basename(self.path(name, key)) for name, key in keep}
+        removed = 0
+        for entry in os.listdir(self.directory):
+            if entry in keep_dirs:
+                continue
+            shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+            removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish arrays shared by the server workers')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('publish', help='build arrays for the current reference data')
+    parser.parse_args()
+
+    os.environ.setdefault('SHARED_DATA_DIR', DEFAULT_DIR)
+    # The app module owns the configuration; importing it loads the reference
+    # data, and its change listeners publish what they build
+    import app as game_app
+    shared = game_app.shared_arrays
+    if not shared.in_use:
+        raise SystemExit('Reference data could not be loaded; nothing published')
+    removed = shared.prune(shared.in_use)
+    versions = ', '.join(sorted(f'{name}-{key}' for name, key in shared.in_use))
+    print(f"Published {versions} in {shared.directory} (removed {removed} old)")
+
+
+if __name__ == '__main__':
+    main()
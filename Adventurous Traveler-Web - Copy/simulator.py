@@ -0,0 +1,303 @@
+"""Headless Monte-Carlo simulator for balancing the game.
+
+Plays many seeded games with no Flask and no database. Games are set up
+the way /api/game/create does it. Every move goes through
+GameTransaction.travel/buy, so events, deliveries, lootboxes and the
+flight/fuel limits follow exactly the rules the routes apply. A simple
+greedy player picks the moves:
+- fly to the delivery airport if the fuel allows
+- else buy the cheapest fuel that makes that flight possible
+- else hop to the reachable airport nearest the target
+
+Games run in chunks across a process pool. Every chunk draws from its own
+numpy stream (SeedSequence of the seed and chunk number), so a run is
+reproducible whatever the number of workers. The numpy uniforms are
+pulled in blocks, and per-game results come back as arrays and are
+summarized with numpy.
+
+Balance knobs in game_rules can be overridden per run, e.g.
+    python simulator.py --seed seed.json --games 200000 \\
+        --set MAX_FLIGHTS=25 --set 'LOOTBOX_REWARDS={"Gold": [2000, 4000, 1500, 3000]}'
+The seed file is reference data as written by `storage.py export-seed`.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import game_rules
+from distance_matrix import DistanceMatrix
+from game_rules import ActionRejected
+from sampling import IdSampler, WeightedSampler
+from transitions import GameTransaction, GameWorld, new_game_state
+
+# Game states a simulated game can end in; STUCK = no legal move left
+OUTCOMES = ('WON', 'LOST', 'STUCK')
+RESULT_FIELDS = ('outcome', 'flights', 'money', 'fuel_km', 'delivered', 'distance_km', 'purchases')
+
+
+class BlockRandom(random.Random):
+    """random.Random whose uniforms come from a numpy Generator in blocks;
+    randint, choice and sample are all derived from random()"""
+
+    def __init__(self, generator, block=8192):
+        self._generator = generator
+        self._block = block
+        self._buffer = []
+        self._next = 0
+        super().__init__()
+
+    def seed(self, *args, **kwargs):
+        # Seeded through the numpy generator
+        pass
+
+    def random(self):
+        if self._next >= len(self._buffer):
+            self._buffer = self._generator.random(self._block).tolist()
+            self._next = 0
+        value = self._buffer[self._next]
+        self._next += 1
+        return value
+
+
+def with_ids(rows):
+    """Seed rows carry ids when exported from a database; number them otherwise"""
+    return [row if 'id' in row else dict(row, id=i) for i, row in enumerate(rows, 1)]
+
+
+class World:
+    """Reference data and lookups shared by every game in a worker"""
+
+    def __init__(self, seed):
+        self.airports = with_ids(seed['airports'])
+        self.artifacts = sorted(with_ids(seed['artifacts']), key=lambda a: a['artifact_order'])
+        self.shop_items = with_ids(seed['shop_items'])
+        self.matrix = DistanceMatrix(self.airports)
+        self.airport_sampler = IdSampler(self.matrix.ids.tolist())
+        # Same weighting as the app's event sampler
+        self.event_sampler = WeightedSampler(
+            with_ids(seed['event_types']),
+            lambda row: 1.0 if row.get('weight') is None else float(row['weight'])
+        )
+        self.fuel_items = sorted((i for i in self.shop_items if i['category'] == 'fuel'), key=lambda i: i['price'])
+        self.airports_by_id = {a['id']: a for a in self.airports}
+        self.artifacts_by_id = {a['id']: a for a in self.artifacts}
+        self.shop_items_by_id = {i['id']: i for i in self.shop_items}
+
+    def game_world(self, rng):
+        return GameWorld(
+            airports_by_id=self.airports_by_id,
+            artifacts_by_id=self.artifacts_by_id,
+            shop_items_by_id=self.shop_items_by_id,
+            distance=self.matrix.distance,
+            event_sampler=self.event_sampler,
+            rng=rng
+        )
+
+
+def new_game(world, rng):
+    """Starting state and artifact locations, picked like create_game does"""
+    start = world.airport_sampler.choice(rng)
+    deliveries = world.airport_sampler.sample(len(world.artifacts), exclude=[start], rng=rng)
+    # No rng_seed: events draw from the chunk's block stream
+    game = new_game_state(start)
+    locations = {
+        artifact['artifact_order']: {
+            'id': n, 'artifact_id': artifact['id'], 'delivery_airport_id': airport_id, 'is_delivered': 0,
+        }
+        for n, (artifact, airport_id) in enumerate(zip(world.artifacts, deliveries), 1)
+    }
+    return game, locations
+
+
+class GreedyPlayer:
+    """Heads straight for the current delivery airport, buying fuel when that
+    makes the flight possible and hopping closer when it does not"""
+
+    def __init__(self, world, lootbox=None, lootbox_reserve=2000):
+        self.world = world
+        self.lootbox = next((i for i in world.shop_items if i['name'] == lootbox), None) if lootbox else None
+        self.lootbox_reserve = lootbox_reserve
+
+    def next_action(self, txn, bought_since_flight):
+        game = txn.game
+        matrix = self.world.matrix
+        current = game['current_airport_id']
+        target = txn.locations[game['current_artifact_number']]['delivery_airport_id']
+        fuel = float(game['fuel_km'])
+        bonus = game['fuel_efficiency_bonus']
+
+        if (self.lootbox and not bought_since_flight
+                and game['money'] >= self.lootbox['price'] + self.lootbox_reserve):
+            return {'type': 'buy', 'shop_item_id': self.lootbox['id']}
+
+        direct = int(matrix.distance(current, target))
+        if direct >= game_rules.MIN_FLIGHT_KM:
+            needed = game_rules.fuel_cost(direct, bonus)
+            if fuel >= needed:
+                return {'type': 'travel', 'destination_airport_id': target}
+            item = self._fuel_for(game, needed)
+            if item:
+                return {'type': 'buy', 'shop_item_id': item['id']}
+
+        # Hop to the reachable airport that leaves the shortest legal final leg
+        factor = 1 - (bonus or 0) / 100.0
+        ids, _ = matrix.reachable_from(current, fuel / factor if factor > 0 else float('inf'),
+                                       game_rules.MIN_FLIGHT_KM)
+        if len(ids):
+            to_target = np.maximum(matrix.distances_between(ids, [target] * len(ids)), game_rules.MIN_FLIGHT_KM)
+            best = int(np.argmin(to_target))
+            if to_target[best] < max(direct, game_rules.MIN_FLIGHT_KM) or not self._fuel_for(game, None):
+                return {'type': 'travel', 'destination_airport_id': int(ids[best])}
+        item = self._fuel_for(game, None)
+        if item:
+            return {'type': 'buy', 'shop_item_id': item['id']}
+        return None
+
+    def _fuel_for(self, game, needed):
+        """Cheapest affordable fuel item that reaches needed (any that adds fuel if None)"""
+        fuel = float(game['fuel_km'])
+        capacity = game['max_fuel_capacity']
+        for item in self.world.fuel_items:
+            if game['money'] < item['price']:
+                continue
+            after = min(capacity, fuel + item['effect_value'])
+            if (needed is None and after > fuel) or (needed is not None and after >= needed):
+                return item
+        return None
+
+
+def play(world, player, rng, max_steps=200):
+    """One game to the end; returns its RESULT_FIELDS values"""
+    game, locations = new_game(world, rng)
+    txn = GameTransaction.from_state(game, locations, world.game_world(rng))
+    purchases = 0
+    bought_since_flight = False
+    for _ in range(max_steps):
+        if game['game_status'] != 'ACTIVE':
+            break
+        action = player.next_action(txn, bought_since_flight)
+        if action is None:
+            break
+        try:
+            txn.apply(action)
+        except ActionRejected:
+            break
+        if action['type'] == 'buy':
+            purchases += 1
+            bought_since_flight = True
+        else:
+            bought_since_flight = False
+    outcome = game['game_status'] if game['game_status'] != 'ACTIVE' else 'STUCK'
+    distance = game['distance_km']
+    return (OUTCOMES.index(outcome), game['flights_taken'], game['money'], float(game['fuel_km']),
+            game['artifacts_delivered'], distance, purchases)
+
+
+_worker = {}
+
+
+def init_worker(seed_path, overrides, lootbox):
+    """Process pool initializer: apply rule overrides and build the world once"""
+    apply_overrides(overrides)
+    with open(seed_path) as f:
+        world = World(json.load(f))
+    _worker['world'] = world
+    _worker['player'] = GreedyPlayer(world, lootbox)
+
+
+def run_chunk(seed, chunk, games):
+    """Play one chunk of games on its own random stream; returns column arrays"""
+    rng = BlockRandom(np.random.default_rng([seed, chunk]))
+    rows = [play(_worker['world'], _worker['player'], rng) for _ in range(games)]
+    columns = np.array(rows, dtype=np.float64).reshape(-1, len(RESULT_FIELDS))
+    return {field: columns[:, i] for i, field in enumerate(RESULT_FIELDS)}
+
+
+def apply_overrides(overrides):
+    for name, value in overrides.items():
+        if not name.isupper() or not hasattr(game_rules, name):
+            raise ValueError(f"Unknown game rule: {name}")
+        if name == 'LOOTBOX_REWARDS':
+            game_rules.LOOTBOX_REWARDS.update({tier: tuple(r) for tier, r in value.items()})
+        else:
+            setattr(game_rules, name, value)
+
+
+def simulate(seed_path, games, seed=1, workers=None, chunk_size=1000, overrides=None, lootbox=None):
+    """Play games across a process pool; returns {field: array} over all games"""
+    overrides = overrides or {}
+    chunks = [(seed, n, min(chunk_size, games - start)) for n, start in enumerate(range(0, games, chunk_size))]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        init_worker(seed_path, overrides, lootbox)
+        parts = [run_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(seed_path, overrides, lootbox)) as pool:
+            parts = list(pool.map(run_chunk, *zip(*chunks)))
+    return {field: np.concatenate([part[field] for part in parts]) for field in RESULT_FIELDS}
+
+
+def summarize(results):
+    """Win rate and distributions of the final resources"""
+    outcome = results['outcome']
+    won = outcome == OUTCOMES.index('WON')
+    percentiles = (5, 25, 50, 75, 95)
+
+    def spread(values):
+        if not len(values):
+            return None
+        return dict(zip((f'p{p}' for p in percentiles), np.round(np.percentile(values, percentiles), 1).tolist()),
+                    mean=round(float(values.mean()), 1))
+
+    return {
+        'games': int(len(outcome)),
+        'outcomes': {name: round(float(np.mean(outcome == i)), 4) for i, name in enumerate(OUTCOMES)},
+        'flights_to_win': spread(results['flights'][won]),
+        'final_money': spread(results['money']),
+        'final_fuel_km': spread(results['fuel_km']),
+        'distance_km': spread(results['distance_km']),
+        'purchases': spread(results['purchases']),
+        'artifacts_delivered': np.bincount(results['delivered'].astype(np.int64),
+                                           minlength=game_rules.ARTIFACTS_TO_WIN + 1).tolist(),
+    }
+
+
+def parse_override(text):
+    name, _, value = text.partition('=')
+    return name.strip(), json.loads(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate many games to tune balance')
+    parser.add_argument('--seed-file', '--seed', dest='seed_file', required=True,
+                        help='reference data JSON (storage.py export-seed)')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--rng-seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    parser.add_argument('--chunk', type=int, default=1000, help='games per task')
+    parser.add_argument('--lootbox', help='shop item the player buys whenever it can spare the money')
+    parser.add_argument('--set', dest='overrides', action='append', type=parse_override, default=[],
+                        metavar='RULE=JSON', help='override a game_rules constant')
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = simulate(args.seed_file, args.games, args.rng_seed, args.workers, args.chunk,
+                       dict(args.overrides), args.lootbox)
+    elapsed = time.perf_counter() - started
+    summary = dict(summarize(results), seconds=round(elapsed, 2))
+    print(json.dumps(summary, indent=2))
+    print(f"{summary['games']} games in {elapsed:.1f} s ({summary['games'] / elapsed:.0f} games/s)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Spatial index for nearest-airport and radius queries.
+
+Airports are mapped to points on the unit sphere and stored in a k-d tree.
+Straight-line (chord) distance between those points grows with great-circle
+distance, so pruning by chord length gives exact great-circle answers
+without any trigonometry inside the search. Leaves are scanned with NumPy,
+which keeps queries well under a millisecond at 50k+ airports.
+"""
+import heapq
+import math
+
+import numpy as np
+
+from distance_matrix import EARTH_RADIUS_KM
+
+
+def to_unit_vectors(lat, lng):
+    """Degrees to (n, 3) unit-sphere coordinates"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def km_to_chord(km):
+    angle = min(km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+class AirportIndex:
+    """k-d tree over airport positions, queried in kilometres"""
+
+    def __init__(self, airports, leaf_size=32):
+        self.leaf_size = leaf_size
+        ids = np.array([a['id'] for a in airports], dtype=np.int64)
+        points = to_unit_vectors(
+            [float(a['latitude']) for a in airports],
+            [float(a['longitude']) for a in airports]
+        ).reshape(-1, 3)
+
+        order = np.arange(len(ids))
+        # Node arrays: bounding box, slice of the reordered points, children (-1 = leaf)
+        self._lo, self._hi, self._start, self._end, self._left, self._right = [], [], [], [], [], []
+        if len(ids):
+            self._build(points, order, 0, len(ids))
+        self._lo = np.array(self._lo).reshape(-1, 3)
+        self._hi = np.array(self._hi).reshape(-1, 3)
+
+        self.ids = ids[order]
+        self.points = points[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build(self, points, order, start, end):
+        node = len(self._start)
+        block = points[order[start:end]]
+        lo, hi = block.min(axis=0), block.max(axis=0)
+        self._lo.append(lo)
+        self._hi.append(hi)
+        self._start.append(start)
+        self._end.append(end)
+        self._left.append(-1)
+        self._right.append(-1)
+
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(hi - lo))
+            mid = (end - start) // 2
+            part = np.argpartition(block[:, axis], mid)
+            order[start:end] = order[start:end][part]
+            self._left[node] = self._build(points, order, start, start + mid)
+            self._right[node] = self._build(points, order, start + mid, end)
+        return node
+
+    def _box_distance_sq(self, node, q):
+        gap = np.maximum(self._lo[node] - q, 0) + np.maximum(q - self._hi[node], 0)
+        return float(gap @ gap)
+
+    def query_radius(self, lat, lng, radius_km):
+        """Airport ids within radius_km of (lat, lng) and their distances, nearest first"""
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        q = to_unit_vectors(lat, lng)
+        limit = km_to_chord(radius_km) ** 2
+        found_idx, found_d2 = [], []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_distance_sq(node, q) > limit:
+                continue
+            if self._left[node] < 0:
+                start, end = self._start[node], self._end[node]
+                diff = self.points[start:end] - q
+                d2 = np.einsum('ij,ij->i', diff, diff)
+                hit = d2 <= limit
+                if hit.any():
+                    found_idx.append(np.nonzero(hit)[0] + start)
+                    found_d2.append(d2[hit])
+            else:
+                stack.append(self._left[node])
+                stack.append(self._right[node])
+
+        if not found_idx:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        idx = np.concatenate(found_idx)
+        d2 = np.concatenate(found_d2)
+        order = np.argsort(d2)
+        return self.ids[idx[order]], chord_to_km(np.sqrt(d2[order]))
+
+    def query_nearest(self, lat, lng, k=1, radius_km=None):
+        """The k airports closest to (lat, lng), optionally capped at radius_km"""
+        if not len(self.ids) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        q = to_unit_vectors(lat, lng)
+        limit = km_to_chord(radius_km) ** 2 if radius_km is not None else math.inf
+        best = []  # max-heap of (-d2, index)
+        frontier = [(0.0, 0)]
+        while frontier:
+            box_d2, node = heapq.heappop(frontier)
+            bound = -best[0][0] if len(best) == k else limit
+            if box_d2 > bound:
+                break
+            if self._left[node] < 0:
+                start, end = self._start[node], self._end[node]
+                diff = self.points[start:end] - q
+                d2 = np.einsum('ij,ij->i', diff, diff)
+                for offset in np.argsort(d2)[:k]:
+                    value = float(d2[offset])
+                    if value > limit:
+                        break
+                    if len(best) < k:
+                        heapq.heappush(best, (-value, start + int(offset)))
+                    elif value < -best[0][0]:
+                        heapq.heapreplace(best, (-value, start + int(offset)))
+                    else:
+                        break
+            else:
+                for child in (self._left[node], self._right[node]):
+                    heapq.heappush(frontier, (self._box_distance_sq(child, q), child))
+
+        best.sort(reverse=True)
+        idx = np.array([i for _, i in best], dtype=np.int64)
+        d2 = np.array([-d for d, _ in best])
+        return self.ids[idx], chord_to_km(np.sqrt(d2))
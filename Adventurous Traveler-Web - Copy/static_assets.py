@@ -0,0 +1,191 @@
+"""Fingerprinted, precompressed static files served from memory.
+
+At startup every file under static/ is read once and given a content hash
+in its name (css/style.css -> css/style.1a2b3c4d5e6f.css). Text files get
+gzip and, when the brotli package is installed, brotli variants, kept only
+if smaller. url() references inside CSS are rewritten to the fingerprinted
+names before the CSS itself is hashed.
+
+init_app() hooks this into Flask's own static endpoint: url_for('static',
+filename=...) in templates yields the fingerprinted URL, which is served
+with an immutable one-year Cache-Control. The plain name still works but
+is sent with no-cache so clients revalidate it. Files that appear after
+startup fall through to Flask's normal static handler.
+
+Usage: python static_assets.py build OUT_DIR   (fingerprinted files,
+       .gz/.br variants and manifest.json, for a CDN or front proxy)
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+class Asset:
+    """One static file: its bytes in every encoding worth sending"""
+
+    def __init__(self, path, body):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        stem, ext = posixpath.splitext(path)
+        self.fingerprinted = f'{stem}.{self.digest}{ext}'
+        self.encodings = {'identity': body}
+        if self.mimetype.startswith(COMPRESSIBLE):
+            candidates = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                candidates['br'] = brotli.compress(body, quality=11)
+            for encoding, data in candidates.items():
+                if len(data) < len(body):
+                    self.encodings[encoding] = data
+
+    def negotiate(self, accept_encodings):
+        """(encoding, bytes) to send, preferring brotli, then gzip"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and encoding in accept_encodings:
+                return encoding, self.encodings[encoding]
+        return 'identity', self.encodings['identity']
+
+
+class AssetManifest:
+    """Every file under root, by plain and by fingerprinted name"""
+
+    def __init__(self, root, url_prefix='/static'):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.assets = {}
+        self.fingerprinted = {}
+        self._by_name = {}
+
+    def build(self):
+        paths = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                full = os.path.join(directory, name)
+                paths.append(os.path.relpath(full, self.root).replace(os.sep, '/'))
+        # CSS last, so its url() references can point at fingerprinted names
+        for path in sorted(paths, key=lambda p: (p.endswith('.css'), p)):
+            with open(os.path.join(self.root, path), 'rb') as f:
+                body = f.read()
+            if path.endswith('.css'):
+                body = self._rewrite_css(path, body)
+            self._add(Asset(path, body))
+        return self
+
+    def lookup(self, name):
+        return self._by_name.get(name)
+
+    def manifest(self):
+        """Plain name -> fingerprinted name"""
+        return dict(self.fingerprinted)
+
+    def write(self, out_dir):
+        """Write fingerprinted files, their compressed variants and manifest.json"""
+        suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+        for asset in self.assets.values():
+            target = os.path.join(out_dir, *asset.fingerprinted.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            for encoding, data in asset.encodings.items():
+                with open(target + suffixes[encoding], 'wb') as f:
+                    f.write(data)
+        with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+            json.dump(self.manifest(), f, indent=2, sort_keys=True)
+
+    def _add(self, asset):
+        self.assets[asset.path] = asset
+        self.fingerprinted[asset.path] = asset.fingerprinted
+        self._by_name[asset.path] = asset
+        self._by_name[asset.fingerprinted] = asset
+
+    def _rewrite_css(self, path, body):
+        text = body.decode('utf-8')
+
+        def replace(match):
+            quote, ref = match.groups()
+            target = self._resolve(path, ref)
+            if target not in self.fingerprinted:
+                return match.group(0)
+            return f'url({quote}{self.url_prefix}/{self.fingerprinted[target]}{quote})'
+
+        return _CSS_URL.sub(replace, text).encode('utf-8')
+
+    def _resolve(self, css_path, ref):
+        ref = ref.split('?', 1)[0].split('#', 1)[0]
+        if ref.startswith(('data:', 'http:', 'https:', '//')):
+            return None
+        if ref.startswith(self.url_prefix + '/'):
+            return ref[len(self.url_prefix) + 1:]
+        if ref.startswith('/'):
+            return None
+        return posixpath.normpath(posixpath.join(posixpath.dirname(css_path), ref))
+
+
+# ETag suffix per content encoding, so caches never swap one body for another
+ETAG_SUFFIXES = {'identity': '', 'gzip': '-gz', 'br': '-br'}
+
+
+def asset_response(asset, immutable):
+    encoding, body = asset.negotiate(request.accept_encodings)
+    etag = asset.digest + ETAG_SUFFIXES[encoding]
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=asset.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = IMMUTABLE if immutable else 'public, no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app, manifest):
+    """Serve the app's static endpoint from manifest and fingerprint url_for('static')"""
+    fallback = app.view_functions['static']
+
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest.fingerprinted:
+            values['filename'] = manifest.fingerprinted[values['filename']]
+
+    def serve_static(filename):
+        asset = manifest.lookup(filename)
+        if asset is None:
+            return fallback(filename=filename)
+        return asset_response(asset, immutable=filename == asset.fingerprinted)
+
+    app.view_functions['static'] = serve_static
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed static files')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='write the files and manifest.json to a directory')
+    build.add_argument('out_dir')
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    manifest = AssetManifest(root).build()
+    manifest.write(args.out_dir)
+    print(f"Wrote {len(manifest.assets)} assets to {args.out_dir}"
+          f"{'' if brotli else ' (brotli not installed: gzip only)'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+"""Storage backends: MySQL over the network or an embedded SQLite file.
+
+The routes talk to the database through repositories.py, whose SQL is the
+portable subset both engines understand, written with %s placeholders.
+A backend supplies raw connections for the connection pool plus the
+engine-specific parts: the schema DDL (bootstrap) and loading seed data.
+app.py runs bootstrap at startup on either engine, so tables added in a
+release (game_results, log_archives, ...) exist before any route uses them.
+
+app.py picks the backend from STORAGE_BACKEND ('mysql', the default, or
+'sqlite', stored at SQLITE_PATH). SQLite runs in WAL mode so readers never
+block the writer. Reads run outside any transaction and the first write of
+a transaction takes the write lock (BEGIN IMMEDIATE), so concurrent writers
+queue on busy_timeout instead of failing with "database is locked" when
+they upgrade from a read. Game writes are guarded UPDATEs (transitions.py),
+so they do not rely on the read being in the same transaction. Compiled
+statements are cached per connection.
+
+Usage: python storage.py init [--seed seed.json]
+       python storage.py export-seed seed.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+
+import mysql.connector
+from mysql.connector import Error
+
+# Reference tables a seed file may hold, in load order
+SEED_TABLES = ('airports', 'artifacts', 'event_types', 'shop_items')
+
+SCHEMA = {
+    'airports': [
+        ('id', 'pk'), ('code', 'VARCHAR(10)'), ('name', 'VARCHAR(255)'), ('city', 'VARCHAR(100)'),
+        ('country', 'VARCHAR(100)'), ('latitude', 'DOUBLE'), ('longitude', 'DOUBLE'),
+        ('airport_size', 'VARCHAR(20)'),
+    ],
+    'artifacts': [
+        ('id', 'pk'), ('name', 'VARCHAR(255)'), ('description', 'TEXT'), ('artifact_order', 'INTEGER'),
+        ('delivery_reward_money', 'INTEGER'), ('delivery_reward_fuel', 'INTEGER'),
+    ],
+    'event_types': [
+        ('id', 'pk'), ('name', 'VARCHAR(100)'), ('description', 'TEXT'), ('event_category', 'VARCHAR(20)'),
+        ('effect_money_min', 'INTEGER'), ('effect_money_max', 'INTEGER'),
+        ('effect_fuel_min', 'INTEGER'), ('effect_fuel_max', 'INTEGER'),
+    ],
+    'shop_items': [
+        ('id', 'pk'), ('name', 'VARCHAR(100)'), ('description', 'TEXT'), ('category', 'VARCHAR(20)'),
+        ('item_type', 'VARCHAR(50)'), ('price', 'INTEGER'), ('effect_value', 'INTEGER'),
+    ],
+    'games': [
+        ('id', 'pk'), ('player_name', 'VARCHAR(100)'), ('current_airport_id', 'INTEGER'),
+        ('money', 'INTEGER NOT NULL DEFAULT 10000'), ('fuel_km', 'DOUBLE NOT NULL DEFAULT 2500'),
+        ('max_fuel_capacity', 'INTEGER NOT NULL DEFAULT 5000'), ('flights_taken', 'INTEGER NOT NULL DEFAULT 0'),
+        ('artifacts_delivered', 'INTEGER NOT NULL DEFAULT 0'),
+        ('current_artifact_number', 'INTEGER NOT NULL DEFAULT 1'),
+        ('game_status', "VARCHAR(10) NOT NULL DEFAULT 'ACTIVE'"),
+        ('fuel_efficiency_bonus', 'INTEGER NOT NULL DEFAULT 0'),
+        ('flight_discount_percent', 'INTEGER NOT NULL DEFAULT 0'),
+        ('created_at', 'created'),
+        ('rng_seed', 'BIGINT NULL'), ('action_seq', 'INTEGER NOT NULL DEFAULT 0'),
+        ('distance_km', 'DOUBLE NOT NULL DEFAULT 0'),
+    ],
+    'game_artifact_locations': [
+        ('id', 'pk'), ('game_id', 'INTEGER NOT NULL'), ('artifact_id', 'INTEGER NOT NULL'),
+        ('artifact_order', 'INTEGER NOT NULL'), ('delivery_airport_id', 'INTEGER NOT NULL'),
+        ('is_delivered', 'INTEGER NOT NULL DEFAULT 0'), ('delivered_at', 'TIMESTAMP NULL'),
+    ],
+    'logs': [
+        ('id', 'pk'), ('game_id', 'INTEGER NOT NULL'), ('log_type', 'VARCHAR(20)'), ('description', 'TEXT'),
+        ('distance_km', 'DOUBLE'), ('money_change', 'INTEGER'), ('fuel_change', 'DOUBLE'),
+        ('created_at', 'created'),
+    ],
+    'game_results': [
+        ('id', 'pk'), ('game_id', 'INTEGER NOT NULL'), ('player_name', 'VARCHAR(100)'),
+        ('game_status', 'VARCHAR(10) NOT NULL'), ('flights_taken', 'INTEGER NOT NULL'),
+        ('money', 'INTEGER NOT NULL'), ('distance_km', 'DOUBLE NOT NULL'), ('finished_at', 'TIMESTAMP NOT NULL'),
+    ],
+    # Running totals of game_results per final status, kept by GameResultRepository.record
+    'game_result_totals': [
+        ('game_status', 'VARCHAR(10) NOT NULL PRIMARY KEY'), ('games', 'INTEGER NOT NULL DEFAULT 0'),
+        ('flights', 'INTEGER NOT NULL DEFAULT 0'), ('distance_km', 'DOUBLE NOT NULL DEFAULT 0'),
+    ],
+    # Append-only action record and periodic state snapshots (see game_replay.py)
+    'game_actions': [
+        ('id', 'pk'), ('game_id', 'INTEGER NOT NULL'), ('seq', 'INTEGER NOT NULL'),
+        ('action_type', 'VARCHAR(20) NOT NULL'), ('args', 'TEXT NOT NULL'),
+        ('state_digest', 'VARCHAR(16) NOT NULL'), ('created_at', 'TIMESTAMP NOT NULL'),
+    ],
+    'game_state_snapshots': [
+        ('id', 'pk'), ('game_id', 'INTEGER NOT NULL'), ('seq', 'INTEGER NOT NULL'),
+        ('state', 'TEXT NOT NULL'), ('created_at', 'TIMESTAMP NOT NULL'),
+    ],
+    # Logs of finished games, folded into one row per game (see log_archive.py)
+    'log_archives': [
+        ('id', 'pk'), ('game_id', 'INTEGER NOT NULL'), ('game_status', 'VARCHAR(10) NOT NULL'),
+        ('first_log_id', 'INTEGER NOT NULL'), ('last_log_id', 'INTEGER NOT NULL'),
+        ('log_count', 'INTEGER NOT NULL'), ('distance_km', 'DOUBLE NOT NULL'),
+        ('money_change', 'INTEGER NOT NULL'), ('fuel_change', 'DOUBLE NOT NULL'),
+        ('first_logged_at', 'TIMESTAMP NULL'), ('last_logged_at', 'TIMESTAMP NULL'),
+        ('payload', 'MEDIUMBLOB NOT NULL'), ('archived_at', 'created'),
+    ],
+}
+
+INDEXES = [
+    ('idx_gal_game', 'game_artifact_locations', 'game_id, artifact_order'),
+    ('idx_logs_game', 'logs', 'game_id, id'),
+    ('idx_results_flights', 'game_results', 'game_status, flights_taken'),
+    # One ordered index scan per status for the leaderboard's top-K queries
+    ('idx_results_money', 'game_results', 'game_status, money DESC, finished_at'),
+    ('idx_results_distance', 'game_results', 'game_status, distance_km DESC, finished_at'),
+    ('idx_log_archives_game', 'log_archives', 'game_id, last_log_id'),
+    ('idx_game_actions_game', 'game_actions', 'game_id, seq'),
+    ('idx_game_snapshots_game', 'game_state_snapshots', 'game_id, seq'),
+]
+
+# Columns added to existing tables after their first release; bootstrap
+# adds them to databases created before that
+ADDED_COLUMNS = [
+    ('games', 'rng_seed'), ('games', 'action_seq'), ('games', 'distance_km'),
+]
+
+# Fills a table from existing rows right after bootstrap creates it
+TABLE_BACKFILLS = {
+    'game_result_totals': """
+        INSERT INTO game_result_totals (game_status, games, flights, distance_km)
+        SELECT game_status, COUNT(*), COALESCE(SUM(flights_taken), 0), COALESCE(SUM(distance_km), 0)
+        FROM game_results GROUP BY game_status
+    """,
+}
+
+# Fills a column for existing rows right after bootstrap adds it
+BACKFILLS = {
+    ('games', 'distance_km'): """
+        UPDATE games SET distance_km =
+            COALESCE((SELECT SUM(l.distance_km) FROM logs l WHERE l.game_id = games.id), 0)
+          + COALESCE((SELECT SUM(a.distance_km) FROM log_archives a WHERE a.game_id = games.id), 0)
+    """,
+}
+
+
+class MySQLBackend:
+    name = 'mysql'
+    errors = (Error,)
+    types = {
+        'pk': 'INT AUTO_INCREMENT PRIMARY KEY',
+        'created': 'TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP',
+    }
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def create_table_sql(self, table, columns):
+        body = ', '.join(f'{name} {self.types.get(kind, kind)}' for name, kind in columns)
+        return f'CREATE TABLE IF NOT EXISTS {table} ({body}) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+
+    def create_index_sql(self, name, table, columns):
+        # MySQL has no CREATE INDEX IF NOT EXISTS; bootstrap skips existing ones
+        return f'CREATE INDEX {name} ON {table} ({columns})'
+
+    def index_exists(self, cursor, name, table):
+        cursor.execute(f'SHOW INDEX FROM {table} WHERE Key_name = %s', (name,))
+        return bool(cursor.fetchall())
+
+    def table_exists(self, cursor, table):
+        cursor.execute('SHOW TABLES LIKE %s', (table,))
+        return bool(cursor.fetchall())
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute(f'SHOW COLUMNS FROM {table} LIKE %s', (column,))
+        return bool(cursor.fetchall())
+
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+
+_WRITE_VERBS = ('insert', 'update', 'delete', 'replace', 'create', 'drop', 'alter')
+
+
+@lru_cache(maxsize=512)
+def sqlite_sql(sql):
+    """%s placeholders rewritten for sqlite3"""
+    return sql.replace('%s', '?')
+
+
+class SQLiteCursor:
+    """The slice of the mysql.connector cursor API the repositories use"""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        self.dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._conn.begin_if_write(sql)
+        self._cursor.execute(sqlite_sql(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq_of_params):
+        self._conn.begin_if_write(sql)
+        self._cursor.executemany(sqlite_sql(sql), [tuple(p) for p in seq_of_params])
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self.dictionary:
+            return rows
+        names = [column[0] for column in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def __iter__(self):
+        return (self._row(row) for row in self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """A sqlite3 connection that behaves like a mysql.connector one"""
+
+    def __init__(self, path, busy_timeout):
+        self.raw = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None, check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=256
+        )
+        self.raw.execute('PRAGMA journal_mode=WAL')
+        self.raw.execute('PRAGMA synchronous=NORMAL')
+
+    def begin_if_write(self, sql):
+        if not self.raw.in_transaction and sql.lstrip()[:7].lower().startswith(_WRITE_VERBS):
+            self.raw.execute('BEGIN IMMEDIATE')
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self, dictionary)
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.commit()
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.rollback()
+
+    def ping(self, reconnect=False):
+        self.raw.execute('SELECT 1')
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    errors = (sqlite3.Error,)
+    types = {
+        'pk': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+        'created': "TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))",
+    }
+
+    def __init__(self, path, busy_timeout=30.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+
+    def connect(self):
+        return SQLiteConnection(self.path, self.busy_timeout)
+
+    def create_table_sql(self, table, columns):
+        body = ', '.join(f'{name} {self.types.get(kind, kind)}' for name, kind in columns)
+        return f'CREATE TABLE IF NOT EXISTS {table} ({body})'
+
+    def create_index_sql(self, name, table, columns):
+        return f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})'
+
+    def index_exists(self, cursor, name, table):
+        return False
+
+    def table_exists(self, cursor, table):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        return bool(cursor.fetchall())
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute(f'PRAGMA table_info({table})')
+        return any(row[1] == column for row in cursor.fetchall())
+
+
+def create_backend(kind, mysql_config=None, sqlite_path=None, busy_timeout=30.0):
+    if kind == 'mysql':
+        return MySQLBackend(mysql_config)
+    if kind == 'sqlite':
+        return SQLiteBackend(sqlite_path, busy_timeout)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def initialize(backend, seed_path=None):
+    """Bootstrap the schema and load a seed file (if given) into empty tables"""
+    conn = backend.connect()
+    try:
+        bootstrap(backend, conn)
+        if seed_path:
+            with open(seed_path) as f:
+                return load_seed(conn, json.load(f))
+        return {}
+    finally:
+        conn.close()
+
+
+def bootstrap(backend, conn):
+    """Create any missing tables, columns and indexes"""
+    cursor = conn.cursor()
+    try:
+        for table, columns in SCHEMA.items():
+            created = table in TABLE_BACKFILLS and not backend.table_exists(cursor, table)
+            cursor.execute(backend.create_table_sql(table, columns))
+            if created:
+                cursor.execute(TABLE_BACKFILLS[table])
+        for table, column in ADDED_COLUMNS:
+            if not backend.column_exists(cursor, table, column):
+                kind = dict(SCHEMA[table])[column]
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {backend.types.get(kind, kind)}')
+                if (table, column) in BACKFILLS:
+                    cursor.execute(BACKFILLS[(table, column)])
+        for name, table, columns in INDEXES:
+            if not backend.index_exists(cursor, name, table):
+                cursor.execute(backend.create_index_sql(name, table, columns))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def missing_schema(backend, conn):
+    """Tables of SCHEMA, and ADDED_COLUMNS (as table.column), the database does not have"""
+    cursor = conn.cursor()
+    try:
+        missing = [table for table in SCHEMA if not backend.table_exists(cursor, table)]
+        missing += [
+            f'{table}.{column}' for table, column in ADDED_COLUMNS
+            if table not in missing and not backend.column_exists(cursor, table, column)
+        ]
+        return missing
+    finally:
+        cursor.close()
+
+
+def check_schema(backend):
+    """Raise if tables or columns are missing (e.g. bootstrap is off or lacked privileges)"""
+    conn = backend.connect()
+    try:
+        missing = missing_schema(backend, conn)
+    finally:
+        conn.close()
+    if missing:
+        raise RuntimeError(
+            f"The {backend.name} database is missing {', '.join(missing)}. "
+            f"Run `python storage.py init` (or start with STORAGE_BOOTSTRAP=1) to create them."
+        )
+
+
+def load_seed(conn, seed):
+    """Insert seed rows ({table: [row, ...]}) into reference tables that are still empty;
+    returns the number of rows inserted per table"""
+    cursor = conn.cursor()
+    loaded = {}
+    try:
+        for table in SEED_TABLES:
+            rows = seed.get(table) or []
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            if not rows or cursor.fetchone()[0]:
+                continue
+            columns = [name for name, _ in SCHEMA[table] if name in rows[0]]
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                [tuple(row.get(column) for column in columns) for row in rows]
+            )
+            loaded[table] = len(rows)
+        conn.commit()
+    finally:
+        cursor.close()
+    return loaded
+
+
+def export_seed(conn, out):
+    """Write the reference tables as seed JSON to a binary file, e.g. to
+    provision an edge node from MySQL; rows are encoded as they are fetched"""
+    from json_provider import dumps_bytes, iter_json_array
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for n, table in enumerate(SEED_TABLES):
+            out.write((b'{' if n == 0 else b',') + dumps_bytes(table) + b':')
+            cursor.execute(f'SELECT * FROM {table} ORDER BY id')
+            for chunk in iter_json_array(cursor):
+                out.write(chunk)
+        out.write(b'}')
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bootstrap or export the game database')
+    commands = parser.add_subparsers(dest='command', required=True)
+    init = commands.add_parser('init', help='create the schema and load seed data')
+    init.add_argument('--seed', help='JSON file of reference rows per table')
+    export = commands.add_parser('export-seed', help='write the reference tables to a JSON file')
+    export.add_argument('path')
+    args = parser.parse_args()
+
+    # The app module owns the configuration (STORAGE_BACKEND, DB_CONFIG, ...);
+    # this command is how a missing schema gets created, so skip the check
+    os.environ['STORAGE_SCHEMA_CHECK'] = '0'
+    import app as game_app
+    backend = game_app.storage_backend
+    if args.command == 'init':
+        print(f"Loaded {initialize(backend, args.seed)} into {backend.name}")
+        return
+    conn = backend.connect()
+    try:
+        with open(args.path, 'wb') as f:
+            export_seed(conn, f)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Atomic game state transitions.
+
+A GameTransaction reads a game (with its artifact locations) in one query,
+applies actions to that state in memory using game_rules, and writes the
+result back with one conditional UPDATE that only succeeds if the row still
+holds the values that were read. Two requests racing on the same game can
+therefore never both spend the same money or fuel: the loser gets a
+'conflict' rejection and nothing is written.
+
+Games created with an rng_seed are reproducible: the n-th action of a game
+draws from action_rng(seed, n), and every applied action is appended to
+game_actions with a digest of the state it left behind. A snapshot of the
+full state is saved every world.snapshot_every actions (see game_replay.py).
+"""
+import hashlib
+import json
+import random
+from datetime import datetime
+
+import game_rules
+from game_rules import ActionRejected
+from log_writer import log_entry
+from repositories import ArtifactRepository, GameActionRepository, GameRepository, GameStateSnapshotRepository
+
+# Columns of games that actions may change; all of them guard the write-back
+STATE_COLUMNS = (
+    'current_airport_id', 'money', 'fuel_km', 'max_fuel_capacity', 'flights_taken',
+    'artifacts_delivered', 'current_artifact_number', 'game_status',
+    'fuel_efficiency_bonus', 'flight_discount_percent', 'action_seq',
+)
+
+# Running totals actions add to; written back with the state but not
+# guarded, since the STATE_COLUMNS guard already orders the writers
+TALLY_COLUMNS = ('distance_km',)
+
+# Never sent to clients: knowing the seed would reveal future events
+PRIVATE_COLUMNS = ('rng_seed',)
+
+
+def new_game_state(airport_id, rng_seed=None):
+    """STATE_COLUMNS (plus tallies and the seed) of a game that has just been created"""
+    return {
+        'current_airport_id': airport_id, 'money': game_rules.STARTING_MONEY,
+        'fuel_km': float(game_rules.STARTING_FUEL_KM), 'max_fuel_capacity': game_rules.STARTING_FUEL_CAPACITY,
+        'flights_taken': 0, 'artifacts_delivered': 0, 'current_artifact_number': 1, 'game_status': 'ACTIVE',
+        'fuel_efficiency_bonus': 0, 'flight_discount_percent': 0, 'action_seq': 0, 'distance_km': 0.0,
+        'rng_seed': rng_seed,
+    }
+
+
+def action_rng(seed, seq):
+    """The random stream of a game's seq-th action"""
+    return random.Random((seed << 32) + seq)
+
+
+def state_digest(game):
+    """Short hash of the STATE_COLUMNS of a game, to compare replays against"""
+    values = [round(float(game[c]), 2) if c == 'fuel_km' else game[c] for c in STATE_COLUMNS]
+    return hashlib.sha1(json.dumps(values, separators=(',', ':')).encode()).hexdigest()[:16]
+
+
+def snapshot_state(game, locations):
+    """JSON-ready copy of everything a replay needs to resume from this point"""
+    return {
+        'game': {c: game.get(c) for c in STATE_COLUMNS + TALLY_COLUMNS + PRIVATE_COLUMNS},
+        'locations': {str(order): dict(location) for order, location in locations.items()},
+    }
+
+
+def restore_state(snapshot):
+    """(game, locations) from snapshot_state() output"""
+    game = dict(snapshot['game'])
+    game['fuel_km'] = float(game['fuel_km'])
+    # Snapshots taken before distance_km was tracked start the tally at 0
+    game['distance_km'] = float(game.get('distance_km') or 0)
+    locations = {int(order): dict(location) for order, location in snapshot['locations'].items()}
+    return game, locations
+
+# fuel_km may be a single-precision column, so compare it with a tolerance
+FUEL_TOLERANCE = 0.01
+
+
+class GameWorld:
+    """Reference data a transaction needs, independent of where it came from"""
+
+    def __init__(self, airports_by_id, artifacts_by_id, shop_items_by_id, distance,
+                 event_sampler, rng=random, snapshot_every=10):
+        self.airports_by_id = airports_by_id
+        self.artifacts_by_id = artifacts_by_id
+        self.shop_items_by_id = shop_items_by_id
+        self.distance = distance
+        self.event_sampler = event_sampler
+        self.rng = rng
+        self.snapshot_every = snapshot_every
+
+
+class GameTransaction:
+    """One read, any number of in-memory actions, one guarded write-back"""
+
+    def __init__(self, cursor, game_id, world):
+        self.cursor = cursor
+        self.game_id = int(game_id)
+        self.world = world
+        self.game = None
+        self.original = None
+        self.locations = {}
+        self.delivered_location_ids = []
+        self.logs = []
+        # Applied actions, appended to game_actions on save
+        self.actions = []
+        self.rng = world.rng
+
+    @classmethod
+    def from_state(cls, game, locations, world, game_id=0):
+        """A transaction over an in-memory game (no cursor), for offline tools;
+        locations maps artifact_order to the dicts load() builds"""
+        txn = cls(None, game_id, world)
+        txn.game = game
+        txn.original = dict(game)
+        txn.locations = locations
+        return txn
+
+    def load(self):
+        """Read the game; raises ActionRejected if it does not exist"""
+        rows = GameRepository.load_with_locations(self.cursor, self.game_id)
+        if not rows:
+            raise ActionRejected('game_not_found', 'Game not found')
+
+        self.game = {key: value for key, value in rows[0].items() if not key.startswith('gal_')}
+        self.original = dict(self.game)
+        for row in rows:
+            if row['gal_id'] is not None:
+                self.locations[row['gal_artifact_order']] = {
+                    'id': row['gal_id'],
+                    'artifact_id': row['gal_artifact_id'],
+                    'delivery_airport_id': row['gal_delivery_airport_id'],
+                    'is_delivered': row['gal_is_delivered'],
+                }
+        return self.game
+
+    def travel(self, dest_id):
+        """Fly to dest_id, rolling a random event and delivering if due"""
+        game = self.game
+        world = self.world
+        self.rng = self._action_rng()
+        game_rules.check_can_fly(game, dest_id)
+
+        dest = world.airports_by_id.get(dest_id)
+        if not dest:
+            raise ActionRejected('destination_not_found', 'Destination airport not found')
+
+        origin = world.airports_by_id.get(game['current_airport_id'], {})
+        dist = int(world.distance(game['current_airport_id'], dest_id))
+        game_rules.check_distance(game, dist)
+
+        fuel_needed = game_rules.apply_flight(game, dest_id, dist)
+        self.logs.append(log_entry(
+            self.game_id, 'flight', f"Flew from {origin.get('code')} to {dest['code']}",
+            distance_km=dist, fuel_change=-fuel_needed
+        ))
+
+        # Check for random event (30% chance)
+        event_result = None
+        if self.rng.random() < game_rules.EVENT_CHANCE:
+            event_result = self._random_event()
+
+        delivery_result = self._check_delivery(dest_id)
+        game_rules.settle_status(game)
+        self._record('travel', {'destination_airport_id': dest_id})
+
+        return {
+            'game': self.game_view(),
+            'distance': dist,
+            'fuel_cost': fuel_needed,
+            'event': event_result,
+            'delivery': delivery_result,
+        }
+
+    def buy(self, item_id):
+        """Buy a shop item and apply its effect"""
+        item = self.world.shop_items_by_id.get(item_id)
+        if not item:
+            raise ActionRejected('item_not_found', 'Item not found')
+        game_rules.check_purchase(self.game, item)
+
+        self.rng = self._action_rng()
+        reward_money, reward_fuel = game_rules.apply_purchase(self.game, item, self.rng)
+        self.logs.append(log_entry(self.game_id, 'purchase', f"Bought {item['name']}", money_change=-item['price']))
+        self._record('buy', {'shop_item_id': item_id})
+
+        return {
+            'game': self.game_view(),
+            'item': item,
+            'reward_money': reward_money,
+            'reward_fuel': reward_fuel,
+        }
+
+    def apply(self, action):
+        """Run one command dict: {'type': 'travel', 'destination_airport_id': ...}
+        or {'type': 'buy', 'shop_item_id': ...}"""
+        kind = action.get('type') if isinstance(action, dict) else None
+        try:
+            if kind == 'travel':
+                return self.travel(int(action['destination_airport_id']))
+            if kind == 'buy':
+                return self.buy(int(action['shop_item_id']))
+        except (KeyError, TypeError, ValueError):
+            raise ActionRejected('invalid_action', f'Missing or invalid arguments for {kind}')
+        raise ActionRejected('unknown_action', f'Unknown action: {kind}')
+
+    def run(self, actions, stop_on_error=True):
+        """Apply commands in order; returns one result per command. A rejected
+        command changes nothing, and with stop_on_error the rest are skipped"""
+        results = []
+        failed = False
+        for action in actions:
+            kind = action.get('type') if isinstance(action, dict) else None
+            if failed and stop_on_error:
+                results.append({'type': kind, 'success': False, 'reason': 'skipped',
+                                'error': 'Skipped after an earlier action failed'})
+                continue
+            try:
+                result = self.apply(action)
+            except ActionRejected as e:
+                failed = True
+                results.append({'type': kind, 'success': False, 'reason': e.reason, 'error': e.message})
+                continue
+            result.pop('game', None)
+            results.append(dict(result, type=kind, success=True))
+        return results
+
+    def save(self):
+        """Write the in-memory state back if (and only if) nobody changed it meanwhile"""
+        changed = [c for c in STATE_COLUMNS + TALLY_COLUMNS if self.game[c] != self.original[c]]
+        if changed:
+            updated = GameRepository.update_if_unchanged(
+                self.cursor, self.game_id,
+                {c: self.game[c] for c in changed},
+                {c: self.original[c] for c in STATE_COLUMNS},
+                tolerances={'fuel_km': FUEL_TOLERANCE}
+            )
+            if updated != 1:
+                raise ActionRejected('conflict', 'Game was changed by another request, please retry')
+
+        if self.delivered_location_ids:
+            ArtifactRepository.mark_delivered(self.cursor, self.delivered_location_ids, datetime.now())
+        if self.actions:
+            GameActionRepository.insert_many(self.cursor, self.game_id, self.actions)
+            every = self.world.snapshot_every
+            if every and self.original['action_seq'] // every != self.game['action_seq'] // every:
+                GameStateSnapshotRepository.insert(
+                    self.cursor, self.game_id, self.game['action_seq'],
+                    json.dumps(snapshot_state(self.game, self.locations))
+                )
+        return changed
+
+    def public_state(self):
+        """The game state without columns clients must not see"""
+        return {key: value for key, value in self.game.items() if key not in PRIVATE_COLUMNS}
+
+    def game_view(self):
+        """Game state with the current airport's details, as travel and buy return it"""
+        airport = self.world.airports_by_id.get(self.game['current_airport_id'], {})
+        return dict(
+            self.public_state(), airport_code=airport.get('code'), airport_name=airport.get('name'),
+            city=airport.get('city'), country=airport.get('country'),
+            latitude=airport.get('latitude'), longitude=airport.get('longitude')
+        )
+
+    def _action_rng(self):
+        """Random stream for the next action: seeded per action if the game has a seed"""
+        seed = self.game.get('rng_seed')
+        if seed is None:
+            return self.world.rng
+        return action_rng(int(seed), self.game['action_seq'] + 1)
+
+    def _record(self, kind, args):
+        self.game['action_seq'] += 1
+        if self.game.get('rng_seed') is not None:
+            self.actions.append({
+                'seq': self.game['action_seq'],
+                'action_type': kind,
+                'args': json.dumps(args),
+                'state_digest': state_digest(self.game),
+            })
+
+    def _random_event(self):
+        event_type = self.world.event_sampler.choice(self.rng)
+        if not event_type:
+            return None
+        money_change, fuel_change = game_rules.roll_event(event_type, self.rng)
+        game_rules.apply_event(self.game, money_change, fuel_change)
+        self.logs.append(log_entry(
+            self.game_id, 'event', event_type['description'],
+            money_change=money_change, fuel_change=fuel_change
+        ))
+        return {
+            'name': event_type['name'],
+            'description': event_type['description'],
+            'money_change': money_change,
+            'fuel_change': fuel_change,
+            'category': event_type['event_category'],
+        }
+
+    def _check_delivery(self, airport_id):
+        location = self.locations.get(self.game['current_artifact_number'])
+        if not location or location['delivery_airport_id'] != airport_id or location['is_delivered']:
+            return {'delivered': False}
+
+        artifact = self.world.artifacts_by_id[location['artifact_id']]
+        game_rules.apply_delivery(self.game, artifact)
+        location['is_delivered'] = 1
+        self.delivered_location_ids.append(location['id'])
+        self.logs.append(log_entry(
+            self.game_id, 'delivery', f"Delivered {artifact['name']}!",
+            money_change=artifact['delivery_reward_money'], fuel_change=artifact['delivery_reward_fuel']
+        ))
+        return {
+            'delivered': True,
+            'artifact_name': artifact['name'],
+            'reward_money': artifact['delivery_reward_money'],
+            'reward_fuel': artifact['delivery_reward_fuel'],
+        }
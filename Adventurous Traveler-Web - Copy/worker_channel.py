@@ -0,0 +1,134 @@
+"""Messages between the worker processes of one server.
+
+server.py runs several copies of app.py. State that lives in one process
+(SSE subscribers, the reference data cache) has to hear about changes
+made in another. Each worker binds a Unix datagram socket named after its
+pid in WORKER_CHANNEL_DIR. broadcast() sends one datagram to every other
+socket there. A receiver thread hands each message to the handler
+registered for its kind.
+
+Delivery is best effort. A socket whose process is gone is removed by
+the first sender that finds it dead. A worker that does not read its
+queue within send_timeout misses the message. Messages must fit in one
+datagram (about 200 KB by default on Linux).
+
+Usage: worker_channel.start() in each worker process (server.py does it
+in post_worker_init); any process may broadcast().
+"""
+import atexit
+import os
+import socket
+import threading
+
+MAX_MESSAGE = 256 * 1024
+
+
+class WorkerChannel:
+    """Datagram sockets of one server's workers, one per pid, in a directory"""
+
+    def __init__(self, directory, send_timeout=0.05):
+        self.directory = directory
+        self.send_timeout = send_timeout
+        self._handlers = {}
+        self._socket = None
+        self._pid = None
+        self._sender = None
+        self._sender_pid = None
+        self._lock = threading.Lock()
+        self._stats = {'sent': 0, 'received': 0, 'failed': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def on(self, kind, handler):
+        """Call handler(payload) for each message of this kind from another worker"""
+        self._handlers[kind] = handler
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'{pid}.sock')
+
+    def start(self):
+        """Bind this process's socket and start receiving"""
+        with self._lock:
+            if self._socket is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            path = self.path(self._pid)
+            if os.path.exists(path):
+                os.unlink(path)
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.bind(path)
+            threading.Thread(target=self._run, args=(self._socket,), name='worker-channel',
+                             daemon=True).start()
+            atexit.register(self.close)
+
+    def close(self):
+        """Stop receiving and remove this process's socket"""
+        with self._lock:
+            if self._socket is None or self._pid != os.getpid():
+                return
+            sock, self._socket = self._socket, None
+            try:
+                os.unlink(self.path(self._pid))
+            except FileNotFoundError:
+                pass
+            sock.close()
+
+    def broadcast(self, kind, payload):
+        """Send payload (str) to every other worker; returns how many got it"""
+        data = f'{kind}\n{payload}'.encode('utf-8')
+        if len(data) > MAX_MESSAGE:
+            print(f"Worker channel: {kind} message of {len(data)} bytes is too large")
+            return 0
+        sender = self._sending_socket()
+        own = f'{os.getpid()}.sock'
+        delivered = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.sock') or name == own:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                sender.sendto(data, path)
+                delivered += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody is bound there any more: the worker exited without cleaning up
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except OSError as e:
+                print(f"Worker channel send to {name} failed: {e}")
+                self._count('failed')
+        self._count('sent', delivered)
+        return delivered
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _sending_socket(self):
+        # Sockets do not survive fork(), so each process opens its own
+        with self._lock:
+            if self._sender is None or self._sender_pid != os.getpid():
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.settimeout(self.send_timeout)
+                self._sender_pid = os.getpid()
+            return self._sender
+
+    def _run(self, sock):
+        while True:
+            try:
+                data = sock.recv(MAX_MESSAGE)
+            except OSError:
+                return
+            kind, _, payload = data.decode('utf-8').partition('\n')
+            handler = self._handlers.get(kind)
+            if handler is None:
+                continue
+            self._count('received')
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Worker channel {kind} handler error: {e}")